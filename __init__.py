@@ -1 +1,40 @@
-#Testes iniciais 
+#Testes iniciais
+"""
+kivyng - Componentes estendidos para Kivy
+As classes públicas podem ser importadas diretamente do pacote
+(from kivyng import BoxCard). Elas são carregadas sob demanda: o módulo
+correspondente (e as partes do Kivy que ele usa) só é importado no primeiro
+acesso à classe, o que reduz o tempo de inicialização de aplicações que não
+usam todos os componentes
+"""
+
+from importlib import import_module
+
+# classe -> módulo que a define
+_LAZY = {
+    'BoxCard': 'kivyng.ngcard',
+    'VerticalBoxCard': 'kivyng.ngcard',
+    'HorizontalBoxCard': 'kivyng.ngcard',
+    'FormCard': 'kivyng.ngcard',
+    'VirtualFormCard': 'kivyng.ngcard',
+    'TableCard': 'kivyng.ngcard',
+    'AlignedLabel': 'kivyng.ngdisplay',
+    'NumericDisplay': 'kivyng.ngdisplay',
+    'Sparkline': 'kivyng.ngdisplay',
+    'NumericInput': 'kivyng.nginput',
+}
+
+__all__ = sorted(_LAZY)
+
+
+def __getattr__(name):
+    module = _LAZY.get(name)
+    if module is None:
+        raise AttributeError("module 'kivyng' has no attribute {!r}".format(name))
+    value = getattr(import_module(module), name)
+    globals()[name] = value  # Os próximos acessos não passam mais por aqui
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY))
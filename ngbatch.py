@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Desenho em lote dos fundos e bordas de cards aninhados
+Normalmente cada card (e cada AlignedLabel com fundo) tem as suas próprias
+instruções Color + Rectangle + Line no canvas.before. No modo em lote, um
+card raiz recolhe a geometria de fundo e de borda de todos os seus
+descendentes em alguns Mesh compartilhados, um por (profundidade, tipo, cor),
+e ao mover ou redimensionar um card só os vértices dele são recalculados
+    painel.setBatched(True)
+    print(painel.batchStats())
+
+Os widgets participantes implementam:
+    _batchQuads(): lista de (tipo, cor, x, y, largura, altura), tipo 0 para
+                   fundo e 1 para borda
+    _batchInstructions(): instruções próprias no canvas.before, retiradas
+                          do canvas enquanto o widget está no lote
+    _batch: o CanvasBatch do qual o widget participa (ou None)
+
+__author__   = "Carlos R Rocha"
+__license__  = "LGPL"
+__version__  = "20261018-0024"
+__email__    = "cticarlo@gmail.com"
+__status__   = "Prototype"
+"""
+
+from kivy.graphics import Color, Mesh, InstructionGroup
+import kivyng.ngframe as ngframe
+
+_MAX_QUADS = 16383  # Os índices do Mesh são de 16 bits (4 vértices por retângulo)
+_indices = []       # Índices dos triângulos de n retângulos (compartilhados)
+
+
+def _quadIndices(count):
+    """
+    :return: Lista de índices (dois triângulos por retângulo) para count retângulos
+    """
+    for i in range(len(_indices) // 6, count):
+        v = 4 * i
+        _indices.extend((v, v + 1, v + 2, v + 2, v + 3, v))
+    return _indices[:6 * count]
+
+
+def borderQuads(color, x, y, width, height, lineWidth):
+    """
+    Decompõe uma borda retangular (como a desenhada por Line(rectangle=...,
+    width=lineWidth)) em quatro retângulos sem sobreposição
+    :return: Lista de (1, cor, x, y, largura, altura)
+    """
+    if lineWidth > 1:  # Line com width > 1 ocupa width pixels para cada lado
+        w = lineWidth
+        return [(1, color, x - w, y - w, width + 2 * w, 2 * w),
+                (1, color, x - w, y + height - w, width + 2 * w, 2 * w),
+                (1, color, x - w, y + w, 2 * w, height - 2 * w),
+                (1, color, x + width - w, y + w, 2 * w, height - 2 * w)]
+    # Linha fina (GL_LINE_LOOP): um pixel, centrado na linha
+    return [(1, color, x - .5, y - .5, width + 1, 1),
+            (1, color, x - .5, y + height - .5, width + 1, 1),
+            (1, color, x - .5, y + .5, 1, height - 1),
+            (1, color, x + width - .5, y + .5, 1, height - 1)]
+
+
+def _vertices(x, y, w, h):
+    return [x, y, 0., 0., x + w, y, 1., 0., x + w, y + h, 1., 1., x, y + h, 0., 1.]
+
+
+
+class _Bucket(object):
+    """
+    Retângulos de uma mesma (profundidade, tipo, cor), desenhados por um único Mesh
+    """
+    __slots__ = ('key', 'color', 'mesh', 'vertices', 'owners', 'dirty', 'resized')
+
+    def __init__(self, key):
+        self.key = key
+        self.color = Color(rgba=key[2])
+        self.mesh = Mesh(mode='triangles')
+        self.vertices = []
+        self.owners = []    # (lista de retângulos do widget, posição nela), por retângulo
+        self.dirty = self.resized = False
+
+
+
+def _drawsOwn(widget):
+    """
+    :return: True se o widget desenha algo além dos filhos e do fundo e borda
+    em lote (ex: um Button, ou um card em cache). Os fundos em lote ficam no
+    canvas.before da raiz, por baixo desse desenho, e por isso o lote não
+    desce nos filhos de um widget assim
+    """
+    canvas = widget.canvas
+    skip = {id(c.canvas) for c in widget.children}
+    skip.update(id(i) for i in getattr(widget, '_batchInstructions', list)())
+    skip.update((id(canvas.before), id(canvas.after)))
+    return any(id(i) not in skip for i in canvas.before.children + canvas.children
+               + canvas.after.children)
+
+
+
+class CanvasBatch(object):
+    """
+    Lote de fundos e bordas de um card raiz e dos seus descendentes. Não
+    desce em widgets que recortam (StencilView, ex: ScrollView), que
+    transformam as coordenadas dos filhos (RelativeLayout, Scatter) ou que
+    desenham algo próprio por cima dos filhos (verificado quando o widget
+    entra no lote)
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.group = InstructionGroup()
+        self._buckets = {}   # (profundidade, tipo, cor, série) -> _Bucket
+        self._entries = {}   # widget -> (profundidade, lista de (bucket, índice))
+        self._tree = {}      # Widget percorrido (ligado a children) -> (profundidade, filhos)
+        self._dirty = set()  # Widgets movidos/redimensionados
+        self._changed = set()  # Widgets percorridos cujos filhos mudaram
+        self._reorder = False
+        root.canvas.before.insert(0, self.group)
+        self._addTree(root, 0)
+        self.update()
+
+
+    def close(self):
+        """
+        Desfaz o lote: cada widget volta a desenhar o próprio fundo e borda
+        """
+        for widget in list(self._entries):
+            self._removeEntry(widget)
+        for widget in self._tree:
+            widget.unbind(children=self._markScan)
+        self._tree.clear()
+        self._changed.clear()
+        self.root.canvas.before.remove(self.group)
+        self.group.clear()
+        self._buckets.clear()
+        ngframe.discard(self.update)
+
+
+    def stats(self):
+        """
+        :return: Dicionário com o número de widgets no lote, de Mesh, de
+        retângulos e de instruções do lote
+        """
+        return {'widgets': len(self._entries),
+                'meshes': len(self._buckets),
+                'quads': sum(len(b.owners) for b in self._buckets.values()),
+                'instructions': len(self.group.children)}
+
+
+    def discard(self, widget):
+        """
+        Retira imediatamente um widget do lote (ex: antes de ele ser liberado)
+        """
+        if widget in self._entries:
+            self._removeEntry(widget)
+        self._dirty.discard(widget)
+
+
+    def restyle(self, widget):
+        """
+        Chamado pelos widgets do lote quando o estilo deles muda
+        """
+        self._detach(widget)
+        self._markMove(widget)
+
+
+    def _markScan(self, widget, *args):
+        self._changed.add(widget)
+        ngframe.mark(self.update)
+
+
+    def _markMove(self, widget, *args):
+        self._dirty.add(widget)
+        ngframe.mark(self.update)
+
+
+    def update(self, *args):
+        """
+        Aplica as mudanças pendentes (estrutura da árvore e posições), enviando
+        ao Mesh apenas os lotes alterados
+        """
+        if self._changed:
+            changed, self._changed = self._changed, set()
+            self._rescan(changed)
+        dirty, self._dirty = self._dirty, set()
+        for widget in dirty:
+            if widget in self._entries:
+                self._place(widget)
+        for key, bucket in list(self._buckets.items()):
+            if not bucket.owners:
+                del self._buckets[key]
+                self._reorder = True
+            elif bucket.dirty:
+                bucket.mesh.vertices = bucket.vertices
+                if bucket.resized:
+                    bucket.mesh.indices = _quadIndices(len(bucket.owners))
+                bucket.dirty = bucket.resized = False
+        if self._reorder:  # Lotes criados ou removidos: refaz a ordem de desenho
+            self._reorder = False
+            group = self.group
+            group.clear()
+            for key in sorted(self._buckets, key=lambda k: (k[0], k[1], k[3])):
+                group.add(self._buckets[key].color)
+                group.add(self._buckets[key].mesh)
+
+
+    def _rescan(self, changed):
+        """
+        Atualiza o lote só nos widgets cujos filhos mudaram: retira as
+        subárvores que saíram deles e percorre as que entraram. As retiradas
+        vêm antes, para que um widget movido de um pai para outro no mesmo
+        quadro seja retirado e incluído de novo com a nova profundidade
+        :param changed: Conjunto de widgets percorridos cujos filhos mudaram
+        """
+        tree = self._tree
+        for widget in changed:
+            if widget in tree:
+                depth, kids = tree[widget]
+                current = set(widget.children)
+                for child in [c for c in kids if c not in current]:
+                    kids.remove(child)
+                    self._dropTree(child)
+        for widget in changed:
+            if widget in tree:
+                depth, kids = tree[widget]
+                known = set(kids)
+                for child in widget.children:
+                    if child not in known:
+                        kids.append(child)
+                        self._addTree(child, depth + 1)
+
+
+    def _addTree(self, widget, depth):
+        """
+        Inclui no lote um widget e os seus descendentes
+        """
+        from kivy.uix.stencilview import StencilView
+        from kivy.uix.relativelayout import RelativeLayout
+        from kivy.uix.scatter import Scatter
+        stop = (StencilView, RelativeLayout, Scatter)
+        stack = [(widget, depth)]
+        while stack:
+            widget, depth = stack.pop()
+            if hasattr(widget, '_batchQuads') and widget not in self._entries:
+                self._entries[widget] = (depth, [])
+                widget._batch = self
+                self._detach(widget)
+                widget.bind(pos=self._markMove, size=self._markMove)
+                self._place(widget)
+            if widget is self.root or not (isinstance(widget, stop) or _drawsOwn(widget)):
+                widget.bind(children=self._markScan)
+                self._tree[widget] = (depth, list(widget.children))
+                stack.extend((child, depth + 1) for child in widget.children)
+
+
+    def _dropTree(self, widget):
+        """
+        Retira do lote um widget e os descendentes que foram incluídos com ele
+        """
+        stack = [widget]
+        while stack:
+            widget = stack.pop()
+            if widget in self._entries:
+                self._removeEntry(widget)
+            self._dirty.discard(widget)
+            if widget in self._tree:
+                widget.unbind(children=self._markScan)
+                stack.extend(self._tree.pop(widget)[1])
+
+
+    def _detach(self, widget):
+        before = widget.canvas.before
+        for instruction in widget._batchInstructions():
+            if instruction in before.children:
+                before.remove(instruction)
+
+
+    def _removeEntry(self, widget):
+        depth, quads = self._entries.pop(widget)
+        while quads:
+            self._removeQuad(quads, len(quads) - 1)
+        widget.unbind(pos=self._markMove, size=self._markMove)
+        widget._batch = None
+        before = widget.canvas.before
+        for i, instruction in enumerate(widget._batchInstructions()):
+            before.insert(i, instruction)
+
+
+    def _place(self, widget):
+        """
+        (Re)calcula os retângulos de um widget. Se as cores e a quantidade não
+        mudaram, só os vértices dele são reescritos
+        """
+        depth, quads = self._entries[widget]
+        shapes = widget._batchQuads()
+        if len(shapes) == len(quads) and all(
+                bucket.key[1] == kind and bucket.key[2] == tuple(color)
+                for (bucket, i), (kind, color, *rect) in zip(quads, shapes)):
+            for (bucket, i), (kind, color, *rect) in zip(quads, shapes):
+                bucket.vertices[16 * i:16 * i + 16] = _vertices(*rect)
+                bucket.dirty = True
+            return
+        while quads:
+            self._removeQuad(quads, len(quads) - 1)
+        for kind, color, *rect in shapes:
+            bucket = self._bucket(depth, kind, tuple(color))
+            quads.append((bucket, len(bucket.owners)))
+            bucket.owners.append((quads, len(quads) - 1))
+            bucket.vertices.extend(_vertices(*rect))
+            bucket.dirty = bucket.resized = True
+
+
+    def _bucket(self, depth, kind, color):
+        serial = 0
+        while True:
+            key = (depth, kind, color, serial)
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = _Bucket(key)
+                self._reorder = True
+                return bucket
+            if len(bucket.owners) < _MAX_QUADS:
+                return bucket
+            serial += 1
+
+
+    def _removeQuad(self, quads, j):
+        """
+        Remove o retângulo j de um widget, movendo o último retângulo do
+        mesmo Mesh para o lugar dele
+        """
+        bucket, i = quads.pop(j)
+        last = len(bucket.owners) - 1
+        if i != last:
+            owner, k = bucket.owners[i] = bucket.owners[last]
+            owner[k] = (bucket, i)
+            bucket.vertices[16 * i:16 * i + 16] = bucket.vertices[16 * last:]
+        del bucket.owners[last]
+        del bucket.vertices[16 * last:]
+        bucket.dirty = bucket.resized = True
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Ligação de fontes de dados de alta taxa (telemetria) aos widgets de
+apresentação (AlignedLabel) e de entrada (NumericInput)
+Os valores podem vir de geradores/iteráveis, filas asyncio ou threads. Eles
+são agrupados por widget, e apenas o mais recente de cada quadro é aplicado,
+sempre na thread principal do Kivy. Valores cujo texto formatado não muda
+não chegam a alterar o widget
+
+__author__   = "Carlos R Rocha"
+__license__  = "LGPL"
+__version__  = "20261017-2355"
+__email__    = "cticarlo@gmail.com"
+__status__   = "Prototype"
+"""
+
+import threading
+from kivy.clock import Clock
+
+
+class StreamBinder(object):
+    """
+    Recebe valores de qualquer thread (push) e os aplica aos widgets uma vez
+    por quadro. Contadores:
+        received: valores recebidos
+        coalesced: valores substituídos por outro mais recente no mesmo quadro
+        unchanged: valores descartados porque o texto formatado não mudou
+        dropped: valores descartados por serem inválidos (ex: fora dos limites
+                 de um NumericInput) ou destinados a widgets não ligados
+        applied: valores efetivamente aplicados aos widgets
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latest = {}     # widget -> valor mais recente ainda não aplicado
+        self._formats = {}    # widget -> função de formatação
+        self._trigger = Clock.create_trigger(self._flush, -1)
+        self.received = 0
+        self.coalesced = 0
+        self.unchanged = 0
+        self.dropped = 0
+        self.applied = 0
+
+
+    def attach(self, widget, fmt=None):
+        """
+        Liga um widget ao binder
+        :param widget: AlignedLabel, NumericInput ou outro widget com text
+        :param fmt: Formatação do valor: função valor -> texto ou string de formato
+        (ex: '{:.3f} V'). Se None, usa o formato do próprio NumericInput (casas
+        decimais) ou str() para os demais widgets
+        """
+        if fmt is None:
+            fmt = getattr(widget, 'formatValue', str)
+        elif isinstance(fmt, str):
+            fmt = fmt.format
+        self._formats[widget] = fmt
+
+
+    def detach(self, widget):
+        """
+        Desliga um widget do binder, descartando o valor pendente
+        """
+        with self._lock:
+            self._latest.pop(widget, None)
+        self._formats.pop(widget, None)
+
+
+    def push(self, widget, value):
+        """
+        Entrega um novo valor para o widget. Pode ser chamado de qualquer thread
+        :param widget: Widget ligado ao binder
+        :param value: Novo valor
+        """
+        with self._lock:
+            self.received += 1
+            if widget in self._latest:
+                self.coalesced += 1
+            self._latest[widget] = value
+        self._trigger()
+
+
+    def feed(self, widget, source, interval=None):
+        """
+        Consome um iterável/gerador em uma thread própria, entregando cada valor
+        ao widget. A thread termina junto com o iterável (ou com o programa)
+        :param widget: Widget ligado ao binder
+        :param source: Iterável (ex: gerador de leituras de um instrumento)
+        :param interval: Pausa opcional (em segundos) entre valores
+        :return: A thread criada
+        """
+        def run():
+            wait = threading.Event().wait
+            for value in source:
+                self.push(widget, value)
+                if interval:
+                    wait(interval)
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        return thread
+
+
+    async def feedQueue(self, widget, queue):
+        """
+        Corrotina que consome uma asyncio.Queue, entregando cada valor ao widget.
+        Deve ser executada no laço de eventos que alimenta a fila. Termina ao
+        receber None
+        :param widget: Widget ligado ao binder
+        :param queue: asyncio.Queue com os valores
+        """
+        while True:
+            value = await queue.get()
+            if value is None:
+                break
+            self.push(widget, value)
+
+
+    def _flush(self, *args):
+        """
+        Aplica, na thread principal, o valor mais recente de cada widget
+        """
+        with self._lock:
+            latest, self._latest = self._latest, {}
+        formats = self._formats
+        for widget, value in latest.items():
+            fmt = formats.get(widget)
+            if fmt is None:
+                self.dropped += 1
+                continue
+            try:
+                text = fmt(value)
+            except (TypeError, ValueError):
+                self.dropped += 1
+                continue
+            if widget.text == text:
+                self.unchanged += 1
+                continue
+            if hasattr(widget, 'value'):
+                try:
+                    widget.value = value
+                except ValueError:  # Fora dos limites do NumericInput
+                    self.dropped += 1
+                    continue
+            else:
+                widget.text = text
+            self.applied += 1
+
+
+    def stats(self):
+        """
+        :return: Dicionário com os contadores do binder
+        """
+        with self._lock:
+            pending = len(self._latest)
+        return {'received': self.received,
+                'coalesced': self.coalesced,
+                'unchanged': self.unchanged,
+                'dropped': self.dropped,
+                'applied': self.applied,
+                'pending': pending}
+
+
+    def resetStats(self):
+        """
+        Zera os contadores
+        """
+        with self._lock:
+            self.received = self.coalesced = self.unchanged = 0
+            self.dropped = self.applied = 0
+
+
+
+_binder = None
+
+
+def getBinder():
+    """
+    :return: O StreamBinder compartilhado (criado no primeiro uso)
+    """
+    global _binder
+    if _binder is None:
+        _binder = StreamBinder()
+    return _binder
+
+
+def forget(widget):
+    """
+    Desliga um widget do StreamBinder compartilhado, se ele já tiver sido criado
+    (usado na liberação dos widgets, dispose)
+    """
+    if _binder is not None:
+        _binder.detach(widget)
@@ -12,59 +12,706 @@ __email__    = "cticarlo@gmail.com"
 __status__   = "Prototype"
 """
 
-from kivy.properties import DictProperty
-from kivy.graphics import Rectangle, Line, Color
+import weakref
+from array import array
+from collections import OrderedDict
+from contextlib import contextmanager
+from kivy.clock import Clock
+from kivy.properties import ObjectProperty, NumericProperty
+from kivy.graphics import Rectangle, Line, Color, InstructionGroup
+from kivy.graphics import Fbo, ClearColor, ClearBuffers, Translate, Callback
 from kivy.uix.boxlayout import BoxLayout
 from kivy.uix.gridlayout import GridLayout
 import kivyng.ngstyle as ngstyle
+import kivyng.ngframe as ngframe
+import kivyng.ngformat as ngformat
+import kivyng.ngbatch as ngbatch
 
-class BoxCard(BoxLayout):
+
+class _Hidden(weakref.ref):
     """
-    Especialização do BoxLayout, com definição de cor de fundo (opcional)
-    e definição de uma borda
+    Marcador de um widget invisível guardado apenas por referência fraca
+    (cards com weakHidden), na posição que ele ocupa na lista auxiliar
     """
-    style = DictProperty()
-    
-    def __init__(self, style=None, **kwargs):
+    __slots__ = ()
+
+
+
+_hiddenIn = weakref.WeakKeyDictionary()  # Widget invisível -> weakref do card que o contém
+
+
+
+def ownerOf(widget):
+    """
+    :param widget: Widget consultado
+    :return: O card (ou layout) que contém o widget: o parent, se ele estiver
+    visível, ou o card em que ele está invisível. None se não houver
+    """
+    if widget.parent is not None:
+        return widget.parent
+    ref = _hiddenIn.get(widget)
+    return None if ref is None else ref()
+
+
+
+class _VisibilityIndex(object):
+    """
+    Índice de visibilidade dos widgets de um card. Mantém a lista auxiliar
+    com todos os widgets (na mesma ordem de children) e, para cada widget,
+    a sua posição (slot) e o seu estado de visibilidade, ambos consultados
+    em tempo constante. A posição em children de um widget visível é obtida
+    de uma árvore de Fenwick com a contagem de visíveis, em O(log n)
+    Alterações estruturais (inserção/remoção) apenas marcam o índice como
+    desatualizado; ele é reconstruído, em O(n), na próxima consulta
+    Com weak, os widgets invisíveis são guardados por referência fraca (_Hidden):
+    se a aplicação não tiver mais nenhuma referência a eles, eles deixam o card
+    """
+
+    def __init__(self, widgets, weak=False, group=1, owner=None):
         """
-        Construtor do BoxCard, acrescentando características próprias a ele:
-        :param style: Padrão de estilo a ser utilizado no desenho do componente
-        :param background_color: Cor de fundo do Widget (lista de 4 componentes)
-        :param border_color: Cor da borda do Widget (lista de 4 componentes)
-        :param kwargs: Demais parâmetros de um BoxLayout
+        :param widgets: Lista auxiliar de widgets do card (compartilhada com ele)
+        :param weak: Se True, os widgets invisíveis são guardados por referência fraca
+        :param group: Widgets por linha (ex: 2 no FormCard). Quando um widget
+        invisível é descartado, a linha toda deixa a lista auxiliar
+        :param owner: Card dono do índice (ver ownerOf)
         """
-        if style is None:
-            self.style = ngstyle.getDefault().get('BoxCard', {})
-        else:
-            self.style = style.get('BoxCard', {})        
-        if 'background_color' in kwargs:
-            self.style['background_color'] = kwargs['background_color']
-            del kwargs['background_color']
-        if 'border_color' in kwargs:
-            self.style['border_color'] = kwargs['border_color']
-            del kwargs['border_color']
-        if 'border_width' in kwargs:
-            self.style['border_width'] = kwargs['border_width']
-            del kwargs['border_width']
-        self._widgets = [] #  Relacao de widgets do card (todos)
-        
-        super().__init__(**kwargs)
-        
-        with self.canvas.before:
-            if 'background_color' in self.style and self.style['background_color']:
-                Color(rgba=self.style['background_color'])
-                self._rect = Rectangle(pos=self.pos, size=self.size)
+        self.widgets = widgets
+        self.owner = None if owner is None else weakref.ref(owner)
+        self.visible = {}     # widget (ou _Hidden) -> estado de visibilidade
+        self.pending = None   # alterações acumuladas durante um lote
+        self.weak = weak
+        self.hidden = weakref.WeakKeyDictionary()  # widget -> _Hidden (com weak)
+        self._group = group
+        self._dead = []       # _Hidden cujos widgets foram descartados
+        self._depth = 0       # nível de aninhamento dos lotes
+        self._slot = {}       # widget -> posição na lista auxiliar
+        self._tree = [0]      # árvore de Fenwick dos widgets visíveis
+        self._stale = False
+
+
+    def insert(self, index, widget):
+        """
+        Insere um widget (visível) na lista auxiliar
+        :param index: Posição na lista auxiliar
+        :param widget: Widget a ser inserido
+        """
+        self.purge()
+        self.widgets.insert(index, widget)
+        self.visible[widget] = True
+        self._stale = True
+
+
+    def prepend(self, widgets):
+        """
+        Insere vários widgets (visíveis) no início da lista auxiliar de uma só vez,
+        na ordem resultante de inseri-los um a um na posição 0
+        :param widgets: Sequência de widgets
+        """
+        self.purge()
+        self.widgets[:0] = widgets[::-1]
+        visible = self.visible
+        for widget in widgets:
+            visible[widget] = True
+        self._stale = True
+
+
+    def remove(self, widget):
+        """
+        Remove um widget da lista auxiliar, se ele fizer parte dela
+        :param widget: Widget a ser removido
+        :return: True se o widget foi removido
+        """
+        self.purge()
+        key = self.key(widget)
+        slot = self.slot(key)
+        if slot is None:
+            return False
+        del self.widgets[slot]
+        del self.visible[key]
+        self.hidden.pop(widget, None)
+        _hiddenIn.pop(widget, None)
+        if self.pending:
+            self.pending.pop(widget, None)
+        self._stale = True
+        return True
+
+
+    def key(self, widget):
+        """
+        :return: O item que representa o widget na lista auxiliar (o próprio
+        widget ou o seu _Hidden)
+        """
+        return self.hidden.get(widget, widget) if self.hidden else widget
+
+
+    def isVisible(self, widget):
+        """
+        :return: Visibilidade do widget, ou None se ele não pertencer ao card
+        """
+        return self.visible.get(self.key(widget))
+
+
+    def resolve(self, item):
+        """
+        :param item: Item da lista auxiliar
+        :return: O widget correspondente, ou None se ele foi descartado
+        """
+        return item() if isinstance(item, _Hidden) else item
+
+
+    def members(self):
+        """
+        :return: Lista com todos os widgets existentes (visíveis ou não), em ordem
+        """
+        self.purge()
+        return [w() if isinstance(w, _Hidden) else w for w in self.widgets
+                if not isinstance(w, _Hidden) or w() is not None]
+
+
+    def clear(self):
+        """
+        Esvazia a lista auxiliar de uma só vez
+        :return: Lista com os widgets existentes (visíveis ou não) que estavam
+        nela, em ordem
+        """
+        members = self.members()
+        for widget in members:
+            _hiddenIn.pop(widget, None)
+        del self.widgets[:]
+        self.visible.clear()
+        self.hidden.clear()
+        if self.pending:
+            self.pending.clear()
+        self._stale = True
+        return members
+
+
+    def purge(self):
+        """
+        Retira da lista auxiliar as linhas com algum widget (invisível) descartado
+        pela aplicação. Os demais widgets da linha, também invisíveis, deixam o
+        card junto, para que as linhas seguintes não mudem de posição no layout
+        """
+        if not self._dead:
+            return
+        self._dead = []
+        widgets, group = self.widgets, self._group
+        keep = []
+        for i in range(0, len(widgets), group):
+            row = widgets[i:i + group]
+            if any(isinstance(w, _Hidden) and w() is None for w in row):
+                for w in row:
+                    self.visible.pop(w, None)
+                    widget = self.resolve(w)
+                    if widget is not None:
+                        self.hidden.pop(widget, None)
+                        _hiddenIn.pop(widget, None)
+                        if self.pending:
+                            self.pending.pop(widget, None)
             else:
-                self._rect = None
-            if 'border_color' in self.style and 'border_width' in self.style \
-                and self.style['border_color'] and self.style['border_width']:
-                Color(rgba=self.style['border_color'])
-                self._border = Line(rectangle=(self.x, self.y, self.width, self.height),
-                                    width=self.style['border_width'])
+                keep.extend(row)
+        if len(keep) != len(widgets):
+            widgets[:] = keep
+            self._stale = True
+
+
+    def slot(self, widget):
+        """
+        :param widget: Widget consultado
+        :return: Posição do widget na lista auxiliar, ou None se ele não pertencer ao card
+        """
+        if self._stale:
+            self._rebuild()
+        return self._slot.get(widget)
+
+
+    def childIndex(self, slot):
+        """
+        :param slot: Posição na lista auxiliar
+        :return: Quantidade de widgets visíveis antes desta posição, ou seja,
+        o índice em children que um widget nesta posição deve ocupar
+        """
+        if self._stale:
+            self._rebuild()
+        tree = self._tree
+        total = 0
+        while slot > 0:
+            total += tree[slot]
+            slot -= slot & -slot
+        return total
+
+
+    def _update(self, slot, delta):
+        """
+        Atualiza a árvore de Fenwick com a mudança de estado de uma posição
+        """
+        tree = self._tree
+        n = len(tree) - 1
+        i = slot + 1
+        while i <= n:
+            tree[i] += delta
+            i += i & -i
+
+
+    def _rebuild(self):
+        """
+        Reconstrói o mapa de posições e a árvore de Fenwick em O(n)
+        """
+        widgets = self.widgets
+        visible = self.visible
+        n = len(widgets)
+        self._slot = {w: i for i, w in enumerate(widgets)}
+        tree = [0] * (n + 1)
+        for i in range(1, n + 1):
+            if visible[widgets[i - 1]]:
+                tree[i] += 1
+            j = i + (i & -i)
+            if j <= n:
+                tree[j] += tree[i]
+        self._tree = tree
+        self._stale = False
+
+
+    def apply(self, changes, add, remove):
+        """
+        Aplica um conjunto de mudanças de visibilidade. Primeiro remove de children
+        todos os widgets que ficarão invisíveis, depois insere os que ficarão visíveis
+        em ordem crescente de posição. Assim, o índice de cada inserção já considera
+        todos os widgets visíveis que o antecedem, e o layout do card é disparado uma
+        única vez (o gatilho de layout do Kivy agrupa as chamadas em um mesmo quadro)
+        :param changes: Dicionário widget -> visibilidade
+        :param add: Método add_widget do layout (sem a sobrecarga do card)
+        :param remove: Método remove_widget do layout (sem a sobrecarga do card)
+        """
+        self.purge()
+        visible = self.visible
+        shown = []
+        hidden = []
+        for widget, state in changes.items():
+            state = bool(state)
+            key = self.key(widget)
+            if visible.get(key, state) != state:
+                (shown if state else hidden).append(self.slot(key))
+        if not shown and not hidden:
+            return
+        widgets = self.widgets
+        for slot in hidden:
+            widget = widgets[slot]
+            self._update(slot, -1)
+            remove(widget)
+            _hiddenIn[widget] = self.owner
+            if self.weak:
+                ref = widgets[slot] = _Hidden(widget, self._dead.append)
+                del visible[widget]
+                visible[ref] = False
+                self._slot[ref] = self._slot.pop(widget)
+                self.hidden[widget] = ref
             else:
-                self._border = None
+                visible[widget] = False
+        for slot in shown:
+            item = widgets[slot]
+            if isinstance(item, _Hidden):
+                widget = widgets[slot] = item()
+                del visible[item]
+                self._slot[widget] = self._slot.pop(item)
+                del self.hidden[widget]
+            _hiddenIn.pop(widgets[slot], None)
+            visible[widgets[slot]] = True
+            self._update(slot, 1)
+        for slot in sorted(shown):
+            add(widgets[slot], self.childIndex(slot))
+
+
+    @contextmanager
+    def batch(self, apply):
+        """
+        Gerenciador de contexto que acumula as mudanças de visibilidade e as aplica
+        de uma só vez ao final do bloco mais externo
+        :param apply: Função que recebe o dicionário de mudanças acumuladas
+        """
+        if self._depth == 0:
+            self.pending = {}
+        self._depth += 1
+        try:
+            yield
+        finally:
+            self._depth -= 1
+            if self._depth == 0:
+                changes, self.pending = self.pending, None
+                apply(changes)
+
+_cacheBudget = 64 * 1024 * 1024  # Memória máxima (bytes) das texturas dos cards em cache
+_cached = OrderedDict()  # weakref do card -> bytes; o renderizado há mais tempo vem primeiro
+_cacheStats = {'renders': 0, 'evictions': 0, 'rejected': 0}
+
+
+def setCacheBudget(budget):
+    """
+    Define a memória máxima ocupada pelas texturas dos cards em cache (setCached).
+    Se necessário, os cards renderizados há mais tempo deixam de usar o cache
+    :param budget: Memória em bytes
+    """
+    global _cacheBudget
+    _cacheBudget = budget
+    _reserve(None, 0)
+
+
+def cacheStats():
+    """
+    :return: Dicionário com o número de cards em cache, a memória ocupada e
+    o limite (bytes), o total de renderizações das texturas, os cards retirados
+    do cache por falta de memória (evictions) e os não aceitos (rejected)
+    """
+    result = dict(_cacheStats)
+    result.update(cards=len(_cached), bytes=sum(_cached.values()), budget=_cacheBudget)
+    return result
+
+
+def resetCacheStats():
+    for k in _cacheStats:
+        _cacheStats[k] = 0
+
+
+def _reserve(ref, size):
+    """
+    Reserva memória para a textura de um card, retirando do cache os cards
+    renderizados há mais tempo, se preciso
+    :return: False se o card não couber no limite
+    """
+    _cached.pop(ref, None)
+    if size > _cacheBudget:
+        return False
+    used = sum(_cached.values())
+    while _cached and used + size > _cacheBudget:
+        victim = next(iter(_cached))
+        used -= _cached[victim]
+        _cacheStats['evictions'] += 1
+        victim().setCached(False)
+    if ref is not None:
+        _cached[ref] = size
+    return True
+
+
+def _forget(ref):
+    _cached.pop(ref, None)
+
+
+# Modos de mistura dos caches. No Fbo ('fbo'), o alfa é acumulado corretamente
+# sobre o fundo transparente (cores pré-multiplicadas), e a textura resultante
+# é desenhada como pré-multiplicada ('premultiplied'). O Kivy não tem instruções
+# de mistura nem controla esse estado: o modo é trocado por Callbacks, e o modo
+# anterior, lido do contexto na entrada, é restaurado na saída. A pilha permite
+# caches aninhados. O módulo opengl só é importado no caminho de desenho dos caches
+# (Callback(reset_context=True) não serve: o Kivy perde o controle das texturas ligadas)
+_blendStack = []
+
+
+def _pushBlend(mode):
+    from kivy.graphics.opengl import (glBlendFuncSeparate, glGetIntegerv, GL_ONE, GL_SRC_ALPHA,
+                                      GL_ONE_MINUS_SRC_ALPHA, GL_BLEND_SRC_RGB, GL_BLEND_DST_RGB,
+                                      GL_BLEND_SRC_ALPHA, GL_BLEND_DST_ALPHA)
+    if not _blendStack:
+        _blendStack.append(tuple(glGetIntegerv(name)[0] for name in (
+            GL_BLEND_SRC_RGB, GL_BLEND_DST_RGB, GL_BLEND_SRC_ALPHA, GL_BLEND_DST_ALPHA)))
+    mode = (GL_SRC_ALPHA if mode == 'fbo' else GL_ONE, GL_ONE_MINUS_SRC_ALPHA,
+            GL_ONE, GL_ONE_MINUS_SRC_ALPHA)
+    _blendStack.append(mode)
+    glBlendFuncSeparate(*mode)
+
+
+def _popBlend(*args):
+    from kivy.graphics.opengl import glBlendFuncSeparate
+    _blendStack.pop()
+    glBlendFuncSeparate(*_blendStack[-1])
+    if len(_blendStack) == 1:
+        _blendStack.pop()
 
-        self.bind(size=self._update_rect, pos=self._update_rect)
+
+
+class _FboCache(object):
+    """
+    Instruções do modo de cache de um card: os canvas dos filhos são desenhados
+    em um Fbo, que só é renderizado de novo quando alguma instrução contida
+    nele muda; o card desenha apenas a textura do Fbo
+    """
+    __slots__ = ('fbo', 'translate', 'group', 'instructions', 'rect', 'ref', 'renders')
+
+    def __init__(self, card):
+        self.ref = weakref.ref(card, _forget)
+        self.renders = 0
+        self.fbo = Fbo(size=card.size, with_stencilbuffer=True)
+        with self.fbo:
+            ClearColor(0, 0, 0, 0)
+            ClearBuffers()
+            Callback(self._rendered)
+            Callback(lambda instr: _pushBlend('fbo'))
+            self.translate = Translate(-card.x, -card.y)
+        self.group = InstructionGroup()
+        self.fbo.add(self.group)
+        self.fbo.add(Callback(_popBlend))
+        # A textura tem as cores pré-multiplicadas pelo alfa
+        self.rect = Rectangle(pos=card.pos, size=card.size, texture=self.fbo.texture)
+        self.instructions = (self.fbo, Callback(lambda instr: _pushBlend('premultiplied')),
+                             Color(1, 1, 1, 1), self.rect, Callback(_popBlend))
+
+
+    def _rendered(self, *args):
+        self.renders += 1
+        _cacheStats['renders'] += 1
+        if self.ref in _cached:
+            _cached.move_to_end(self.ref)
+
+
+    @property
+    def size(self):
+        """
+        Memória ocupada pela textura e pelo buffer de profundidade/stencil
+        """
+        w, h = self.fbo.size
+        return int(w) * int(h) * 8
+
+
+
+class _CardCanvas(object):
+    """
+    Fundo e borda dos cards, desenhados a partir do estilo. As instruções
+    ficam em um grupo próprio no canvas.before, para que uma troca de tema
+    possa alterá-las (ou recriá-las) sem interferir no restante do canvas
+    """
+    _canvasGroup = None
+    _cache = None
+    _batch = None       # Lote (ngbatch) do qual o card participa
+    _batchRoot = None   # Lote do qual o card é a raiz
+
+    def _drawCanvas(self):
+        """
+        (Re)cria as instruções de fundo e de borda a partir do estilo atual
+        """
+        group = self._canvasGroup
+        if group is None:
+            group = self._canvasGroup = InstructionGroup()
+            self.canvas.before.add(group)
+        else:
+            group.clear()
+        style = self.style
+        if style.get('background_color'):
+            self._bgColor = Color(rgba=style['background_color'])
+            self._rect = Rectangle(pos=self.pos, size=self.size)
+            group.add(self._bgColor)
+            group.add(self._rect)
+        else:
+            self._bgColor = self._rect = None
+        if style.get('border_color') and style.get('border_width'):
+            self._borderColor = Color(rgba=style['border_color'])
+            self._border = Line(rectangle=(self.x, self.y, self.width, self.height),
+                                width=style['border_width'])
+            group.add(self._borderColor)
+            group.add(self._border)
+        else:
+            self._borderColor = self._border = None
+
+
+    def applyStyle(self, style, changed):
+        """
+        Aplica um novo estilo ao card já desenhado (troca de tema), alterando
+        apenas as instruções afetadas pelas chaves que mudaram
+        :param style: Novo estilo (ngstyle.Style)
+        :param changed: Conjunto com as chaves do estilo que mudaram
+        """
+        self.style = style
+        hasBg = bool(style.get('background_color'))
+        hasBorder = bool(style.get('border_color') and style.get('border_width'))
+        if hasBg != (self._rect is not None) or hasBorder != (self._border is not None):
+            self._drawCanvas()
+        else:
+            if 'background_color' in changed and hasBg:
+                self._bgColor.rgba = style['background_color']
+            if 'border_color' in changed and hasBorder:
+                self._borderColor.rgba = style['border_color']
+            if 'border_width' in changed and hasBorder:
+                self._border.width = style['border_width']
+        if self._batch is not None:
+            self._batch.restyle(self)
+
+
+    def setBatched(self, batched=True):
+        """
+        Liga ou desliga o desenho em lote dos fundos e bordas deste card e dos
+        seus descendentes (cards e labels): em vez das instruções de cada um,
+        alguns Mesh compartilhados, agrupados por profundidade e cor (ver ngbatch)
+        :param batched: Se True, liga o modo em lote
+        """
+        if batched and self._batchRoot is None:
+            self._batchRoot = ngbatch.CanvasBatch(self)
+        elif not batched and self._batchRoot is not None:
+            self._batchRoot.close()
+            self._batchRoot = None
+
+
+    def batchStats(self):
+        """
+        :return: Estatísticas do lote do qual o card é a raiz, ou None
+        """
+        return None if self._batchRoot is None else self._batchRoot.stats()
+
+
+    def _batchQuads(self):
+        """
+        :return: Retângulos de fundo e de borda do card, para o desenho em lote
+        """
+        quads = []
+        if self._rect is not None:
+            quads.append((0, self._bgColor.rgba, self.x, self.y, self.width, self.height))
+        if self._border is not None:
+            quads.extend(ngbatch.borderQuads(self._borderColor.rgba, self.x, self.y,
+                                             self.width, self.height, self._border.width))
+        return quads
+
+
+    def _batchInstructions(self):
+        return [self._canvasGroup]
+
+
+    def setCached(self, cached=True):
+        """
+        Liga ou desliga o modo de cache do card, para painéis que ficam muito
+        tempo sem mudar: os filhos são desenhados uma única vez em uma textura
+        (Fbo), e o card passa a desenhar só a textura. Qualquer mudança nos
+        filhos (propriedades, tamanho, visibilidade, estilo) faz a textura ser
+        renderizada de novo. A memória das texturas é limitada por setCacheBudget.
+        O resultado é o mesmo do desenho direto, exceto por linhas de 1 pixel
+        (bordas) exatamente sobre a divisa entre pixels, que o rasterizador
+        pode deslocar de um pixel dentro da textura
+        :param cached: Se True, liga o cache
+        :return: True se o card ficou em cache (False se não coube no limite)
+        """
+        cache = self._cache
+        if not cached:
+            if cache is not None:
+                self._cache = None
+                _forget(cache.ref)
+                self.unbind(children=self._markCache)
+                canvas = self.canvas
+                for instruction in cache.instructions:
+                    canvas.remove(instruction)
+                cache.group.clear()
+                for child in reversed(self.children):
+                    canvas.add(child.canvas)
+            return False
+        if cache is not None:
+            return True
+        cache = _FboCache(self)
+        if not _reserve(cache.ref, cache.size):
+            _cacheStats['rejected'] += 1
+            return False
+        self._cache = cache
+        for instruction in cache.instructions:
+            self.canvas.add(instruction)
+        self._syncCache()
+        self.bind(children=self._markCache)
+        return True
+
+
+    def isCached(self):
+        return self._cache is not None
+
+
+    def cacheRenders(self):
+        """
+        :return: Número de vezes que a textura do cache foi renderizada (0 se não houver cache)
+        """
+        return 0 if self._cache is None else self._cache.renders
+
+
+    def remove_widget(self, widget, *args, **kwargs):
+        """
+        Com o cache ligado, o canvas do widget sai do Fbo imediatamente (e não
+        só na próxima sincronização): ele pode ser adicionado a outro parent
+        ainda neste quadro. Vale também para os widgets escondidos (setVisible)
+        """
+        cache = self._cache
+        if cache is not None:
+            cache.group.remove(widget.canvas)
+        super().remove_widget(widget, *args, **kwargs)
+
+
+    def _markCache(self, *args):
+        ngframe.mark(self._syncCache)
+
+
+    def _syncCache(self, *args):
+        """
+        Leva os canvas dos filhos (visíveis) para dentro do Fbo, na ordem de desenho
+        """
+        cache = self._cache
+        if cache is None:
+            return
+        canvas = self.canvas
+        own = set(canvas.children)
+        group = cache.group
+        group.clear()
+        for child in reversed(self.children):
+            if child.canvas in own:
+                canvas.remove(child.canvas)
+            group.add(child.canvas)
+
+
+    def reset(self, **kwargs):
+        """
+        Restaura o card ao estado de um recém-criado (reaproveitamento por um pool):
+        remove todos os widgets, visíveis ou não
+        :param kwargs: Outras propriedades do layout a serem definidas
+        """
+        self._detachAll()
+        for name, val in kwargs.items():
+            setattr(self, name, val)
+
+
+    def dispose(self):
+        """
+        Libera o card: retira-o do parent, descarta (dispose) todos os seus
+        widgets, visíveis ou não, e desfaz as instruções de canvas, o cache,
+        o desenho em lote e as ligações de eventos do próprio card. O card não
+        deve ser usado depois disso
+        """
+        if self.parent is not None:
+            self.parent.remove_widget(self)
+        self.setCached(False)
+        self.setBatched(False)
+        self.setFixedLayout(False)
+        if self._batch is not None:
+            self._batch.discard(self)
+        for widget in self._detachAll():
+            if hasattr(widget, 'dispose'):
+                widget.dispose()
+        self.unbind(size=self._markRect, pos=self._markRect)
+        ngframe.discard(self._update_rect)
+        if self._canvasGroup is not None:
+            self.canvas.before.remove(self._canvasGroup)
+            self._canvasGroup.clear()
+            self._canvasGroup = None
+        self._bgColor = self._rect = self._borderColor = self._border = None
+
+
+    def _detachAll(self):
+        """
+        Retira todos os widgets do card, visíveis ou não, de uma só vez (sem
+        atualizar a lista auxiliar a cada widget, como faria remove_widget)
+        :return: Lista dos widgets retirados, em ordem
+        """
+        widgets = self._visIndex.clear()
+        for widget in list(self.children):
+            _CardCanvas.remove_widget(self, widget)
+        return widgets
+
+
+    def _markRect(self, *args):
+        """
+        Agenda a atualização do fundo e da borda para o próximo quadro, de modo
+        que várias mudanças de size/pos em um mesmo passo de layout resultem
+        em uma única atualização
+        """
+        ngframe.mark(self._update_rect)
 
 
     def _update_rect(self, *args):
@@ -77,20 +724,267 @@ class BoxCard(BoxLayout):
             self._rect.size = self.size
         if self._border:
             self._border.rectangle = (self.x, self.y, self.width, self.height)
+        cache = self._cache
+        if cache is not None:
+            cache.translate.xy = (-self.x, -self.y)
+            cache.rect.pos = self.pos
+            if tuple(cache.fbo.size) != tuple(self.size):
+                cache.fbo.size = self.size
+                cache.rect.size = self.size
+                cache.rect.texture = cache.fbo.texture
+                if not _reserve(cache.ref, cache.size):
+                    _cacheStats['rejected'] += 1
+                    self.setCached(False)
+
+
+
+class CardSnapshot(object):
+    """
+    Registro compacto do estado dos inputs numéricos de um card (e dos cards
+    contidos nele): valores, limites e visibilidade, em vetores paralelos.
+    Criado por snapshot() e aplicado por restore() no mesmo card
+    """
+    __slots__ = ('cards', 'widgets', 'values', 'mins', 'maxs', 'visible')
+
+    def __init__(self, cards, widgets, values, mins, maxs, visible):
+        self.cards = cards        # Card dono de cada input (tupla)
+        self.widgets = widgets    # Inputs, na ordem dos cards (tupla)
+        self.values = values      # array('d')
+        self.mins = mins          # array('d')
+        self.maxs = maxs          # array('d')
+        self.visible = visible    # array('b')
+
+
+    def __len__(self):
+        return len(self.widgets)
+
+
+    def diff(self, other):
+        """
+        Compara dois registros do mesmo card
+        :param other: Outro CardSnapshot
+        :return: Lista com os índices dos inputs cujo valor, limites ou visibilidade diferem
+        :raise ValueError: Se os registros não forem dos mesmos inputs
+        """
+        if self.widgets != other.widgets:
+            raise ValueError('CardSnapshot.diff: registros de inputs diferentes')
+        pairs = [(a, b) for a, b in ((self.values, other.values), (self.mins, other.mins),
+                                     (self.maxs, other.maxs), (self.visible, other.visible))
+                 if a != b]  # Comparação dos vetores inteiros, em C
+        if not pairs:
+            return []
+        try:
+            import numpy
+        except ImportError:
+            return sorted(set(i for a, b in pairs for i, (x, y) in enumerate(zip(a, b)) if x != y))
+        differ = numpy.zeros(len(self.widgets), dtype=bool)
+        for a, b in pairs:
+            differ |= numpy.frombuffer(a, dtype=a.typecode) != numpy.frombuffer(b, dtype=b.typecode)
+        return numpy.flatnonzero(differ).tolist()
+
+
+
+class _CardState(object):
+    """
+    Registro e restauração, em lote, do estado dos inputs numéricos dos cards
+    """
+
+    def _numericWidgets(self):
+        """
+        :return: Lista de tuplas (card, input) com os inputs numéricos do card,
+        visíveis ou não, incluindo os dos cards contidos nele
+        """
+        found = []
+        for widget in self._visIndex.members():
+            if getattr(widget, '_format', None) is not None:
+                found.append((self, widget))
+            elif isinstance(widget, _CardState):
+                found.extend(widget._numericWidgets())
+        return found
+
+
+    def snapshot(self):
+        """
+        Registra os valores, limites e visibilidade de todos os inputs numéricos
+        :return: CardSnapshot
+        """
+        pairs = self._numericWidgets()
+        formats = [w._format for _, w in pairs]
+        return CardSnapshot(tuple(c for c, _ in pairs), tuple(w for _, w in pairs),
+                            array('d', [w.value for _, w in pairs]),
+                            array('d', [f.vMin for f in formats]),
+                            array('d', [f.vMax for f in formats]),
+                            array('b', [c._visIndex.isVisible(w) for c, w in pairs]))
+
+
+    def restore(self, snapshot):
+        """
+        Restaura um registro feito por snapshot(). O registro todo é validado
+        antes (valores contra os seus limites, em um único passo) e só os inputs
+        que diferem do estado atual são alterados
+        :param snapshot: CardSnapshot deste card
+        :return: Número de inputs alterados
+        :raise ValueError: Se o registro não corresponder aos inputs atuais do card,
+        ou se algum valor estiver fora dos limites (nada é alterado)
+        """
+        pairs = self._numericWidgets()
+        if len(pairs) != len(snapshot) or any(w is not s for (_, w), s in zip(pairs, snapshot.widgets)):
+            raise ValueError('restore: o registro não corresponde aos inputs do card')
+        bad = ngformat.outOfBounds(snapshot.values, snapshot.mins, snapshot.maxs)
+        if bad:
+            raise ValueError('restore: {} valor(es) fora dos limites, índices {}'.format(
+                len(bad), bad[:10]))
+        changed = set()
+        visibility = {}
+        for i, (card, widget) in enumerate(pairs):
+            fmt = widget._format
+            value, vMin, vMax = snapshot.values[i], snapshot.mins[i], snapshot.maxs[i]
+            if fmt.vMin != vMin or fmt.vMax != vMax:
+                widget.configure(value, fmt.decimals, fmt.coerce(vMin), fmt.coerce(vMax))
+                changed.add(i)
+            elif widget.value != value:
+                widget.value = fmt.coerce(value)
+                changed.add(i)
+            if card._visIndex.isVisible(widget) != snapshot.visible[i]:
+                visibility.setdefault(card, {})[widget] = bool(snapshot.visible[i])
+                changed.add(i)
+        for card, changes in visibility.items():
+            card.setVisibleMany(changes)
+        return len(changed)
+
+
+
+class _LayoutCache(object):
+    """
+    Cache opcional do layout dos cards cujos filhos têm geometria fixa:
+    as posições e tamanhos calculados pelo layout são guardados por conjunto
+    de filhos visíveis (com as suas dicas de tamanho) e tamanho do card. Um
+    passo de layout com os mesmos dados só repõe os valores guardados, sem
+    executar o algoritmo do BoxLayout/GridLayout
+    """
+    _layoutCache = None     # OrderedDict chave -> (tamanho mínimo, geometria dos filhos)
+    _layoutInputs = ('spacing', 'padding', 'orientation')  # Propriedades que invalidam o cache
+    _LAYOUT_ENTRIES = 16    # Máximo de layouts guardados por card
+
+    def setFixedLayout(self, fixed=True):
+        """
+        Liga ou desliga o cache de layout. A chave do cache inclui o tamanho do
+        card e, para cada filho visível, size_hint, size_hint_min/max, pos_hint
+        e as dimensões sem dica; mudanças em spacing, padding, orientation (e,
+        no FormCard, nos parâmetros da grade) descartam todo o cache
+        :param fixed: Se True, liga o cache
+        """
+        if fixed and self._layoutCache is None:
+            self._layoutCache = OrderedDict()
+            self._layoutStats = [0, 0]  # acertos, faltas
+            for name in self._layoutInputs:
+                self.fbind(name, self._clearLayout)
+        elif not fixed and self._layoutCache is not None:
+            for name in self._layoutInputs:
+                self.funbind(name, self._clearLayout)
+            self._layoutCache = None
+
+
+    def isFixedLayout(self):
+        return self._layoutCache is not None
+
+
+    def layoutStats(self):
+        """
+        :return: Dicionário com os acertos e faltas do cache de layout e o número
+        de layouts guardados, ou None se o cache estiver desligado
+        """
+        if self._layoutCache is None:
+            return None
+        return {'hits': self._layoutStats[0], 'misses': self._layoutStats[1],
+                'entries': len(self._layoutCache)}
+
+
+    def _clearLayout(self, *args):
+        self._layoutCache.clear()
+
+
+    def do_layout(self, *args):
+        cache = self._layoutCache
+        if cache is None or not self.children:
+            return super().do_layout(*args)
+        children = self.children
+        key = (self.width, self.height, tuple(
+            (c.size_hint_x, c.size_hint_y,
+             c.width if c.size_hint_x is None else None,
+             c.height if c.size_hint_y is None else None,
+             tuple(c.size_hint_min), tuple(c.size_hint_max),
+             tuple(sorted(c.pos_hint.items())) if c.pos_hint else None)
+            for c in children))
+        entry = cache.get(key)
+        x, y = self.pos
+        if entry is None:
+            self._layoutStats[1] += 1
+            super().do_layout(*args)
+            cache[key] = (tuple(self.minimum_size),
+                          tuple((c.x - x, c.y - y, c.width, c.height) for c in children))
+            if len(cache) > self._LAYOUT_ENTRIES:
+                cache.popitem(last=False)
+            return
+        self._layoutStats[0] += 1
+        cache.move_to_end(key)
+        minimum, geometry = entry
+        self.minimum_size = minimum
+        for c, (dx, dy, w, h) in zip(children, geometry):
+            c.pos = (x + dx, y + dy)
+            shw, shh = c.size_hint  # Como no layout: só as dimensões com dica são definidas
+            if shw is None:
+                if shh is not None:
+                    c.height = h
+            elif shh is None:
+                c.width = w
+            else:
+                c.size = (w, h)
+
+
+
+class BoxCard(_CardState, _CardCanvas, _LayoutCache, BoxLayout):
+    """
+    Especialização do BoxLayout, com definição de cor de fundo (opcional)
+    e definição de uma borda
+    """
+    style = ObjectProperty(None)  # ngstyle.Style compartilhado (somente leitura)
+    
+    def __init__(self, style=None, **kwargs):
+        """
+        Construtor do BoxCard, acrescentando características próprias a ele:
+        :param style: Padrão de estilo a ser utilizado no desenho do componente
+        :param background_color: Cor de fundo do Widget (lista de 4 componentes)
+        :param border_color: Cor da borda do Widget (lista de 4 componentes)
+        :param weakHidden: Se True, os widgets invisíveis são guardados por referência
+        fraca: descartados pela aplicação, eles deixam o card (ver setVisible)
+        :param kwargs: Demais parâmetros de um BoxLayout
+        """
+        overrides = {k: kwargs.pop(k) for k in ('background_color', 'border_color', 'border_width')
+                     if k in kwargs}
+        self.style = ngstyle.resolve(style, 'BoxCard', overrides, self)
+        self._widgets = [] #  Relacao de widgets do card (todos)
+        self._visIndex = _VisibilityIndex(self._widgets, kwargs.pop('weakHidden', False),
+                                          owner=self)
+        
+        super().__init__(**kwargs)
+        
+        self._drawCanvas()
+        self.bind(size=self._markRect, pos=self._markRect)
 
 
     def add_widget(self, widget, index=0, canvas=None):
         """
         Sobrecarga do método add_widget, para montar a lista de widgets auxiliar,
         que será utilizado para tornar os componentes visíveis e invisíveis
-        
+        O índice se refere à lista auxiliar (todos os widgets, inclusive os invisíveis)
+        e é interpretado como em list.insert (negativos contam do fim; fora da
+        lista, vale o início ou o fim)
         """
-        if index:
-            self._widgets.insert(index, widget)
-        else:
-            self._widgets.insert(0, widget)
-           
-        super().add_widget(widget, index, canvas)
+        size = len(self._widgets)
+        index = min(index, size) if index >= 0 else max(size + index, 0)
+        self._visIndex.insert(index, widget)
+        super().add_widget(widget, self._visIndex.childIndex(index), canvas)
 
 
     def remove_widget(self, widget):
@@ -98,29 +992,58 @@ class BoxCard(BoxLayout):
         Sobrecarga do método remove_widget, para atualizar a lista de widgets auxiliar,
         que será utilizado para tornar os componentes visíveis e invisíveis
         """
-        if widget in self._widgets:
-            self._widgets.remove(widget)            
-        
+        self._visIndex.remove(widget)
         super().remove_widget(widget)
 
 
+    def isVisible(self, widget):
+        """
+        :param widget: Widget consultado
+        :return: Visibilidade do widget, ou None se ele não pertencer ao card
+        """
+        return self._visIndex.isVisible(widget)
+
+
     def setVisible(self, widget=None, visible=True):
         """
         Implementa uma propriedade de visibilidade de um widget. Se ele for
         visível, será parte dos children do BoxCard. Do contrário, só existirá
         na lista auxiliar. Ao tornar um componente visível, ele será inserido 
-        novamente no BoxCard
+        novamente no BoxCard, na posição relativa que ocupa na lista auxiliar
+        Dentro de um bloco visibilityBatch, a mudança só é aplicada ao final dele
+        Com weakHidden, o card não mantém vivo um widget invisível: para mostrá-lo
+        de novo, a aplicação deve guardar uma referência a ele
         :param widget: Widget cuja visibilidade será definida
         :param visible: Definne a visibilidade do componente
         """
-        if widget in self._widgets:
-            if visible:
-                if widget not in self.children:
-                    super().add_widget(widget, self._widgets.index(widget))
-            else:
-                if widget in self.children:
-                    super().remove_widget(widget)
-                    
+        self.setVisibleMany({widget: visible})
+
+
+    def setVisibleMany(self, changes):
+        """
+        Define a visibilidade de vários widgets de uma só vez, com um único
+        passo de layout do card
+        :param changes: Dicionário widget -> visibilidade. Widgets que não
+        pertencem ao card são ignorados
+        """
+        index = self._visIndex
+        if index.pending is not None:
+            index.pending.update(changes)
+        else:
+            index.apply(changes, super().add_widget, super().remove_widget)
+
+
+    def visibilityBatch(self):
+        """
+        Gerenciador de contexto para alterar a visibilidade de vários widgets
+        (com setVisible/setVisibleMany) e aplicar todas as mudanças ao final
+        do bloco:
+            with card.visibilityBatch():
+                for w in widgets:
+                    card.setVisible(w, filtro(w))
+        """
+        return self._visIndex.batch(self.setVisibleMany)
+
 
 
 class VerticalBoxCard(BoxCard):
@@ -147,12 +1070,15 @@ class HorizontalBoxCard(BoxCard):
         
 
 
-class FormCard(GridLayout):
+class FormCard(_CardState, _CardCanvas, _LayoutCache, GridLayout):
     """
     Especialização do GridLayout, com definição de cor de fundo (opcional)
     e definição de uma borda e limitado a 2 colunas (label + input)
     """
-    style = DictProperty()
+    style = ObjectProperty(None)  # ngstyle.Style compartilhado (somente leitura)
+    _layoutInputs = ('spacing', 'padding', 'orientation', 'cols', 'rows', 'col_default_width',
+                     'row_default_height', 'col_force_default', 'row_force_default',
+                     'cols_minimum', 'rows_minimum')
     
     def __init__(self, style=None, **kwargs):
         """
@@ -160,104 +1086,789 @@ class FormCard(GridLayout):
         :param style: Padrão de estilo a ser utilizado no desenho do componente
         :param background_color: Cor de fundo do Widget (lista de 4 componentes)
         :param border_color: Cor da borda do Widget (lista de 4 componentes)
+        :param weakHidden: Se True, os widgets invisíveis são guardados por referência
+        fraca: descartados pela aplicação, eles deixam o card (ver setVisible)
         :param kwargs: Demais parâmetros de um GridLayout
         """
-        if style is None:
-            self.style = ngstyle.getDefault().get('GridCard', {})
-        else:
-            self.style = style.get('GridCard', {})        
-        if 'background_color' in kwargs:
-            self.style['background_color'] = kwargs['background_color']
-            del kwargs['background_color']
-        if 'border_color' in kwargs:
-            self.style['border_color'] = kwargs['border_color']
-            del kwargs['border_color']
-        if 'border_width' in kwargs:
-            self.style['border_width'] = kwargs['border_width']
-            del kwargs['border_width']
+        overrides = {k: kwargs.pop(k) for k in ('background_color', 'border_color', 'border_width')
+                     if k in kwargs}
+        self.style = ngstyle.resolve(style, 'GridCard', overrides, self)
         self._widgets = [] #  Relacao de widgets do card (todos)
+        self._visIndex = _VisibilityIndex(self._widgets, kwargs.pop('weakHidden', False), 2,
+                                          self)
+        self.fields = {}  # Inputs nomeados (nome -> widget, com widget._fieldName), ver ngform
+        self.computed = None  # Campos calculados (ngform.FormGraph), ver ngform
         kwargs['cols'] = 2
         
         super().__init__(**kwargs)
         
-        with self.canvas.before:
-            if 'background_color' in self.style and self.style['background_color']:
-                Color(rgba=self.style['background_color'])
-                self._rect = Rectangle(pos=self.pos, size=self.size)
-            else:
-                self._rect = None
-            if 'border_color' in self.style and 'border_width' in self.style \
-                and self.style['border_color'] and self.style['border_width']:
-                Color(rgba=self.style['border_color'])
-                self._border = Line(rectangle=(self.x, self.y, self.width, self.height),
-                                    width=self.style['border_width'])
-            else:
-                self._border = None
-
-        self.bind(size=self._update_rect, pos=self._update_rect)
-
-
-    def _update_rect(self, *args):
-        """
-        Atualiza o canvas do card, ajustando dimensões do fundo e da borda,
-        se estes estiverem definidos
-        """
-        if self._rect:
-            self._rect.pos = self.pos
-            self._rect.size = self.size
-        if self._border:
-            self._border.rectangle = (self.x, self.y, self.width, self.height)
+        self._drawCanvas()
+        self.bind(size=self._markRect, pos=self._markRect)
 
 
     def add_widget(self, widget, index=0, canvas=None):
         """
         Sobrecarga do método add_widget, para montar a lista de widgets auxiliar,
         que será utilizado para tornar os componentes visíveis e invisíveis        
+        O índice se refere à lista auxiliar (todos os widgets, inclusive os invisíveis)
+        e é interpretado como em list.insert (negativos contam do fim; fora da
+        lista, vale o início ou o fim)
         """
-        if index:
-            self._widgets.insert(index, widget)
-        else:
-            self._widgets.insert(0, widget)
-           
-        super().add_widget(widget, index, canvas)
+        size = len(self._widgets)
+        index = min(index, size) if index >= 0 else max(size + index, 0)
+        self._visIndex.insert(index, widget)
+        super().add_widget(widget, self._visIndex.childIndex(index), canvas)
 
 
     def remove_widget(self, widget):
         """
         Sobrecarga do método remove_widget, para atualizar a lista de widgets auxiliar,
         que será utilizado para tornar os componentes visíveis e invisíveis
+        Um input nomeado (ver ngform) deixa também card.fields
         """
-        if widget in self._widgets:
-            self._widgets.remove(widget)            
-        
+        self._visIndex.remove(widget)
+        name = getattr(widget, '_fieldName', None)
+        if name is not None and self.fields.get(name) is widget:
+            del self.fields[name]
         super().remove_widget(widget)
 
 
+    def addWidgets(self, widgets):
+        """
+        Adiciona vários widgets de uma só vez, com o mesmo resultado de chamar
+        add_widget para cada um, na ordem (label, input, label, input...), mas
+        atualizando a lista auxiliar em uma única operação e com um único passo
+        de layout
+        :param widgets: Sequência de widgets
+        """
+        widgets = list(widgets)
+        self._visIndex.prepend(widgets)
+        add = super().add_widget
+        for widget in widgets:
+            add(widget)
+
+
+    def isVisible(self, widget):
+        """
+        :param widget: Widget consultado
+        :return: Visibilidade do widget, ou None se ele não pertencer ao card
+        """
+        return self._visIndex.isVisible(widget)
+
+
+    def _pairOf(self, widget):
+        """
+        :param widget: Widget do card
+        :return: O outro widget da mesma linha (label/input), ou None
+        """
+        pos = self._visIndex.slot(self._visIndex.key(widget))
+        if pos is None:
+            return None
+        if pos % 2:
+            return self._visIndex.resolve(self._widgets[pos - 1])
+        if pos < len(self._widgets) - 1:
+            return self._visIndex.resolve(self._widgets[pos + 1])
+        return None
+
+
     def setVisible(self, widget=None, visible=True):
         """
         Implementa uma propriedade de visibilidade de um widget. Se ele for
         visível, será parte dos children do BoxCard. Do contrário, só existirá
         na lista auxiliar. Ao tornar um componente visível, ele será inserido 
-        novamente no BoxCard
+        novamente no BoxCard. Como o card é organizado em linhas (label + input),
+        o outro widget da mesma linha acompanha a visibilidade do widget informado
+        Dentro de um bloco visibilityBatch, a mudança só é aplicada ao final dele
+        Com weakHidden, o card não mantém vivo um widget invisível: para mostrá-lo
+        de novo, a aplicação deve guardar uma referência a ele. Se um dos widgets
+        de uma linha invisível for descartado, a linha toda deixa o card
         :param widget: Widget cuja visibilidade será definida
         :param visible: Definne a visibilidade do componente
         """
-        if widget in self._widgets:
-            if visible:
-                if widget not in self.children:
-                    pos = self._widgets.index(widget)
-                    super().add_widget(widget, pos)
-                    if (pos%2):
-                        super().add_widget(self._widgets[pos-1], pos-1)
-                    else:
-                        if pos < len(self._widgets)-1:
-                            super().add_widget(self._widgets[pos+1], pos+1)
+        self.setVisibleMany({widget: visible})
+
+
+    def setVisibleMany(self, changes):
+        """
+        Define a visibilidade de vários widgets (e de seus pares de linha)
+        de uma só vez, com um único passo de layout do card
+        :param changes: Dicionário widget -> visibilidade. Widgets que não
+        pertencem ao card são ignorados
+        """
+        index = self._visIndex
+        index.purge()
+        rows = {}
+        for widget, visible in changes.items():
+            if index.key(widget) in index.visible:  # Com weakHidden, o invisível é um _Hidden
+                rows[widget] = visible
+                pair = self._pairOf(widget)
+                if pair is not None:
+                    rows[pair] = visible
+        if index.pending is not None:
+            index.pending.update(rows)
+        else:
+            index.apply(rows, super().add_widget, super().remove_widget)
+
+
+    def visibilityBatch(self):
+        """
+        Gerenciador de contexto para alterar a visibilidade de vários widgets
+        (com setVisible/setVisibleMany) e aplicar todas as mudanças ao final
+        do bloco, com um único passo de layout
+        """
+        return self._visIndex.batch(self.setVisibleMany)
+
+
+    def _detachAll(self):
+        self.fields.clear()
+        return super()._detachAll()
+
+
+    def dispose(self):
+        """
+        Libera o card (ver _CardCanvas.dispose), desfazendo antes os campos calculados
+        """
+        if self.computed is not None:
+            self.computed.clear()
+        super().dispose()
+
+
+
+class _RowRecycler(object):
+    """
+    Área de rolagem com linhas de widgets recicladas, comum ao VirtualFormCard
+    e ao TableCard. A classe que a usa define _view (índices das linhas do
+    modelo mostradas, em ordem) por _setView e fornece _newRow(), que cria uma
+    linha de widgets com o método bindRow(row)
+    """
+    row_height = NumericProperty(30)
+
+    def _initRecycler(self):
+        """
+        Cria a área de rolagem (self._scroll, a ser incluída no card pela
+        classe que a usa) e a área interna onde ficam as linhas
+        """
+        from kivy.uix.relativelayout import RelativeLayout
+        from kivy.uix.scrollview import ScrollView
+        self._view = []  # Índices das linhas mostradas, em ordem
+        self._pool = []  # Linhas de widgets (recicladas)
+        self._scroll = ScrollView(do_scroll_x=False)
+        self._viewport = RelativeLayout(size_hint_y=None)
+        self._scroll.add_widget(self._viewport)
+        self._trigger_refresh = Clock.create_trigger(self._refresh, -1)
+        self._scroll.bind(scroll_y=self._trigger_refresh, height=self._trigger_refresh)
+        self._viewport.bind(width=self._trigger_refresh)
+        self.bind(row_height=self._updViewport, spacing=self._updViewport)
+
+
+    def _disposeRecycler(self):
+        """
+        Libera as linhas de widgets recicladas
+        """
+        self._trigger_refresh.cancel()
+        for row in self._pool:
+            for cell in row.children:
+                cell.dispose()
+        self._pool = []
+        self._view = []
+
+
+    def _setView(self, view):
+        """
+        Define as linhas mostradas, desassociando as linhas de widgets
+        :param view: Sequência de índices das linhas do modelo, em ordem
+        """
+        self._view = view
+        for r in self._pool:
+            r.row = None
+        self._updViewport()
+
+
+    def _updViewport(self, *args):
+        """
+        Ajusta a altura da área de rolagem ao número de linhas mostradas
+        """
+        step = self.row_height + self.spacing
+        self._viewport.height = max(len(self._view) * step - self.spacing, 0)
+        self._trigger_refresh()
+
+
+    def _refresh(self, *args):
+        """
+        Posiciona as linhas de widgets na janela visível da rolagem, criando
+        novas linhas apenas quando a janela exige mais do que as já existentes
+        e reassociando as demais às linhas do modelo que ficaram visíveis
+        """
+        step = self.row_height + self.spacing
+        height = self._viewport.height
+        span = max(height - self._scroll.height, 0)
+        top = (1. - self._scroll.scroll_y) * span
+        first = max(int(top // step), 0)
+        count = max(min(int(self._scroll.height // step) + 2, len(self._view) - first), 0)
+        pool = self._pool
+        while len(pool) < count:
+            pool.append(self._newRow())
+        # Linhas que continuam na janela mantêm os seus widgets
+        rows = [int(i) for i in self._view[first:first + count]]
+        wanted = set(rows)
+        free = [r for r in pool if r.row not in wanted]
+        used = {r.row: r for r in pool if r.row in wanted}
+        for n, row in enumerate(rows):
+            widget = used.get(row)
+            if widget is None:
+                widget = free.pop()
+                widget.bindRow(row)
+            if widget.parent is None:
+                self._viewport.add_widget(widget)
+            widget.pos = (0, height - (first + n) * step - self.row_height)
+            widget.size = (self._viewport.width, self.row_height)
+        for widget in free:
+            if widget.parent is not None:
+                self._viewport.remove_widget(widget)
+
+
+
+class _FormRow(BoxLayout):
+    """
+    Linha reciclável de um VirtualFormCard (label + input)
+    Não guarda dados próprios: é associada, a cada rolagem, a uma linha do modelo
+    """
+
+    def __init__(self, card, style=None, **kwargs):
+        """
+        :param card: VirtualFormCard dono da linha
+        :param style: Padrão de estilo a ser utilizado no desenho dos componentes
+        :param kwargs: Demais parâmetros de um BoxLayout
+        """
+        # Importados aqui para que usar apenas os cards não carregue TextInput e afins
+        from kivyng.ngdisplay import AlignedLabel
+        from kivyng.nginput import NumericInput
+        kwargs['orientation'] = 'horizontal'
+        super().__init__(**kwargs)
+        self._card = card
+        self.row = None  # Índice da linha do modelo associada
+        self.label = AlignedLabel(style=style)
+        self.input = NumericInput(style=style)
+        self.add_widget(self.label)
+        self.add_widget(self.input)
+        self.input.bind(value=self._onValue)
+        self._binding = False
+
+
+    def bindRow(self, row):
+        """
+        Associa a linha de widgets a uma linha do modelo de dados
+        :param row: Índice da linha no modelo
+        """
+        self._binding = True
+        if self.input.focus:
+            self.input.focus = False
+        self.row = row
+        data = self._card._rows[row]
+        self.label.text = data.get('label', '')
+        self.input.configure(data.get('value', 0), data.get('decimals'),
+                             data.get('vMin', 0), data.get('vMax', 100))
+        self._binding = False
+
+
+    def _onValue(self, instance, value):
+        """
+        Repassa ao modelo os valores alterados pelo usuário
+        """
+        if not self._binding and self.row is not None:
+            self._card._rows[self.row]['value'] = value
+
+
+
+class VirtualFormCard(_RowRecycler, BoxCard):
+    """
+    Card de formulário (label + input) virtualizado, para milhares de linhas.
+    Os dados ficam em um modelo de linhas (lista de dicionários) e apenas as
+    linhas visíveis na área de rolagem possuem widgets, que são reciclados
+    durante a rolagem. A visibilidade é definida por linha, com a mesma
+    semântica de FormCard.setVisible (label e input aparecem ou somem juntos)
+    Cada linha do modelo pode ter as chaves:
+        name: Identificador da linha (opcional, default é o seu índice)
+        label: Texto do label
+        value, decimals, vMin, vMax: Parâmetros do NumericInput
+        visible: Visibilidade inicial da linha (default True)
+    """
+
+    def __init__(self, rows=None, style=None, **kwargs):
+        """
+        Construtor do VirtualFormCard
+        :param rows: Modelo de dados (lista de dicionários, um por linha)
+        :param style: Padrão de estilo a ser utilizado no desenho do componente
+        :param kwargs: Demais parâmetros de um BoxCard
+        """
+        kwargs['orientation'] = 'vertical'
+        super().__init__(style, **kwargs)
+        self._rowStyle = style
+        self._rows = []       # Modelo de dados
+        self._keys = {}       # name -> índice da linha no modelo
+        self._pending = None  # Mudanças de visibilidade de um lote
+        self._initRecycler()
+        super().add_widget(self._scroll)
+        self.setRows(rows or [])
+
+
+    def setRows(self, rows):
+        """
+        Substitui o modelo de dados do formulário
+        :param rows: Lista de dicionários, um por linha
+        :raise ValueError: Se o valor de alguma linha estiver fora dos limites
+        dela (vMin/vMax, por padrão 0 e 100). Nada é alterado
+        """
+        bad = ngformat.outOfBounds([r.get('value', 0) for r in rows],
+                                   [r.get('vMin', 0) for r in rows],
+                                   [r.get('vMax', 100) for r in rows])
+        if bad:
+            raise ValueError('VirtualFormCard: {} valor(es) fora dos limites, linhas {}'.format(
+                len(bad), bad[:10]))
+        self._rows = rows
+        self._keys = {r.get('name', i): i for i, r in enumerate(rows)}
+        for r in self._pool:
+            r.row = None
+        self._updView()
+
+
+    def reset(self, rows=None, **kwargs):
+        """
+        Restaura o formulário ao estado de um recém-criado (reaproveitamento por um pool)
+        :param rows: Novo modelo de dados
+        :param kwargs: Outras propriedades do card a serem definidas
+        """
+        self.setRows(rows or [])
+        self._scroll.scroll_y = 1.
+        for name, val in kwargs.items():
+            setattr(self, name, val)
+
+
+    def dispose(self):
+        """
+        Libera o formulário, inclusive as linhas de widgets recicladas
+        """
+        self._disposeRecycler()
+        self._rows = []
+        super().dispose()
+
+
+    def rowCount(self):
+        """
+        :return: Número de linhas do modelo (visíveis ou não)
+        """
+        return len(self._rows)
+
+
+    def getValue(self, key):
+        """
+        :param key: Identificador (name) ou índice da linha
+        :return: Valor numérico da linha
+        """
+        return self._rows[self._keys[key]].get('value', 0)
+
+
+    def setValue(self, key, value):
+        """
+        Altera o valor de uma linha, atualizando o widget se ela estiver na tela
+        :param key: Identificador (name) ou índice da linha
+        :param value: Novo valor
+        :raise ValueError: Se o valor estiver fora dos limites da linha
+        """
+        row = self._keys[key]
+        data = self._rows[row]
+        if not data.get('vMin', 0) <= value <= data.get('vMax', 100):
+            raise ValueError('VirtualFormCard.setValue: valor {!r} fora dos limites da '
+                             'linha {!r}'.format(value, key))
+        data['value'] = value
+        for r in self._pool:
+            if r.row == row:
+                r.bindRow(row)
+
+
+    def isVisible(self, key):
+        """
+        :param key: Identificador (name) ou índice da linha
+        :return: Visibilidade da linha, ou None se ela não existir
+        """
+        row = self._keys.get(key)
+        if row is None:
+            return None
+        return self._rows[row].get('visible', True)
+
+
+    def setVisible(self, key=None, visible=True):
+        """
+        Define a visibilidade de uma linha do formulário (label + input)
+        Dentro de um bloco visibilityBatch, a mudança só é aplicada ao final dele
+        :param key: Identificador (name) ou índice da linha
+        :param visible: Define a visibilidade da linha
+        """
+        self.setVisibleMany({key: visible})
+
+
+    def setVisibleMany(self, changes):
+        """
+        Define a visibilidade de várias linhas de uma só vez
+        :param changes: Dicionário chave da linha -> visibilidade. Chaves
+        inexistentes são ignoradas
+        """
+        if self._pending is not None:
+            self._pending.update(changes)
+            return
+        changed = False
+        for key, visible in changes.items():
+            row = self._keys.get(key)
+            if row is not None and self._rows[row].get('visible', True) != bool(visible):
+                self._rows[row]['visible'] = bool(visible)
+                changed = True
+        if changed:
+            self._updView()
+
+
+    @contextmanager
+    def visibilityBatch(self):
+        """
+        Gerenciador de contexto para alterar a visibilidade de várias linhas
+        e aplicar todas as mudanças ao final do bloco
+        """
+        outer = self._pending is None
+        if outer:
+            self._pending = {}
+        try:
+            yield
+        finally:
+            if outer:
+                changes, self._pending = self._pending, None
+                self.setVisibleMany(changes)
+
+
+    def _updView(self, *args):
+        """
+        Recalcula a lista de linhas visíveis e a altura da área de rolagem
+        """
+        self._setView([i for i, r in enumerate(self._rows) if r.get('visible', True)])
+
+
+    def _newRow(self):
+        return _FormRow(self, self._rowStyle, size_hint=(None, None), spacing=self.spacing)
+
+
+
+class _TableRow(BoxLayout):
+    """
+    Linha reciclável de um TableCard: uma célula por coluna (AlignedLabel, ou
+    NumericInput nas colunas editáveis). Não guarda dados próprios
+    """
+
+    def __init__(self, card, style=None, **kwargs):
+        """
+        :param card: TableCard dono da linha
+        :param style: Padrão de estilo a ser utilizado no desenho das células
+        :param kwargs: Demais parâmetros de um BoxLayout
+        """
+        from kivyng.ngdisplay import AlignedLabel
+        from kivyng.nginput import NumericInput
+        kwargs['orientation'] = 'horizontal'
+        super().__init__(**kwargs)
+        self._card = card
+        self.row = None  # Índice da linha dos dados associada
+        self.cells = []
+        for col, fmt in zip(card._columns, card._formats):
+            if col.get('editable'):
+                # Valor inicial finito (o vMin de uma coluna sem limites é -inf)
+                value = min(max(0, fmt.vMin), fmt.vMax)
+                cell = NumericInput(value, fmt.decimals, fmt.vMin, fmt.vMax, style,
+                                    fmt.unit, size_hint_x=col.get('width', 1))
+                cell.bind(value=self._onValue)
+            else:
+                cell = AlignedLabel(style=style, size_hint_x=col.get('width', 1))
+            self.cells.append(cell)
+            self.add_widget(cell)
+        self._binding = False
+
+
+    def bindRow(self, row):
+        """
+        Associa a linha de widgets a uma linha dos dados
+        :param row: Índice da linha nos dados
+        """
+        self._binding = True
+        self.row = row
+        data = self._card._data
+        for col, fmt, cell in zip(self._card._columns, self._card._formats, self.cells):
+            value = data[col['name']][row]
+            if hasattr(cell, 'configure'):
+                if cell.focus:
+                    cell.focus = False
+                if cell._format is fmt:
+                    cell.value = fmt.coerce(value)
+                else:
+                    cell.configure(value, fmt.decimals, fmt.vMin, fmt.vMax, fmt.unit)
             else:
-                if widget in self.children:
-                    pos = self._widgets.index(widget)
-                    super().remove_widget(widget)
-                    if (pos%2):
-                        super().remove_widget(self._widgets[pos-1])
-                    else:
-                        if pos < len(self._widgets)-1:
-                            super().remove_widget(self._widgets[pos+1])
+                cell.text = fmt.format(value)
+        self._binding = False
+
+
+    def _onValue(self, cell, value):
+        """
+        Repassa aos dados os valores alterados pelo usuário
+        """
+        if not self._binding and self.row is not None:
+            col = self._card._columns[self.cells.index(cell)]
+            self._card._data[col['name']][self.row] = value
+
+
+
+class TableCard(_RowRecycler, BoxCard):
+    """
+    Tabela virtualizada sobre dados em colunas (arrays do numpy, se ele estiver
+    disponível, ou array('d')). Ordenação (argsort) e filtragem (máscaras
+    booleanas) operam só sobre os índices das linhas, sem tocar nos widgets;
+    apenas as linhas visíveis na área de rolagem possuem widgets, reciclados
+    durante a rolagem. Cada coluna é descrita por um dicionário com:
+        name: Nome da coluna (chave dos dados)
+        title: Título no cabeçalho (default é o nome)
+        decimals, vMin, vMax, unit: Formatação e limites, como no NumericInput
+        editable: Se True, as células são NumericInput (default False: AlignedLabel).
+                  Os valores de uma coluna editável precisam estar entre os
+                  seus limites (verificados em setData e setValue)
+        width: Largura relativa da coluna (default 1)
+    Um toque no título de uma coluna ordena a tabela por ela (e inverte a ordem
+    no toque seguinte)
+    """
+
+    def __init__(self, columns, data=None, style=None, **kwargs):
+        """
+        Construtor do TableCard
+        :param columns: Lista de dicionários, um por coluna
+        :param data: Dicionário nome da coluna -> sequência de valores
+        :param style: Padrão de estilo a ser utilizado no desenho do card e das células
+        :param kwargs: Demais parâmetros de um BoxCard
+        """
+        from kivyng.ngdisplay import AlignedLabel
+        kwargs['orientation'] = 'vertical'
+        super().__init__(style, **kwargs)
+        try:
+            import numpy
+        except ImportError:
+            numpy = None
+        self._numpy = numpy
+        self._cellStyle = style
+        self._columns = [dict(c) for c in columns]
+        self._formats = [ngformat.getFormat(c.get('decimals'), c.get('vMin', float('-inf')),
+                                            c.get('vMax', float('inf')), unit=c.get('unit', ''))
+                         for c in self._columns]
+        self._data = {}
+        self._rows = 0
+        self._order = None    # Índices das linhas na ordem atual (None: ordem original)
+        self._mask = None     # Máscara booleana do filtro (None: sem filtro)
+        self._sortKey = None  # (coluna, reverse) da ordenação atual
+        self._header = BoxLayout(orientation='horizontal', size_hint_y=None,
+                                 height=self.row_height)
+        for col in self._columns:
+            title = AlignedLabel(style=style, text=col.get('title', col['name']),
+                                 size_hint_x=col.get('width', 1))
+            title.bind(on_touch_down=self._onTitle)
+            title.column = col['name']
+            self._header.add_widget(title)
+        self._initRecycler()
+        super().add_widget(self._header)
+        super().add_widget(self._scroll)
+        self.setData(data or {c['name']: [] for c in self._columns})
+
+
+    def setData(self, data):
+        """
+        Substitui os dados da tabela, mantendo a ordenação (refeita sobre os
+        novos dados) e descartando o filtro
+        :param data: Dicionário nome da coluna -> sequência de valores (todas
+        do mesmo tamanho)
+        :raise ValueError: Se as colunas tiverem tamanhos diferentes, ou se uma
+        coluna editável tiver valores fora dos seus limites (ou NaN)
+        """
+        columns = {}
+        for col in self._columns:
+            values = data[col['name']]
+            if self._numpy is not None:
+                columns[col['name']] = self._numpy.asarray(values, dtype=float)
+            else:
+                columns[col['name']] = values if isinstance(values, array) else array('d', values)
+        sizes = set(len(v) for v in columns.values())
+        if len(sizes) > 1:
+            raise ValueError('TableCard: colunas com tamanhos diferentes')
+        for col, fmt in zip(self._columns, self._formats):
+            if col.get('editable'):
+                values = columns[col['name']]
+                bad = ngformat.outOfBounds(values, [fmt.vMin] * len(values),
+                                           [fmt.vMax] * len(values))
+                if bad:
+                    raise ValueError('TableCard: {} valor(es) fora dos limites na coluna {!r}, '
+                                     'linhas {}'.format(len(bad), col['name'], bad[:10]))
+        self._data = columns
+        self._rows = sizes.pop() if sizes else 0
+        self._mask = None
+        if self._sortKey is not None:
+            self.sort(*self._sortKey)
+        else:
+            self._order = None
+            self._updView()
+
+
+    def reset(self, data=None, **kwargs):
+        """
+        Restaura a tabela ao estado de uma recém-criada (reaproveitamento por um pool)
+        :param data: Novos dados
+        :param kwargs: Outras propriedades do card a serem definidas
+        """
+        self._sortKey = None
+        self.setData(data or {c['name']: [] for c in self._columns})
+        self._scroll.scroll_y = 1.
+        for name, val in kwargs.items():
+            setattr(self, name, val)
+
+
+    def dispose(self):
+        """
+        Libera a tabela, inclusive as linhas de widgets recicladas e os dados
+        """
+        self._disposeRecycler()
+        for title in self._header.children:
+            title.dispose()
+        self._data = {}
+        super().dispose()
+
+
+    def rowCount(self):
+        """
+        :return: Número de linhas dos dados (filtradas ou não)
+        """
+        return self._rows
+
+
+    def view(self):
+        """
+        :return: Índices das linhas mostradas, na ordem em que aparecem
+        """
+        return self._view
+
+
+    def getValue(self, row, column):
+        """
+        :param row: Índice da linha nos dados
+        :param column: Nome da coluna
+        :return: Valor da célula
+        """
+        return self._data[column][row]
+
+
+    def setValue(self, row, column, value):
+        """
+        Altera o valor de uma célula, atualizando o widget se a linha estiver na tela
+        (a ordenação e o filtro não são refeitos)
+        :param row: Índice da linha nos dados
+        :param column: Nome da coluna
+        :param value: Novo valor
+        :raise ValueError: Se a coluna for editável e o valor estiver fora dos seus limites
+        """
+        for col, fmt in zip(self._columns, self._formats):
+            if col['name'] == column and col.get('editable') and not fmt.check(value):
+                raise ValueError('TableCard.setValue: valor {!r} fora dos limites da '
+                                 'coluna {!r}'.format(value, column))
+        self._data[column][row] = value
+        for r in self._pool:
+            if r.row == row:
+                r.bindRow(row)
+
+
+    def sort(self, column=None, reverse=False):
+        """
+        Ordena a tabela por uma coluna. A ordenação é estável nas duas ordens
+        (valores iguais mantêm a ordem original) e os NaN ficam no fim
+        :param column: Nome da coluna. Se None, volta à ordem original dos dados
+        :param reverse: Se True, em ordem decrescente
+        """
+        if column is None:
+            self._sortKey = self._order = None
+        else:
+            self._sortKey = (column, reverse)
+            values = self._data[column]
+            if self._numpy is not None:  # argsort põe os NaN no fim (e -NaN é NaN)
+                self._order = self._numpy.argsort(-values if reverse else values, kind='stable')
+            else:
+                sign = -1 if reverse else 1
+                self._order = sorted(range(self._rows), key=lambda i: (
+                    (1, 0.) if values[i] != values[i] else (0, sign * values[i])))
+        self._updView()
+
+
+    def filter(self, mask=None):
+        """
+        Mostra apenas as linhas selecionadas por uma máscara
+        :param mask: Sequência booleana, uma posição por linha dos dados (ex: o
+        resultado de uma comparação entre arrays do numpy). Se None, mostra todas
+        """
+        if mask is not None and len(mask) != self._rows:
+            raise ValueError('TableCard.filter: máscara com {} posições para {} linhas'.format(
+                len(mask), self._rows))
+        if mask is not None and self._numpy is not None:
+            mask = self._numpy.asarray(mask, dtype=bool)
+        self._mask = mask
+        self._updView()
+
+
+    def filterRange(self, column, vMin=None, vMax=None):
+        """
+        Atalho para filtrar as linhas cujo valor em uma coluna está em um intervalo
+        :param column: Nome da coluna
+        :param vMin: Menor valor aceito (None: sem limite)
+        :param vMax: Maior valor aceito (None: sem limite)
+        """
+        values = self._data[column]
+        lo = float('-inf') if vMin is None else vMin
+        hi = float('inf') if vMax is None else vMax
+        if self._numpy is not None:
+            self.filter((values >= lo) & (values <= hi))
+        else:
+            self.filter([lo <= v <= hi for v in values])
+
+
+    def _onTitle(self, title, touch):
+        """
+        Toque no título de uma coluna: ordena por ela, invertendo a ordem se
+        ela já for a coluna da ordenação
+        """
+        if not title.collide_point(*touch.pos):
+            return False
+        key = self._sortKey
+        self.sort(title.column, key is not None and key[0] == title.column and not key[1])
+        return True
+
+
+    def _updView(self, *args):
+        """
+        Recalcula os índices das linhas mostradas (ordem e filtro) e a altura
+        da área de rolagem
+        """
+        order, mask = self._order, self._mask
+        if self._numpy is not None:
+            if order is None:
+                order = self._numpy.arange(self._rows)
+            view = order if mask is None else order[mask[order]]
+        else:
+            if order is None:
+                order = range(self._rows)
+            view = list(order) if mask is None else [i for i in order if mask[i]]
+        self._setView(view)
+
+
+    def _updViewport(self, *args):
+        """
+        Ajusta a altura do cabeçalho e a da área de rolagem
+        """
+        self._header.height = self.row_height
+        super()._updViewport()
+
+
+    def _newRow(self):
+        return _TableRow(self, self._cellStyle, size_hint=(None, None), spacing=self.spacing)
@@ -11,19 +11,127 @@ __email__    = "cticarlo@gmail.com"
 __status__   = "Prototype"
 """
 
-from kivy.properties import DictProperty
-from kivy.graphics import Rectangle, Color
+from array import array
+from collections import OrderedDict
+from kivy.properties import ObjectProperty, NumericProperty, StringProperty, OptionProperty
+from kivy.graphics import Rectangle, Color, Mesh
 from kivy.uix.label import Label
+from kivy.uix.widget import Widget
+from kivy.core.text import Label as CoreLabel, DEFAULT_FONT
 import kivyng.ngstyle as ngstyle
+import kivyng.ngframe as ngframe
+import kivyng.ngformat as ngformat
+
+
+_textureBudget = 8 * 1024 * 1024  # Memória máxima (bytes) das texturas de texto em cache (0: sem cache)
+_textures = OrderedDict()  # chave -> (textura, is_shortened, bytes); o usado há mais tempo vem primeiro
+_textureBytes = 0
+_textureStats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+
+def setTextureBudget(budget):
+    """
+    Define a memória máxima do cache de texturas de texto, compartilhado por
+    todos os AlignedLabel: labels com o mesmo texto, fonte, tamanho, cor e
+    área de alinhamento usam uma única textura. Se necessário, as texturas
+    usadas há mais tempo são descartadas do cache. O limite é aproximado: ele
+    se refere às texturas guardadas no cache, e uma textura descartada continua
+    na memória enquanto algum label ainda a mostrar
+    :param budget: Memória em bytes. Com 0, o cache é desligado
+    """
+    global _textureBudget
+    _textureBudget = budget
+    _trimTextures(0)
+
+
+def textureStats():
+    """
+    :return: Dicionário com os acertos e faltas do cache de texturas de texto,
+    a taxa de acertos, as texturas descartadas por falta de memória
+    (evictions), o número de texturas, a memória ocupada por elas no cache e
+    o limite (bytes). A memória não inclui as texturas já descartadas do cache
+    que ainda estão em uso por algum label
+    """
+    result = dict(_textureStats)
+    lookups = result['hits'] + result['misses']
+    result.update(hitRate=result['hits'] / lookups if lookups else 0., textures=len(_textures),
+                  bytes=_textureBytes, budget=_textureBudget)
+    return result
+
+
+def resetTextureStats():
+    for k in _textureStats:
+        _textureStats[k] = 0
+
+
+def clearTextureCache():
+    """
+    Descarta todas as texturas do cache (as que estão em uso continuam nos labels)
+    """
+    global _textureBytes
+    _textures.clear()
+    _textureBytes = 0
+
+
+def _trimTextures(size):
+    """
+    Retira do cache as texturas usadas há mais tempo, até caber mais size bytes
+    """
+    global _textureBytes
+    while _textures and _textureBytes + size > _textureBudget:
+        _textureBytes -= _textures.popitem(last=False)[1][2]
+        _textureStats['evictions'] += 1
+
+
+def _renderText(options):
+    """
+    Rasteriza um texto em um CoreLabel próprio, que não é mais alterado:
+    a textura é preenchida (no primeiro desenho) sempre com o mesmo conteúdo
+    :return: (textura ou None, is_shortened)
+    """
+    label = CoreLabel(**options)
+    label.refresh()
+    texture = label.texture
+    if texture is None or texture.width <= 1 or texture.height <= 1:
+        return None, label.is_shortened
+    return texture, label.is_shortened
+
+
+def prewarmTextures(label, texts):
+    """
+    Prepara antecipadamente, no cache, as texturas de um vocabulário conhecido
+    (ex: unidades, palavras de estado), com a fonte, cor e área de um label
+    de referência. Havendo janela (contexto GL), as texturas já são enviadas
+    à placa de vídeo
+    :param label: AlignedLabel de referência (do tamanho final)
+    :param texts: Textos a preparar
+    :return: Número de texturas criadas
+    """
+    from kivy.base import EventLoop
+    created = 0
+    for text in texts:
+        options, key = label._textureKey(text)
+        if key in _textures or not text:
+            continue
+        texture, shortened = _renderText(options)
+        if texture is not None:
+            label._storeTexture(key, texture, shortened)
+            if EventLoop.window is not None:
+                texture.bind()
+            created += 1
+    return created
+
 
 
 class AlignedLabel (Label):
     """
     Estende o widget Label, fazendo com que o texto dele assuma
     toda a área disponível, e assim possa trabalhar com alinhamento
-    Além disso, inclui um preenchimento de fundo opcional
+    Além disso, inclui um preenchimento de fundo opcional. As texturas de
+    texto são compartilhadas entre os labels (ver setTextureBudget)
     """
-    style = DictProperty()
+    style = ObjectProperty(None)  # ngstyle.Style compartilhado (somente leitura)
+    _batch = None  # Lote (ngbatch) do qual o label participa
     
     def __init__(self, style=None, **kwargs):
         """
@@ -32,40 +140,150 @@ class AlignedLabel (Label):
         :param background_color: Cor de fundo do Widget (lista de 4 componentes)
         :param kwargs: Demais parâmetros de um Label
         """
-        if style is None:
-            self.style = ngstyle.getDefault().get('AlignedLabel', {})
-        else:
-            self.style = style.get('AlignedLabel', {})  
-
-        if 'color' in kwargs:
-            self.style['color'] = kwargs['color']
-        elif 'color' in self.style:
-            kwargs['color'] = self.style['color']
-            
-        if 'halign' in kwargs:
-            self.style['halign'] = kwargs['halign']
-        elif 'halign' in self.style:
-            kwargs['halign'] = self.style['halign']
-        
-        if 'valign' in kwargs:
-            self.style['valign'] = kwargs['valign']
-        elif 'valign' in self.style:
-            kwargs['valign'] = self.style['valign']
-                    
-        if 'background_color' in kwargs:  
-            self.style['background_color'] = kwargs['background_color']
-            del kwargs['background_color']
-            
+        overrides = {k: kwargs[k] for k in ('color', 'halign', 'valign') if k in kwargs}
+        if 'background_color' in kwargs:
+            overrides['background_color'] = kwargs.pop('background_color')
+        self.style = ngstyle.resolve(style, 'AlignedLabel', overrides, self)
+        for k in ('color', 'halign', 'valign'):
+            if k in self.style and k not in kwargs:
+                kwargs[k] = self.style[k]
+
         super().__init__(**kwargs)
         
+        self._bgColor = self._rect = None
         if 'background_color' in self.style:
             with self.canvas.before:
-                Color(rgba=self.style['background_color'])
+                self._bgColor = Color(rgba=self.style['background_color'])
                 self._rect = Rectangle(pos=self.pos, size=self.size)                
         
-        self.bind(size=self._updTextSize, pos=self._updTextSize)
+        self.bind(size=self._markTextSize, pos=self._markTextSize)
      
         
+    def applyStyle(self, style, changed):
+        """
+        Aplica um novo estilo ao label já criado (troca de tema), alterando
+        apenas as propriedades afetadas pelas chaves que mudaram
+        :param style: Novo estilo (ngstyle.Style)
+        :param changed: Conjunto com as chaves do estilo que mudaram
+        """
+        self.style = style
+        for k in ('color', 'halign', 'valign'):
+            if k in changed and k in style:
+                setattr(self, k, style[k])
+        if 'background_color' in changed:
+            rgba = style.get('background_color') or (0, 0, 0, 0)
+            if self._bgColor is None:
+                with self.canvas.before:
+                    self._bgColor = Color(rgba=rgba)
+                    self._rect = Rectangle(pos=self.pos, size=self.size)
+            else:
+                self._bgColor.rgba = rgba
+        if self._batch is not None:
+            self._batch.restyle(self)
+
+
+    def _batchQuads(self):
+        """
+        :return: Retângulo de fundo do label, para o desenho em lote (ngbatch)
+        """
+        if self._rect is None or not self._bgColor.a:
+            return []
+        return [(0, self._bgColor.rgba, self.x, self.y, self.width, self.height)]
+
+
+    def _batchInstructions(self):
+        return [] if self._rect is None else [self._bgColor, self._rect]
+
+
+    def reset(self, text='', **kwargs):
+        """
+        Restaura o label ao estado de um recém-criado (reaproveitamento por um pool)
+        :param text: Texto do label
+        :param kwargs: Outras propriedades do Label a serem definidas
+        """
+        self.text = text
+        for name, val in kwargs.items():
+            setattr(self, name, val)
+
+
+    def dispose(self):
+        """
+        Libera o label: retira-o do parent (e do desenho em lote, ngbind),
+        desfaz as ligações de eventos e descarta as instruções de canvas.
+        O label não deve ser usado depois disso
+        """
+        import kivyng.ngbind as ngbind
+        if self.parent is not None:
+            self.parent.remove_widget(self)
+        if self._batch is not None:
+            self._batch.discard(self)
+        ngbind.forget(self)
+        self.unbind(size=self._markTextSize, pos=self._markTextSize)
+        ngframe.discard(self._updTextSize)
+        self.canvas.before.clear()
+        self.canvas.clear()
+        self._bgColor = self._rect = None
+
+
+    def _textureKey(self, text=None):
+        """
+        :param text: Texto (se None, o do próprio label)
+        :return: Tupla (parâmetros do CoreLabel, chave no cache de texturas)
+        """
+        options = {name: getattr(self, name) for name in self._font_properties}
+        if text is not None:
+            options['text'] = text
+        if self.disabled:
+            options['color'] = self.disabled_color
+            options['outline_color'] = self.disabled_outline_color
+        options['usersize'] = options['text_size']
+        return options, tuple(ngstyle._freeze(v) for v in options.values())
+
+
+    def _storeTexture(self, key, texture, shortened):
+        global _textureBytes
+        size = texture.width * texture.height * 4
+        if size <= _textureBudget:
+            _trimTextures(size)
+            _textures[key] = (texture, shortened, size)
+            _textureBytes += size
+
+
+    def texture_update(self, *args):
+        """
+        Sobrecarga do texture_update do Label: com o cache de texturas ligado
+        (setTextureBudget), um texto já rasterizado com a mesma fonte, cor e
+        área reaproveita a textura do cache, sem nova rasterização
+        """
+        if not _textureBudget or self.markup or not self.text.strip():
+            return super().texture_update(*args)
+        options, key = self._textureKey()
+        entry = _textures.get(key)
+        if entry is None:
+            _textureStats['misses'] += 1
+            texture, shortened = _renderText(options)
+            if texture is not None:
+                self._storeTexture(key, texture, shortened)
+        else:
+            _textureStats['hits'] += 1
+            _textures.move_to_end(key)
+            texture, shortened = entry[:2]
+        if texture is None:
+            self.texture = None
+            self.texture_size = (0, 0)
+        else:
+            self.texture = texture
+            self.texture_size = list(texture.size)
+        self.is_shortened = shortened
+
+
+    def _markTextSize(self, *args):
+        """
+        Agenda a atualização do text_size e do fundo para o próximo quadro
+        """
+        ngframe.mark(self._updTextSize)
+
+
     def _updTextSize(self, *args):
         """
         Atualiza as dimensões do texto e do retângulo de fundo (se houver)
@@ -74,9 +292,440 @@ class AlignedLabel (Label):
         não empregado nesta função
         """
         self.text_size = self.size
-        if 'background_color' in self.style and self.style['background_color']:
+        if self._rect is not None:
             self._rect.pos = self.pos
             self._rect.size = self.size
-        
- 
-        
\ No newline at end of file
+
+
+
+class _GlyphAtlas(object):
+    """
+    Atlas de glifos: todos os caracteres de um conjunto são rasterizados uma
+    única vez, em uma só textura, por fonte/tamanho. Cada glifo é descrito
+    pela sua largura e pelas coordenadas de textura da sua região no atlas
+    Use getAtlas(), que compartilha os atlas entre os widgets
+    """
+    BASE = '0123456789+-.,eE '
+
+    def __init__(self, font_name, font_size, chars):
+        label = CoreLabel(text=' '.join(chars), font_name=font_name, font_size=font_size)
+        label.refresh()
+        self.texture = label.texture
+        self.height = self.texture.height
+        self.glyphs = {}  # caractere -> (largura, coordenadas de textura)
+        for i, ch in enumerate(chars):
+            x = label.get_extents(' '.join(chars[:i]) + ' ')[0] if i else 0
+            w = label.get_extents(ch)[0]
+            self.glyphs[ch] = (w, self.texture.get_region(x, 0, w, self.height).tex_coords)
+
+
+
+_atlases = {}
+
+
+def getAtlas(font_name=DEFAULT_FONT, font_size=15, extra=''):
+    """
+    Retorna o atlas (compartilhado) de uma fonte e tamanho, contendo os
+    caracteres numéricos e, opcionalmente, outros caracteres (ex: unidades)
+    :param font_name: Nome ou arquivo da fonte
+    :param font_size: Tamanho da fonte
+    :param extra: Caracteres adicionais
+    :return: _GlyphAtlas
+    """
+    chars = ''.join(sorted(set(_GlyphAtlas.BASE + extra)))
+    key = (font_name, font_size, chars)
+    atlas = _atlases.get(key)
+    if atlas is None:
+        atlas = _atlases[key] = _GlyphAtlas(font_name, font_size, chars)
+    return atlas
+
+
+
+class NumericDisplay(Widget):
+    """
+    Mostrador numérico somente leitura, para valores que mudam a todo quadro.
+    Em vez de rasterizar uma nova textura a cada mudança (como um Label), os
+    dígitos, sinal, ponto decimal e unidade são desenhados a partir de um atlas
+    de glifos compartilhado, com um único Mesh: uma mudança de valor apenas
+    reescreve os vértices do Mesh. Mantém o alinhamento (halign/valign) e a
+    cor de fundo opcional do AlignedLabel
+    """
+    value = NumericProperty(0)
+    text = StringProperty('')
+    halign = OptionProperty('right', options=['left', 'center', 'right'])
+    valign = OptionProperty('center', options=['bottom', 'middle', 'center', 'top'])
+    style = ObjectProperty(None)  # ngstyle.Style compartilhado (somente leitura)
+
+    def __init__(self, value=0, decimals=None, unit='', style=None, font_name=DEFAULT_FONT,
+                 font_size=15, **kwargs):
+        """
+        Construtor do NumericDisplay
+        :param value: Valor inicial
+        :param decimals: Número de casas decimais. Se None, o número é inteiro
+        :param unit: Unidade mostrada após o valor (ex: 'V')
+        :param style: Padrão de estilo a ser utilizado no desenho do componente
+        :param font_name: Fonte dos dígitos
+        :param font_size: Tamanho da fonte (o atlas é criado uma vez por fonte/tamanho)
+        :param background_color: Cor de fundo do Widget (lista de 4 componentes)
+        :param color: Cor dos dígitos (lista de 4 componentes)
+        :param kwargs: Demais parâmetros de um Widget
+        """
+        overrides = {k: kwargs.pop(k) for k in ('background_color', 'color') if k in kwargs}
+        overrides.update((k, kwargs[k]) for k in ('halign', 'valign') if k in kwargs)
+        self.style = ngstyle.resolve(style, 'NumericDisplay', overrides, self)
+        for k in ('halign', 'valign'):
+            if k in self.style and k not in kwargs:
+                kwargs[k] = self.style[k]
+        super().__init__(**kwargs)
+
+        self._format = ngformat.getFormat(decimals, float('-inf'), float('inf'), unit=unit)
+        self._atlas = getAtlas(font_name, font_size, unit)
+        self._count = -1  # Número de glifos do Mesh (para só refazer os índices se mudar)
+        self._bgColor = self._rect = None
+        if self.style.get('background_color'):
+            with self.canvas.before:
+                self._bgColor = Color(rgba=self.style['background_color'])
+                self._rect = Rectangle(pos=self.pos, size=self.size)
+        with self.canvas:
+            self._color = Color(rgba=self.style.get('color', (1, 1, 1, 1)))
+            self._mesh = Mesh(mode='triangles', texture=self._atlas.texture)
+
+        self.bind(size=self._markMesh, pos=self._markMesh, text=self._markMesh,
+                  halign=self._markMesh, valign=self._markMesh)
+        self.value = value
+        self.on_value()
+
+
+    def on_value(self, *args):
+        """
+        Atualiza o texto a partir do valor (o Mesh é refeito no próximo quadro)
+        """
+        self.text = self._format.format(self.value)
+
+
+    def formatValue(self, value):
+        """
+        Formata um valor numérico como ele é apresentado no mostrador
+        """
+        return self._format.format(value)
+
+
+    def applyStyle(self, style, changed):
+        """
+        Aplica um novo estilo ao mostrador já criado (troca de tema), alterando
+        apenas as propriedades afetadas pelas chaves que mudaram
+        :param style: Novo estilo (ngstyle.Style)
+        :param changed: Conjunto com as chaves do estilo que mudaram
+        """
+        self.style = style
+        for k in ('halign', 'valign'):
+            if k in changed and k in style:
+                setattr(self, k, style[k])
+        if 'color' in changed:
+            self._color.rgba = style.get('color', (1, 1, 1, 1))
+        if 'background_color' in changed:
+            rgba = style.get('background_color') or (0, 0, 0, 0)
+            if self._bgColor is None:
+                with self.canvas.before:
+                    self._bgColor = Color(rgba=rgba)
+                    self._rect = Rectangle(pos=self.pos, size=self.size)
+            else:
+                self._bgColor.rgba = rgba
+
+
+    def dispose(self):
+        """
+        Libera o mostrador: retira-o do parent (e do ngbind), desfaz as ligações
+        de eventos e descarta as instruções de canvas. Ele não deve ser usado
+        depois disso
+        """
+        import kivyng.ngbind as ngbind
+        if self.parent is not None:
+            self.parent.remove_widget(self)
+        ngbind.forget(self)
+        self.unbind(size=self._markMesh, pos=self._markMesh, text=self._markMesh,
+                    halign=self._markMesh, valign=self._markMesh)
+        ngframe.discard(self._updMesh)
+        self.canvas.before.clear()
+        self.canvas.clear()
+        self._bgColor = self._rect = None
+
+
+    def _markMesh(self, *args):
+        """
+        Agenda a atualização do Mesh para o próximo quadro
+        """
+        ngframe.mark(self._updMesh)
+
+
+    def _updMesh(self, *args):
+        """
+        Reescreve os vértices do Mesh (posição e coordenadas de textura de cada
+        glifo) para o texto atual. Caracteres ausentes no atlas são ignorados
+        """
+        glyphs = self._atlas.glyphs
+        chars = [glyphs[c] for c in self.text if c in glyphs]
+        width = sum(g[0] for g in chars)
+        height = self._atlas.height
+        if self.halign == 'left':
+            x = self.x
+        elif self.halign == 'center':
+            x = self.x + (self.width - width) / 2.
+        else:
+            x = self.right - width
+        if self.valign == 'top':
+            y = self.top - height
+        elif self.valign == 'bottom':
+            y = self.y
+        else:
+            y = self.y + (self.height - height) / 2.
+        x, y = int(x), int(y)
+        top = y + height
+        vertices = []
+        for w, uv in chars:
+            vertices.extend((x, y, uv[0], uv[1], x + w, y, uv[2], uv[3],
+                             x + w, top, uv[4], uv[5], x, top, uv[6], uv[7]))
+            x += w
+        self._mesh.vertices = vertices
+        if len(chars) != self._count:
+            self._count = len(chars)
+            indices = []
+            for i in range(0, 4 * len(chars), 4):
+                indices.extend((i, i + 1, i + 2, i + 2, i + 3, i))
+            self._mesh.indices = indices
+        if self._rect is not None:
+            self._rect.pos = self.pos
+            self._rect.size = self.size
+
+
+
+def decimate(samples, columns):
+    """
+    Redução min/max de uma série para um número de colunas (pixels): cada
+    coluna é representada pelo menor e pelo maior valor das amostras que ela
+    cobre, de modo que picos isolados não desaparecem
+    :param samples: Sequência (ou array) de amostras
+    :param columns: Número de colunas
+    :return: Tupla (posições, valores): listas com a posição de cada ponto, em
+    unidades de amostra, e o seu valor. Séries curtas são devolvidas inteiras
+    """
+    n = len(samples)
+    if columns < 1 or n <= 2 * columns:
+        return list(range(n)), list(samples)
+    bounds = [n * c // columns for c in range(columns + 1)]
+    try:
+        import numpy
+    except ImportError:
+        mins = [min(samples[a:b]) for a, b in zip(bounds, bounds[1:])]
+        maxs = [max(samples[a:b]) for a, b in zip(bounds, bounds[1:])]
+    else:
+        s = numpy.asarray(samples, dtype=float)
+        mins = numpy.minimum.reduceat(s, bounds[:-1]).tolist()
+        maxs = numpy.maximum.reduceat(s, bounds[:-1]).tolist()
+    positions = []
+    values = []
+    for a, b, lo, hi in zip(bounds, bounds[1:], mins, maxs):
+        x = (a + b - 1) / 2.
+        positions += (x, x)
+        # A ordem segue a tendência da coluna, para a linha continuar na próxima
+        values += (lo, hi) if samples[a] <= samples[b - 1] else (hi, lo)
+    return positions, values
+
+
+
+def _checkCapacity(capacity):
+    if capacity < 1:
+        raise ValueError('Sparkline: capacidade inválida {!r} (mínimo 1)'.format(capacity))
+
+
+
+class Sparkline(Widget):
+    """
+    Histórico recente de um valor, desenhado como uma linha. As amostras ficam
+    em um buffer circular de capacidade fixa (array de doubles); a linha é um
+    único Mesh, cujos vértices são reescritos no máximo uma vez por quadro,
+    por mais amostras que cheguem. Históricos maiores que a largura em pixels
+    são reduzidos por min/max (decimate). A amostra mais recente fica à direita
+    """
+    style = ObjectProperty(None)  # ngstyle.Style compartilhado (somente leitura)
+
+    def __init__(self, capacity=256, vMin=None, vMax=None, style=None, **kwargs):
+        """
+        Construtor do Sparkline
+        :param capacity: Número de amostras guardadas (pelo menos 1)
+        :param vMin: Valor na base do widget. Se None, usa o menor valor mostrado
+        :param vMax: Valor no topo do widget. Se None, usa o maior valor mostrado
+        :param style: Padrão de estilo a ser utilizado no desenho do componente
+        :param background_color: Cor de fundo do Widget (lista de 4 componentes)
+        :param foreground_color: Cor da linha (lista de 4 componentes)
+        :param kwargs: Demais parâmetros de um Widget
+        :raise ValueError: Se a capacidade for menor que 1
+        """
+        _checkCapacity(capacity)
+        overrides = {k: kwargs.pop(k) for k in ('background_color', 'foreground_color')
+                     if k in kwargs}
+        self.style = ngstyle.resolve(style, 'Sparkline', overrides, self)
+        super().__init__(**kwargs)
+
+        self.capacity = capacity
+        self.vMin = vMin
+        self.vMax = vMax
+        self._buffer = array('d', bytes(8 * capacity))
+        self._head = 0    # Posição da próxima amostra
+        self._count = 0   # Amostras válidas no buffer
+        self._points = -1  # Número de vértices do Mesh (para só refazer os índices se mudar)
+        self._bgColor = self._rect = None
+        if self.style.get('background_color'):
+            with self.canvas.before:
+                self._bgColor = Color(rgba=self.style['background_color'])
+                self._rect = Rectangle(pos=self.pos, size=self.size)
+        with self.canvas:
+            self._color = Color(rgba=self.style.get('foreground_color', (1, 1, 1, 1)))
+            self._mesh = Mesh(mode='line_strip')
+
+        self.bind(size=self._markMesh, pos=self._markMesh)
+
+
+    def push(self, value):
+        """
+        Acrescenta uma amostra, descartando a mais antiga se o buffer estiver cheio
+        :param value: Valor numérico
+        """
+        self._buffer[self._head] = value
+        self._head = (self._head + 1) % self.capacity
+        if self._count < self.capacity:
+            self._count += 1
+        ngframe.mark(self._updMesh)
+
+
+    def extend(self, values):
+        """
+        Acrescenta várias amostras de uma só vez (cópia por fatias do array)
+        :param values: Sequência de valores numéricos, da mais antiga para a mais recente
+        """
+        values = array('d', values)
+        n, capacity, buf = len(values), self.capacity, self._buffer
+        if n >= capacity:
+            buf[:] = values[n - capacity:]
+            self._head = 0
+        else:
+            head = self._head
+            first = min(n, capacity - head)
+            buf[head:head + first] = values[:first]
+            buf[:n - first] = values[first:]
+            self._head = (head + n) % capacity
+        self._count = min(self._count + n, capacity)
+        ngframe.mark(self._updMesh)
+
+
+    def clear(self):
+        """
+        Descarta todas as amostras
+        """
+        self._head = self._count = 0
+        ngframe.mark(self._updMesh)
+
+
+    def values(self):
+        """
+        :return: Array com as amostras, da mais antiga para a mais recente
+        """
+        buf, n = self._buffer, self._count
+        if n < self.capacity:
+            return buf[:n]
+        return buf[self._head:] + buf[:self._head]
+
+
+    def applyStyle(self, style, changed):
+        """
+        Aplica um novo estilo ao widget já criado (troca de tema), alterando
+        apenas as propriedades afetadas pelas chaves que mudaram
+        :param style: Novo estilo (ngstyle.Style)
+        :param changed: Conjunto com as chaves do estilo que mudaram
+        """
+        self.style = style
+        if 'foreground_color' in changed:
+            self._color.rgba = style.get('foreground_color', (1, 1, 1, 1))
+        if 'background_color' in changed:
+            rgba = style.get('background_color') or (0, 0, 0, 0)
+            if self._bgColor is None:
+                with self.canvas.before:
+                    self._bgColor = Color(rgba=rgba)
+                    self._rect = Rectangle(pos=self.pos, size=self.size)
+            else:
+                self._bgColor.rgba = rgba
+
+
+    def reset(self, capacity=None, vMin=None, vMax=None, **kwargs):
+        """
+        Restaura o widget ao estado de um recém-criado (reaproveitamento por um pool)
+        :param capacity: Nova capacidade. Se None, mantém a atual
+        :param vMin: Valor na base do widget (None: automático)
+        :param vMax: Valor no topo do widget (None: automático)
+        :param kwargs: Outras propriedades do Widget a serem definidas
+        :raise ValueError: Se a nova capacidade for menor que 1
+        """
+        if capacity is not None:
+            _checkCapacity(capacity)
+        if capacity is not None and capacity != self.capacity:
+            self.capacity = capacity
+            self._buffer = array('d', bytes(8 * capacity))
+        self.vMin = vMin
+        self.vMax = vMax
+        self.clear()
+        for name, val in kwargs.items():
+            setattr(self, name, val)
+
+
+    def dispose(self):
+        """
+        Libera o widget: retira-o do parent, desfaz as ligações de eventos,
+        descarta as instruções de canvas e o buffer de amostras
+        """
+        if self.parent is not None:
+            self.parent.remove_widget(self)
+        self.unbind(size=self._markMesh, pos=self._markMesh)
+        ngframe.discard(self._updMesh)
+        self.canvas.before.clear()
+        self.canvas.clear()
+        self._bgColor = self._rect = None
+        self._buffer = array('d')
+        self._head = self._count = 0
+
+
+    def _markMesh(self, *args):
+        """
+        Agenda a atualização do Mesh para o próximo quadro
+        """
+        ngframe.mark(self._updMesh)
+
+
+    def _updMesh(self, *args):
+        """
+        Reescreve os vértices do Mesh a partir das amostras atuais
+        """
+        if self._rect is not None:
+            self._rect.pos = self.pos
+            self._rect.size = self.size
+        samples = self.values()
+        capacity = self.capacity
+        # As colunas são as da parte da largura ocupada pelas amostras existentes
+        positions, values = decimate(samples, int(self.width * len(samples) / capacity))
+        if values:
+            lo = min(values) if self.vMin is None else self.vMin
+            hi = max(values) if self.vMax is None else self.vMax
+        if not values or hi <= lo:
+            lo, hi = (values[0] - 1, values[0] + 1) if values else (0, 1)
+        dx = self.width / float(max(capacity - 1, 1))
+        x0 = self.right - (len(samples) - 1) * dx  # A série termina na borda direita
+        sy = (self.height - 1) / (hi - lo)
+        y0 = self.y + .5
+        vertices = []
+        for p, v in zip(positions, values):
+            v = lo if v < lo else hi if v > hi else v
+            vertices += (x0 + p * dx, y0 + (v - lo) * sy, 0., 0.)
+        self._mesh.vertices = vertices
+        if len(values) != self._points:
+            self._points = len(values)
+            self._mesh.indices = list(range(len(values)))
+
@@ -0,0 +1,436 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Construção declarativa de formulários (FormCard) a partir de um esquema
+O esquema (JSON ou dicionário/lista) descreve os campos; ele é compilado uma
+única vez (e guardado em um cache LRU) e o FormCard é montado de uma só vez, com
+todas as linhas label + input inseridas em uma única operação e um único
+passo de layout. Os inputs ficam acessíveis pelo nome do campo:
+    schema = {'fields': [
+        {'name': 'tensao', 'label': 'Tensão', 'decimals': 2, 'vMin': 0, 'vMax': 30, 'unit': 'V'},
+        {'name': 'ciclos', 'label': 'Ciclos', 'vMax': 1000},
+    ]}
+    card = ngform.buildForm(schema)
+    card.fields['tensao'].value = 12.5
+    ngform.getValues(card)       # {'tensao': 12.5, 'ciclos': 0}
+Campos calculados são expressões sobre outros campos (chave expr do esquema,
+ou setExpressions), reavaliadas só quando as suas dependências mudam:
+    {'name': 'potencia', 'label': 'Potência', 'expr': 'tensao * corrente', 'vMax': 1000}
+
+__author__   = "Carlos R Rocha"
+__license__  = "LGPL"
+__version__  = "20261018-0029"
+__email__    = "cticarlo@gmail.com"
+__status__   = "Prototype"
+"""
+
+import json
+import math
+from collections import namedtuple, OrderedDict
+import kivyng.ngframe as ngframe
+
+# Campo compilado. style: parâmetros extras do NumericInput (ex: background_color)
+# expr: expressão do campo calculado (ou None)
+FieldSpec = namedtuple('FieldSpec', 'name label value decimals vMin vMax unit style expr')
+
+_FIELD_KEYS = frozenset(FieldSpec._fields)
+_compiled = OrderedDict()  # chave -> (esquema, (card, fields)); o usado há mais tempo vem primeiro
+_cacheSize = 64            # Número máximo de esquemas compilados guardados
+
+
+def _field(item):
+    unknown = set(item) - _FIELD_KEYS
+    if 'name' not in item or unknown:
+        raise ValueError("ngform: campo inválido {!r}".format(item))
+    name = item['name']
+    return FieldSpec(name, item.get('label', name), item.get('value', 0),
+                     item.get('decimals'), item.get('vMin', 0), item.get('vMax', 100),
+                     item.get('unit', ''), tuple(sorted(item.get('style', {}).items())),
+                     item.get('expr'))
+
+
+def compileSchema(schema, key=None):
+    """
+    Compila (ou obtém do cache) um esquema de formulário
+    O cache é indexado pelo próprio texto JSON ou pela identidade do
+    dicionário/lista: um esquema alterado depois de compilado exige clearCache()
+    (ou uma chave nova)
+    :param schema: Texto JSON, dicionário {'fields': [...], 'card': {...}} ou a
+    lista de campos. Cada campo é um dicionário com name (obrigatório, único),
+    label, value, decimals, vMin, vMax, unit, style (parâmetros extras do input)
+    e expr (expressão de um campo calculado, ver setExpressions)
+    :param key: Chave opcional do esquema no cache (ex: nome da tela), no lugar
+    do texto ou da identidade
+    :return: Tupla (parâmetros do FormCard, tupla de FieldSpec)
+    :raise ValueError: Se o esquema for inválido
+    """
+    explicit = key is not None
+    if not explicit:
+        key = schema if isinstance(schema, str) else ('id', id(schema))
+    entry = _compiled.get(key)
+    if entry is not None and (explicit or entry[0] is schema or isinstance(schema, str)):
+        _compiled.move_to_end(key)
+        return entry[1]
+    source = schema
+    if isinstance(schema, str):
+        schema = json.loads(schema)
+    if isinstance(schema, dict):
+        card, items = schema.get('card', {}), schema.get('fields', [])
+    else:
+        card, items = {}, schema
+    fields = tuple(_field(item) for item in items)
+    if len(set(f.name for f in fields)) != len(fields):
+        raise ValueError("ngform: nomes de campos repetidos")
+    compiled = (tuple(sorted(card.items())), fields)
+    _compiled[key] = (source, compiled)
+    _compiled.move_to_end(key)
+    while len(_compiled) > _cacheSize:
+        _compiled.popitem(last=False)
+    return compiled
+
+
+def clearCache():
+    """
+    Descarta os esquemas compilados
+    """
+    _compiled.clear()
+
+
+def buildForm(schema, style=None, pool=None, key=None, **kwargs):
+    """
+    Cria um FormCard completo a partir de um esquema
+    :param schema: Esquema do formulário (ver compileSchema)
+    :param style: Padrão de estilo do card e dos widgets
+    :param pool: WidgetPool opcional, de onde são retirados os labels e inputs
+    (campos com style próprio são sempre criados)
+    :param key: Chave opcional do esquema no cache (ver compileSchema)
+    :param kwargs: Demais parâmetros do FormCard (prevalecem sobre os do esquema)
+    :return: FormCard, com os inputs em card.fields (nome -> NumericInput) e,
+    se houver campos calculados, o grafo deles em card.computed (FormGraph)
+    :raise ValueError: Se o esquema for inválido (ver compileSchema), ou se as
+    expressões forem inválidas (ver FormGraph.define)
+    :raise KeyError: Se uma expressão usar nomes inexistentes
+    """
+    from kivyng.ngcard import FormCard
+    from kivyng.ngdisplay import AlignedLabel
+    from kivyng.nginput import NumericInput
+    cardParams, fields = compileSchema(schema, key)
+    params = dict(cardParams)
+    params.update(kwargs)
+    card = FormCard(style=style, **params)
+    widgets = []
+    for f in fields:
+        params = dict(value=f.value, decimals=f.decimals, vMin=f.vMin, vMax=f.vMax, unit=f.unit)
+        if pool is None:
+            label = AlignedLabel(style=style, text=f.label)
+        else:
+            label = pool.acquire(AlignedLabel, style, text=f.label)
+        if f.expr is not None:  # Campo calculado: somente leitura, nunca do pool
+            edit = NumericInput(style=style, readonly=True, **dict(f.style, **params))
+        elif pool is None or f.style:
+            edit = NumericInput(style=style, **dict(f.style, **params))
+        else:
+            edit = pool.acquire(NumericInput, style, **params)
+        widgets.append(label)
+        widgets.append(edit)
+        edit._fieldName = f.name
+        card.fields[f.name] = edit
+    card.addWidgets(widgets)
+    exprs = {f.name: f.expr for f in fields if f.expr is not None}
+    if exprs:
+        setExpressions(card, exprs)
+    return card
+
+
+def getValues(card):
+    """
+    :param card: FormCard com campos nomeados (ex: criado por buildForm)
+    :return: Dicionário nome -> valor
+    """
+    return {name: edit.value for name, edit in card.fields.items()}
+
+
+def setValues(card, values):
+    """
+    Atribui os valores de vários campos, validando todos antes (ver nginput.setValues)
+    :param card: FormCard com campos nomeados
+    :param values: Dicionário nome -> valor
+    :return: Número de campos cujo valor mudou
+    :raise KeyError: Se algum nome não existir no card
+    :raise ValueError: Se algum valor estiver fora dos limites (nenhum é alterado)
+    """
+    from kivyng.nginput import setValues as setInputs
+    fields = card.fields
+    return setInputs([fields[name] for name in values], list(values.values()))
+
+
+
+# Nomes disponíveis nas expressões, além dos campos
+_FUNCTIONS = {'abs': abs, 'min': min, 'max': max, 'round': round, 'pi': math.pi, 'e': math.e}
+_FUNCTIONS.update((name, getattr(math, name)) for name in
+                  ('sqrt', 'exp', 'log', 'log10', 'sin', 'cos', 'tan', 'asin', 'acos', 'atan',
+                   'atan2', 'hypot', 'degrees', 'radians', 'floor', 'ceil'))
+
+
+
+class FormGraph(object):
+    """
+    Grafo de dependências dos campos calculados de um FormCard. Quando o
+    valor de um campo muda (ex: on_text_validate de um input), os campos que
+    dependem dele, direta ou indiretamente, são marcados e reavaliados uma
+    única vez no próximo quadro (ngframe), em ordem topológica. Os demais
+    campos calculados não são tocados
+    Os campos calculados podem ser NumericInput (o valor é limitado a vMin/vMax
+    e arredondado às casas decimais) ou qualquer widget com a propriedade text
+    (ex: AlignedLabel), que recebe o valor formatado
+    Uma avaliação que falha (ex: divisão por zero, ou um resultado NaN para
+    um NumericInput) fica em errors, e o campo mantém o último valor
+    """
+
+    def __init__(self, card):
+        self.card = card
+        self.values = {}       # Último valor de cada campo calculado
+        self.errors = {}       # nome -> exceção da última avaliação que falhou
+        self.evaluations = 0   # Avaliações de expressões (para medições)
+        self._exprs = {}       # nome -> (função, dependências, formato do texto)
+        self._rank = {}        # nome -> posição na ordem topológica
+        self._dependents = {}  # nome -> campos calculados que dependem dele diretamente
+        self._sources = {}     # widget ligado -> nome
+        self._dirty = set()
+        self._updating = False
+
+
+    def define(self, exprs, formats=None):
+        """
+        Acrescenta (ou substitui) campos calculados e reconstrói o grafo
+        :param exprs: Dicionário nome -> expressão. A expressão é um texto
+        (ex: 'tensao * corrente / 1000', com funções como sqrt, min, max e round)
+        ou uma tupla (função, nomes das dependências), a função recebendo os
+        valores na ordem dos nomes
+        :param formats: Dicionário opcional nome -> formato do texto, para os
+        campos calculados que não são NumericInput (padrão: '{:g}')
+        :raise KeyError: Se um campo ou dependência não existir em card.fields
+        :raise ValueError: Se uma expressão tiver erro de sintaxe, ou se houver
+        dependências circulares (em ambos os casos, nada é alterado)
+        """
+        fields = self.card.fields
+        compiled = dict(self._exprs)
+        for name, expr in exprs.items():
+            if name not in fields:
+                raise KeyError('FormGraph: campo {!r} inexistente'.format(name))
+            fmt = (formats or {}).get(name, '{:g}')
+            if isinstance(expr, str):
+                try:
+                    code = compile(expr, '<{}>'.format(name), 'eval')
+                except SyntaxError as e:
+                    raise ValueError('FormGraph: expressão inválida em {!r}: {}'.format(
+                        name, e.msg)) from e
+                unknown = [n for n in code.co_names if n not in fields and n not in _FUNCTIONS]
+                if unknown:
+                    raise KeyError('FormGraph: {!r} usa nomes inexistentes {}'.format(name, unknown))
+                depends = tuple(n for n in code.co_names if n in fields)
+                compiled[name] = (_evaluator(code, depends), depends, fmt)
+            else:
+                func, depends = expr
+                depends = tuple(depends)
+                missing = [n for n in depends if n not in fields]
+                if missing:
+                    raise KeyError('FormGraph: {!r} depende de campos inexistentes {}'.format(
+                        name, missing))
+                compiled[name] = (func, depends, fmt)
+        self._setGraph(compiled)
+        self._dirty.update(exprs)
+        ngframe.mark(self.update)
+
+
+    def remove(self, name):
+        """
+        Faz um campo deixar de ser calculado (o valor atual é mantido)
+        """
+        if name in self._exprs:
+            exprs = dict(self._exprs)
+            del exprs[name]
+            self.values.pop(name, None)
+            self.errors.pop(name, None)
+            self._dirty.discard(name)
+            self._setGraph(exprs)
+
+
+    def clear(self):
+        """
+        Desfaz o grafo: nenhum campo continua sendo calculado
+        """
+        self._setGraph({})
+        self._dirty.clear()
+        ngframe.discard(self.update)
+
+
+    def isComputed(self, name):
+        return name in self._exprs
+
+
+    def order(self):
+        """
+        :return: Os campos calculados, em ordem topológica (de avaliação)
+        """
+        return sorted(self._exprs, key=self._rank.get)
+
+
+    def update(self, *args):
+        """
+        Reavalia os campos afetados pelas mudanças pendentes. É chamado uma vez
+        por quadro (ngframe); pode ser chamado diretamente para atualizar já
+        """
+        if not self._dirty:
+            return
+        affected = set()
+        stack = list(self._dirty)
+        self._dirty.clear()
+        while stack:
+            name = stack.pop()
+            if name in self._exprs:
+                affected.add(name)
+            for dependent in self._dependents.get(name, ()):
+                if dependent not in affected:
+                    stack.append(dependent)
+        self._updating = True
+        try:
+            for name in sorted(affected, key=self._rank.get):
+                self._evaluate(name)
+        finally:
+            self._updating = False
+
+
+    def _setGraph(self, exprs):
+        order = _topological(exprs)
+        self._exprs = exprs
+        self._rank = {name: i for i, name in enumerate(order)}
+        self._dependents = {}
+        for name, (func, depends, fmt) in exprs.items():
+            for source in depends:
+                self._dependents.setdefault(source, []).append(name)
+        self._bindSources()
+
+
+    def _evaluate(self, name):
+        func, depends, fmt = self._exprs[name]
+        widget = self.card.fields.get(name)
+        numeric = getattr(widget, '_format', None)
+        try:
+            value = func(*[self._value(n) for n in depends])
+            if numeric is not None:  # NumericInput: respeita os limites e as casas decimais
+                value = min(max(value, numeric.vMin), numeric.vMax)
+                if not math.isfinite(value):  # NaN, ou infinito sem limite que o contenha
+                    raise ValueError('FormGraph: {!r} resultou em {}'.format(name, value))
+                value = numeric.coerce(round(value, numeric.decimals or 0))
+        except (ArithmeticError, LookupError, ValueError, TypeError) as e:
+            self.errors[name] = e  # O campo mantém o último valor (ou deixou o card)
+            return
+        self.evaluations += 1
+        self.errors.pop(name, None)
+        if widget is None:  # O campo deixou o card
+            return
+        if numeric is not None:
+            self.values[name] = value
+            if widget.value != value:
+                widget.value = value
+        else:
+            self.values[name] = value
+            widget.text = fmt.format(value)
+
+
+    def _value(self, name):
+        if name in self._exprs:
+            return self.values.get(name, 0)
+        return self.card.fields[name].value
+
+
+    def _bindSources(self):
+        """
+        Liga-se ao valor dos campos dos quais algum campo calculado depende
+        """
+        fields = self.card.fields
+        wanted = {fields[name]: name for name in self._dependents
+                  if hasattr(fields.get(name), 'value')}
+        for widget, name in list(self._sources.items()):
+            if wanted.get(widget) != name:
+                widget.funbind('value', self._onValue, name)
+                del self._sources[widget]
+        for widget, name in wanted.items():
+            if widget not in self._sources:
+                widget.fbind('value', self._onValue, name)
+                self._sources[widget] = name
+
+
+    def _onValue(self, name, instance, value):
+        """
+        Valor de um campo mudou: os dependentes são reavaliados no próximo quadro.
+        As mudanças feitas pela própria avaliação já estão sendo propagadas
+        """
+        if not (self._updating and name in self._exprs):
+            self._dirty.add(name)
+            ngframe.mark(self.update)
+
+
+
+def _evaluator(code, depends):
+    """
+    :return: Função que avalia uma expressão compilada, recebendo os valores
+    das dependências na ordem de depends
+    """
+    def evaluate(*values):
+        names = dict(_FUNCTIONS)
+        names.update(zip(depends, values))
+        return eval(code, {'__builtins__': {}}, names)
+    return evaluate
+
+
+def _topological(exprs):
+    """
+    Ordena os campos calculados de modo que cada um venha depois das suas dependências
+    :param exprs: Dicionário nome -> (função, dependências, formato)
+    :return: Lista de nomes
+    :raise ValueError: Se houver dependências circulares
+    """
+    pending = {name: set(d for d in depends if d in exprs)
+               for name, (func, depends, fmt) in exprs.items()}
+    dependents = {}
+    for name, depends in pending.items():
+        for d in depends:
+            dependents.setdefault(d, []).append(name)
+    order = [name for name, depends in pending.items() if not depends]
+    for name in order:
+        del pending[name]
+    for done in order:  # A lista cresce durante a iteração
+        for name in dependents.get(done, ()):
+            depends = pending[name]
+            depends.discard(done)
+            if not depends:
+                order.append(name)
+                del pending[name]
+    if pending:
+        name = next(iter(pending))
+        path = [name]
+        while True:  # Segue as dependências não resolvidas até repetir um campo
+            name = next(iter(pending[name]))
+            if name in path:
+                cycle = path[path.index(name):] + [name]
+                raise ValueError('FormGraph: dependência circular ' + ' -> '.join(cycle))
+            path.append(name)
+    return order
+
+
+def setExpressions(card, exprs, formats=None):
+    """
+    Declara campos calculados em um FormCard (ver FormGraph.define). O grafo
+    fica em card.computed
+    :param card: FormCard com campos nomeados (card.fields)
+    :param exprs: Dicionário nome -> expressão
+    :param formats: Formatos do texto dos campos que não são NumericInput
+    :return: FormGraph do card
+    """
+    graph = card.computed
+    if graph is None:
+        graph = card.computed = FormGraph(card)
+    graph.define(exprs, formats)
+    return graph
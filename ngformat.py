@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Formatação e validação de valores numéricos
+Cada configuração (casas decimais, limites, separador decimal e unidade)
+é compilada uma única vez em um NumericFormat compartilhado, que formata,
+interpreta e valida valores sem remontar strings de formato a cada uso.
+Inclui a validação em lote de vetores de valores contra os seus limites
+(vetorizada com numpy, se ele estiver disponível)
+
+__author__   = "Carlos R Rocha"
+__license__  = "LGPL"
+__version__  = "20261018-0013"
+__email__    = "cticarlo@gmail.com"
+__status__   = "Prototype"
+"""
+
+import locale
+import math
+from functools import lru_cache
+
+
+class NumericFormat(object):
+    """
+    Configuração numérica compilada (imutável e compartilhada). Não deve ser
+    instanciada diretamente: use getFormat()
+    """
+    __slots__ = ('decimals', 'vMin', 'vMax', 'separator', 'unit', '_fmt', '_suffix')
+
+    def __init__(self, decimals, vMin, vMax, separator, unit):
+        self.decimals = decimals
+        self.vMin = vMin
+        self.vMax = vMax
+        self.separator = separator
+        self.unit = unit
+        self._fmt = str if decimals is None else "{{:.{}f}}".format(decimals).format
+        self._suffix = ' ' + unit if unit else ''
+
+
+    def format(self, value, unit=True, truncate=True):
+        """
+        :param value: Valor numérico
+        :param unit: Se True, acrescenta a unidade (se houver)
+        :param truncate: Se False, um valor não inteiro em uma configuração inteira
+        é mostrado como é (str), sem ser truncado. Valores não finitos (NaN,
+        infinito) são sempre mostrados como são
+        :return: Texto correspondente ao valor
+        """
+        if self.decimals is None:
+            text = str(int(value)) if truncate and math.isfinite(value) else str(value)
+        else:
+            text = self._fmt(value)
+            if self.separator != '.':
+                text = text.replace('.', self.separator)
+        return text + self._suffix if unit else text
+
+
+    def parse(self, text):
+        """
+        Interpreta um texto (com ou sem a unidade) como valor numérico
+        :param text: Texto a ser interpretado
+        :return: Valor (int ou float, de acordo com decimals)
+        :raise ValueError: Se o texto não for um número válido
+        """
+        text = text.strip()
+        if self._suffix and text.endswith(self.unit):
+            text = text[:-len(self.unit)].rstrip()
+        if self.decimals is None:
+            return int(text)
+        if self.separator != '.':
+            text = text.replace(self.separator, '.')
+        return float(text)
+
+
+    def check(self, value):
+        """
+        :return: True se o valor estiver dentro dos limites
+        """
+        return self.vMin <= value <= self.vMax
+
+
+    def coerce(self, value):
+        """
+        :return: O valor convertido para o tipo da configuração (int ou float)
+        """
+        return int(value) if self.decimals is None else float(value)
+
+
+    def inputFilter(self, substring, from_undo=False):
+        """
+        Filtro de caracteres para o TextInput, quando o separador decimal não é '.'
+        (os filtros 'int' e 'float' do Kivy só aceitam o ponto)
+        """
+        sep = self.separator
+        return ''.join(c for c in substring if c.isdigit() or c == '-' or c == sep)
+
+
+
+def localeSeparator():
+    """
+    :return: Separador decimal da localização corrente
+    """
+    return locale.localeconv()['decimal_point'] or '.'
+
+
+@lru_cache(maxsize=256)
+def _getFormat(decimals, vMin, vMax, separator, unit):
+    return NumericFormat(decimals, vMin, vMax, separator, unit)
+
+
+def getFormat(decimals=None, vMin=0, vMax=100, separator='.', unit=''):
+    """
+    Retorna a configuração compilada (compartilhada) para os parâmetros dados
+    :param decimals: Número de casas decimais. Se None, o número é inteiro
+    :param vMin: Menor valor admissível
+    :param vMax: Maior valor admissível
+    :param separator: Separador decimal. 'locale' usa o da localização corrente
+    :param unit: Unidade acrescentada ao texto (ex: 'V')
+    :return: NumericFormat
+    """
+    if separator == 'locale':
+        separator = localeSeparator()
+    return _getFormat(decimals, vMin, vMax, separator or '.', unit or '')
+
+
+def outOfBounds(values, mins, maxs):
+    """
+    Valida, de uma só vez, um vetor de valores contra os seus limites
+    :param values: Sequência de valores
+    :param mins: Sequência com o limite inferior de cada valor
+    :param maxs: Sequência com o limite superior de cada valor
+    :return: Lista com os índices dos valores fora dos limites (NaN inclusive)
+    """
+    try:
+        import numpy
+    except ImportError:
+        return [i for i, (v, lo, hi) in enumerate(zip(values, mins, maxs))
+                if not lo <= v <= hi]
+    v = numpy.asarray(values, dtype=float)
+    # Como na versão sem numpy, NaN fica fora de quaisquer limites
+    good = (v >= numpy.asarray(mins, dtype=float)) & (v <= numpy.asarray(maxs, dtype=float))
+    return numpy.flatnonzero(~good).tolist()
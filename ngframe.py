@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Agendamento de atualizações por quadro
+Os widgets marcam como "sujo" o método que recalcula a sua geometria
+(retângulos do canvas, bordas, text_size, padding) e ele é executado uma
+única vez por quadro, não importa quantas vezes size/pos mudem no mesmo
+passo de layout. Os contadores permitem verificar quantas atualizações
+redundantes foram evitadas
+
+__author__   = "Carlos R Rocha"
+__license__  = "LGPL"
+__version__  = "20261017-2326"
+__email__    = "cticarlo@gmail.com"
+__status__   = "Prototype"
+"""
+
+from kivy.clock import Clock
+
+
+class FrameScheduler(object):
+    """
+    Agrupa chamadas de atualização marcadas durante um quadro e as executa
+    no próximo ciclo do Clock (antes do desenho). Cada callback, identificado
+    pelo par objeto/método, é executado uma única vez por ciclo. Callbacks
+    marcados durante a execução (ex: mudança de tamanho de um filho) entram
+    no ciclo seguinte, que o Kivy ainda processa no mesmo quadro
+    """
+
+    def __init__(self):
+        self._dirty = {}       # callback -> None (dicionário mantém a ordem)
+        self._trigger = None   # Criado no primeiro uso
+        self.requested = 0     # Marcações recebidas
+        self.executed = 0      # Callbacks realmente executados
+        self.flushes = 0       # Ciclos de execução
+
+
+    def mark(self, callback):
+        """
+        Marca um callback (método de um widget) para execução no próximo ciclo
+        :param callback: Método ligado (bound method) sem parâmetros obrigatórios
+        """
+        self.requested += 1
+        if callback not in self._dirty:
+            self._dirty[callback] = None
+            if self._trigger is None:
+                self._trigger = Clock.create_trigger(self.flush, -1)
+            self._trigger()
+
+
+    def discard(self, callback):
+        """
+        Remove um callback marcado (ex: widget descartado antes do próximo quadro)
+        """
+        self._dirty.pop(callback, None)
+
+
+    def flush(self, *args):
+        """
+        Executa todos os callbacks marcados. Pode ser chamado diretamente quando
+        a geometria precisa estar atualizada de imediato
+        """
+        while self._dirty:
+            dirty, self._dirty = self._dirty, {}
+            self.flushes += 1
+            self.executed += len(dirty)
+            for callback in dirty:
+                callback()
+
+
+    def stats(self):
+        """
+        :return: Dicionário com as marcações recebidas, callbacks executados,
+        atualizações redundantes evitadas e ciclos de execução
+        """
+        return {'requested': self.requested,
+                'executed': self.executed,
+                'avoided': self.requested - self.executed - len(self._dirty),
+                'pending': len(self._dirty),
+                'flushes': self.flushes}
+
+
+    def resetStats(self):
+        """
+        Zera os contadores
+        """
+        self.requested = len(self._dirty)
+        self.executed = 0
+        self.flushes = 0
+
+
+
+_scheduler = FrameScheduler()
+
+
+def getScheduler():
+    return _scheduler
+
+
+def mark(callback):
+    _scheduler.mark(callback)
+
+
+def discard(callback):
+    _scheduler.discard(callback)
+
+
+def flush():
+    _scheduler.flush()
+
+
+def stats():
+    return _scheduler.stats()
+
+
+def resetStats():
+    _scheduler.resetStats()
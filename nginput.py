@@ -12,9 +12,37 @@ __status__   = "Prototype"
 """
 #TODO Incluir definição do alinhamento vertical (valign) em versão futura
 
+from contextlib import contextmanager
+from time import perf_counter
+from kivy.clock import Clock
 from kivy.uix.textinput import TextInput
-from kivy.properties import BoundedNumericProperty, DictProperty
+from kivy.properties import BoundedNumericProperty, ObjectProperty
 import kivyng.ngstyle as ngstyle
+import kivyng.ngframe as ngframe
+import kivyng.ngformat as ngformat
+
+
+class _Burst(object):
+    """
+    Rajada de entrada em andamento: os caracteres aceitos ficam em chars e
+    são inseridos no texto (entre head e tail) de uma só vez, ao final.
+    O estado necessário às regras do número (sinal, separador, casas decimais)
+    é mantido incrementalmente, com trabalho constante por caractere
+    """
+    __slots__ = ('head', 'tail', 'chars', 'empty', 'hasSep', 'sepBefore', 'frac', 'auto')
+
+    def __init__(self, head, tail, sep, auto):
+        self.head = head
+        self.tail = tail
+        self.chars = []
+        self.empty = not head                    # Nada antes do cursor (aceita o sinal)
+        self.sepBefore = sep in head             # Separador antes do ponto de inserção
+        self.hasSep = self.sepBefore or sep in tail
+        self.frac = len(head) - head.find(sep) - 1 if self.sepBefore else 0
+        if self.sepBefore:
+            self.frac += len(tail)               # Casas decimais após a inserção
+        self.auto = auto                         # Detectada pelo intervalo entre teclas
+
 
 
 class NumericInput(TextInput):
@@ -25,9 +53,13 @@ class NumericInput(TextInput):
     O tipo é definido pelo parâmetro decimals. Se for nulo, é inteiro, senão é real
     """
     value = BoundedNumericProperty(0.0, min=0.0, max=100.0)
-    style = DictProperty()
+    style = ObjectProperty(None)  # ngstyle.Style compartilhado (somente leitura)
+    _burst = None           # _Burst em andamento
+    _burstInterval = None   # Intervalo máximo (s) entre teclas de uma rajada detectada
+    _lastKey = 0.
 
-    def __init__(self, value=0, decimals=None, vMin=0, vMax=100, style=None, **kwargs):
+    def __init__(self, value=0, decimals=None, vMin=0, vMax=100, style=None,
+                 unit='', separator='.', **kwargs):
         """
         Construtor do NumericInput, acrescentando características próprias a ele:
         :param value: Valor inicial do número. Default = 0
@@ -35,65 +67,142 @@ class NumericInput(TextInput):
         :param vMin: Menor valor admissível para o valor numérico
         :param vMax: Maior valor admissível para o valor numérico
         :param style: Padrão de estilo a ser utilizado no desenho do componente
+        :param unit: Unidade mostrada após o valor (fora da edição). Ex: 'V'
+        :param separator: Separador decimal ('.', ',' ou 'locale')
         :param kwargs: Demais parâmetros de um TextInput
         """
-        kwargs['input_filter'] = 'int' if decimals is None else 'float'
-        if style is None:
-            self.style = ngstyle.getDefault().get('NumericInput', {})
-        else:
-            self.style = style.get('NumericInput', {}) 
-            
-            
-        if 'border_color' in kwargs:
-            self.style['border_color'] = kwargs['border_color']
-            del kwargs['border_color']
-        if 'border_width' in kwargs:
-            self.style['border_width'] = kwargs['border_width']
-            del kwargs['border_width']
-            
-        if 'foreground_color' in kwargs:
-            self.style['foreground_color'] = kwargs['foreground_color']
-        elif 'foreground_color' in self.style:
-            kwargs['foreground_color'] = self.style['foreground_color']
-            
-        if 'background_color'  in kwargs:  
-            self.style['background_color'] = kwargs['background_color']
-        elif 'background_color' in self.style:
-            kwargs['background_color'] = self.style['background_color']
-        
-        if 'halign' in kwargs:
-            self.style['halign'] = kwargs['halign']
-        elif 'halign' in self.style:
-            kwargs['halign'] = self.style['halign']
-        
-        if 'write_tab' in kwargs:
-            self.style['write_tab'] = kwargs['write_tab']
-        elif 'write_tab' in self.style:
-            kwargs['write_tab'] = self.style['write_tab']
+        self._format = ngformat.getFormat(decimals, vMin, vMax, separator, unit)
+        kwargs['input_filter'] = self._inputFilter()
+        overrides = {k: kwargs.pop(k) for k in ('border_color', 'border_width') if k in kwargs}
+        overrides.update((k, kwargs[k]) for k in ('foreground_color', 'background_color',
+                                                  'halign', 'write_tab') if k in kwargs)
+        self.style = ngstyle.resolve(style, 'NumericInput', overrides, self)
+        for k in ('foreground_color', 'background_color', 'halign', 'write_tab'):
+            if k in self.style and k not in kwargs:
+                kwargs[k] = self.style[k]
 
         kwargs['multiline'] = False
         super().__init__(**kwargs)
 
-        self._decimals = decimals
         self.property('value').set_min(self, vMin)
         self.property('value').set_max(self, vMax)
-        self.value = int(value) if decimals is None else float(value)
+        self.value = self._format.coerce(value)
 
-        self.bind(size=self._updSize)
+        self.bind(size=self._markSize)
         self.bind(focus=self._onFocus)
 
 
     def on_value(self, *args):
         """
         Sempre que a propriedade valor mudar, atualiza o texto mostrado no Input
+        Um input inteiro mostra o valor como ele é (str), mesmo que um float
+        tenha sido atribuído a value
         :param args: Não utilizado. É o padrão dos métodos de resposta a eventos
         :return: Nada
         """
-        if self._decimals is not None:
-            f = "{{:.{}f}}".format(self._decimals)
-            self.text = f.format(self.value)
-        else:
-            self.text = str(self.value)
+        self.text = self._format.format(self.value, not self.focus, False)
+
+
+    def formatValue(self, value):
+        """
+        Formata um valor numérico como ele é apresentado no input
+        :param value: Valor a ser formatado
+        :return: Texto correspondente ao valor
+        """
+        return self._format.format(value, truncate=False)
+
+
+    def _inputFilter(self):
+        """
+        :return: Filtro de caracteres do TextInput para a configuração atual
+        """
+        if self._format.decimals is None:
+            return 'int'
+        if self._format.separator == '.':
+            return 'float'
+        return self._format.inputFilter
+
+
+    def configure(self, value=0, decimals=None, vMin=0, vMax=100, unit=None, separator=None):
+        """
+        Reconfigura o input já existente, com os mesmos parâmetros numéricos do construtor.
+        Permite reaproveitar o widget (ex: linhas recicladas de um formulário virtual)
+        sem recriá-lo
+        :param value: Valor numérico
+        :param decimals: Número de casas decimais permitidas. Se None, o número é inteiro
+        :param vMin: Menor valor admissível para o valor numérico
+        :param vMax: Maior valor admissível para o valor numérico
+        :param unit: Unidade. Se None, mantém a atual
+        :param separator: Separador decimal. Se None, mantém o atual
+        :return: Nada
+        """
+        fmt = self._format
+        self._format = ngformat.getFormat(decimals, vMin, vMax,
+                                          fmt.separator if separator is None else separator,
+                                          fmt.unit if unit is None else unit)
+        self.input_filter = self._inputFilter()
+        self.property('value').set_min(self, vMin)
+        self.property('value').set_max(self, vMax)
+        value = self._format.coerce(value)
+        changed = self.value != value
+        self.value = value
+        if not changed:  # Mesmo valor, mas o formato pode ter mudado
+            self.on_value()
+
+
+    def applyStyle(self, style, changed):
+        """
+        Aplica um novo estilo ao input já criado (troca de tema), alterando
+        apenas as propriedades afetadas pelas chaves que mudaram
+        :param style: Novo estilo (ngstyle.Style)
+        :param changed: Conjunto com as chaves do estilo que mudaram
+        """
+        self.style = style
+        for k in ('foreground_color', 'background_color', 'halign', 'write_tab'):
+            if k in changed and k in style:
+                setattr(self, k, style[k])
+        if self.focus and 'focus_bg_color' in changed:
+            self._onFocus(self, True)
+
+
+    def reset(self, value=0, decimals=None, vMin=0, vMax=100, unit='', separator='.', **kwargs):
+        """
+        Restaura o input ao estado de um recém-criado (reaproveitamento por um pool)
+        :param value, decimals, vMin, vMax, unit, separator: Como no construtor
+        :param kwargs: Outras propriedades do TextInput a serem definidas
+        """
+        self.focus = False
+        self.configure(value, decimals, vMin, vMax, unit, separator)
+        for name, val in kwargs.items():
+            setattr(self, name, val)
+
+
+    def dispose(self):
+        """
+        Libera o input: retira-o do parent (e do ngbind), tira o foco, desfaz
+        as ligações de eventos e descarta as instruções de canvas. O input não
+        deve ser usado depois disso
+        """
+        import kivyng.ngbind as ngbind
+        if self.parent is not None:
+            self.parent.remove_widget(self)
+        ngbind.forget(self)
+        self._burst = None
+        if self._burstInterval is not None:
+            self._burstEvent.cancel()
+        self.focus = False
+        self.unbind(size=self._markSize)
+        self.unbind(focus=self._onFocus)
+        ngframe.discard(self._updSize)
+        self.canvas.before.clear()
+        self.canvas.clear()
+
+
+    def _markSize(self, *args):
+        """
+        Agenda a atualização do padding para o próximo quadro
+        """
+        ngframe.mark(self._updSize)
 
 
     def _updSize(self, *args):
@@ -108,17 +217,34 @@ class NumericInput(TextInput):
     def insert_text(self, substring, from_undo=False):
         """
         Estende o método pai insert_text, controlando o número de decimais inseridos
+        Durante uma rajada (ver beginBurst), os caracteres são só acumulados
         :return: O texto realmente a ser inserido no input
         """
-        if self._decimals is not None:
-            p = self.text.find('.')
+        if not from_undo and not self.readonly:
+            burst = self._burst
+            if burst is None and self._burstInterval is not None:
+                now = perf_counter()
+                if now - self._lastKey <= self._burstInterval:
+                    burst = self.beginBurst(_auto=True)
+                self._lastKey = now
+            if burst is not None:
+                self._burstText(burst, substring)
+                if burst.auto:  # Reinicia a contagem do silêncio que encerra a rajada
+                    self._lastKey = perf_counter()
+                    self._burstEvent.cancel()
+                    self._burstEvent()
+                return
+        decimals = self._format.decimals
+        if decimals is not None:
+            sep = self._format.separator
+            p = self.text.find(sep)
             if p == -1:  # Ainda nao tem ponto decimal
-                x = substring.find('.')
-                if x != -1 and len(substring.split('.')[1]) > self._decimals:
+                x = substring.find(sep)
+                if x != -1 and len(substring.split(sep)[1]) > decimals:
                     return super().insert_text('', from_undo=from_undo)
             else:
                 if self.cursor_col >= p:
-                    if len(substring) + len(self.text.split('.')[1]) > self._decimals:
+                    if len(substring) + len(self.text.split(sep)[1]) > decimals:
                         return super().insert_text('', from_undo=from_undo)
 
         return super().insert_text(substring, from_undo=from_undo)
@@ -129,14 +255,171 @@ class NumericInput(TextInput):
         Estende o método on_text_validate para considerar os limites de valor numérico
         Quando excedido, ele mantém o valor numérico atual, atualizando o texto
         Seria mais interessante disparar uma exceção???
+        Os limites vêm da configuração compilada (NumericFormat)
+        Uma rajada em andamento (ex: Enter enviado pelo leitor) é aplicada antes
         :param args: Padrão de métodos de resposta a eventos
         :return: Nada
         """
-        x = int(self.text) if self._decimals is None else float(self.text)
-        if self.property('value').get_min(self) <= x <= self.property('value').get_max(self):
+        if self._burst is not None:
+            self._applyBurst()
+        self._commitText()
+
+
+    def _commitText(self):
+        """
+        Interpreta o texto digitado: se for um número válido e dentro dos limites,
+        ele passa a ser o valor; senão, o texto volta a mostrar o valor atual
+        """
+        fmt = self._format
+        try:
+            x = fmt.parse(self.text)
+        except ValueError:
+            x = None
+        if x is not None and fmt.check(x) and x != self.value:
             self.value = x
         else:
-            self.text = str(self.value)
+            self.on_value()
+
+
+    def setBurstDetection(self, interval=0.03):
+        """
+        Liga ou desliga a detecção automática de rajadas (leitores de código de
+        barras, teclados HID, scripts): teclas que chegam a menos de interval
+        segundos da anterior formam uma rajada, aplicada ao texto de uma só vez
+        quando as teclas param. Uma pausa não confirma o número (quem digita
+        rápido pode estar no meio dele): o valor só é validado com Enter ou com
+        a perda do foco, como na digitação normal
+        :param interval: Intervalo máximo entre teclas, em segundos. None desliga
+        """
+        self._burstInterval = interval
+        if interval is not None:
+            self._burstEvent = Clock.create_trigger(self._endAutoBurst, interval)
+        elif self._burst is not None and self._burst.auto:
+            self.endBurst(False)
+
+
+    def beginBurst(self, _auto=False):
+        """
+        Inicia uma rajada de entrada: os caracteres de insert_text passam a ser
+        validados incrementalmente (filtro, sinal, separador e casas decimais) e
+        acumulados, sem alterar o texto, até endBurst. A rajada é inserida
+        diretamente no texto, sem passar pela pilha de desfazer do TextInput
+        Se a unidade estiver sendo mostrada (input sem foco), ela é retirada
+        do texto antes, e os caracteres vão para o número
+        :return: Estado da rajada (interno)
+        """
+        if self._burst is None:
+            if self._selection:
+                self.delete_selection()
+            text = self.text
+            index = self.cursor_index()
+            unit = self._format.unit
+            if unit and not self.focus and text.endswith(unit):
+                text = text[:-len(unit)].rstrip()
+                index = min(index, len(text))
+            self._burst = _Burst(text[:index], text[index:], self._format.separator, _auto)
+        return self._burst
+
+
+    def endBurst(self, validate=True):
+        """
+        Encerra a rajada, inserindo todos os caracteres aceitos com uma única
+        atualização do texto
+        :param validate: Se True, dispara on_text_validate (uma vez)
+        """
+        if self._burst is not None:
+            self._applyBurst()
+            if validate:
+                self.dispatch('on_text_validate')
+
+
+    @contextmanager
+    def burst(self, validate=True):
+        """
+        Gerenciador de contexto para uma rajada de entrada:
+            with edit.burst():
+                for ch in leitura:
+                    edit.insert_text(ch)
+        :param validate: Se True, dispara on_text_validate ao final
+        """
+        self.beginBurst()
+        try:
+            yield self
+        finally:
+            self.endBurst(validate)
+
+
+    def typeText(self, text, validate=True):
+        """
+        Digita um texto no input como uma rajada (ex: automação), na posição
+        do cursor. Como toda rajada, não passa pela pilha de desfazer do
+        TextInput (ver beginBurst)
+        :param text: Caracteres digitados
+        :param validate: Se True, dispara on_text_validate ao final
+        """
+        with self.burst(validate):
+            self.insert_text(text)
+
+
+    def do_backspace(self, *args, **kwargs):
+        if self._burst is not None:
+            self._applyBurst()
+        return super().do_backspace(*args, **kwargs)
+
+
+    def do_cursor_movement(self, *args, **kwargs):
+        if self._burst is not None:
+            self._applyBurst()
+        return super().do_cursor_movement(*args, **kwargs)
+
+
+    def _burstText(self, burst, substring):
+        """
+        Acrescenta caracteres à rajada, descartando os que o filtro ou as regras
+        do número (como em insert_text) recusariam
+        """
+        fmt = self._format
+        sep = fmt.separator
+        decimals = fmt.decimals
+        chars = burst.chars
+        if burst.empty and burst.tail[:1] == '-':  # Nada pode vir antes do sinal
+            return
+        for ch in substring:
+            if '0' <= ch <= '9':
+                # Um input inteiro pode mostrar um valor não inteiro (ex: 7.5): sem limite de casas
+                if burst.sepBefore and decimals is not None:
+                    if burst.frac >= decimals:
+                        continue
+                    burst.frac += 1
+            elif ch == '-':
+                if not burst.empty or chars:
+                    continue
+            elif ch == sep and decimals is not None:
+                if burst.hasSep or len(burst.tail) > decimals:
+                    continue
+                burst.hasSep = burst.sepBefore = True
+                burst.frac = len(burst.tail)
+            else:
+                continue
+            chars.append(ch)
+
+
+    def _applyBurst(self):
+        """
+        Insere os caracteres da rajada no texto, com uma única atualização
+        """
+        burst, self._burst = self._burst, None
+        if self._burstInterval is not None:
+            self._burstEvent.cancel()
+        if burst.chars:
+            head = burst.head + ''.join(burst.chars)
+            self.text = head + burst.tail
+            self.cursor = self.get_cursor_from_index(len(head))
+
+
+    def _endAutoBurst(self, *args):
+        if self._burst is not None and self._burst.auto:
+            self.endBurst(False)
 
 
     def _onFocus(self, instance, value):
@@ -150,4 +433,41 @@ class NumericInput(TextInput):
         if 'background_color' in self.style and 'focus_bg_color' in self.style \
            and self.style['background_color'] and self.style['focus_bg_color']:
             self.background_color = self.style['focus_bg_color'] if value else self.style['background_color']
+        if not value and self._burst is not None:
+            self.endBurst()
+        if self._format.unit:  # A unidade só é mostrada fora da edição
+            if value:
+                self.on_value()
+            else:  # O texto digitado e não confirmado é interpretado antes de ser formatado
+                self._commitText()
 
+
+
+
+def setValues(inputs, values):
+    """
+    Atribui valores a vários NumericInput de uma só vez. Todos os valores são
+    validados contra os limites dos respectivos inputs em um único passo
+    (vetorizado, se o numpy estiver disponível) antes de qualquer atribuição:
+    se algum estiver fora dos limites, nenhum input é alterado
+    Inputs cujo valor não muda não são tocados
+    :param inputs: Sequência de NumericInput
+    :param values: Sequência de valores, na mesma ordem
+    :return: Número de inputs alterados
+    :raise ValueError: Se as sequências tiverem tamanhos diferentes, ou se algum
+    valor estiver fora dos limites
+    """
+    if len(inputs) != len(values):
+        raise ValueError('setValues: {} inputs e {} valores'.format(len(inputs), len(values)))
+    formats = [w._format for w in inputs]
+    bad = ngformat.outOfBounds(values, [f.vMin for f in formats], [f.vMax for f in formats])
+    if bad:
+        raise ValueError('setValues: {} valor(es) fora dos limites, índices {}'.format(
+            len(bad), bad[:10]))
+    changed = 0
+    for widget, fmt, value in zip(inputs, formats, values):
+        value = fmt.coerce(value)
+        if widget.value != value:
+            widget.value = value
+            changed += 1
+    return changed
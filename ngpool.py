@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Pool de widgets para reaproveitamento
+Telas que são reconstruídas com frequência (ex: troca do dispositivo
+selecionado) podem devolver os widgets ao pool em vez de descartá-los, e
+retirá-los de novo na próxima construção, evitando refazer a resolução do
+estilo, a criação das instruções de canvas e as ligações de eventos
+Os widgets ficam em um pool por classe e por estilo, e são restaurados
+(valor, limites, casas decimais, texto) pelo método reset() de cada classe
+    pool = ngpool.getPool()
+    edit = pool.acquire(NumericInput, value=10, decimals=2)
+    ...
+    pool.release(edit)
+
+__author__   = "Carlos R Rocha"
+__license__  = "LGPL"
+__version__  = "20261018-0027"
+__email__    = "cticarlo@gmail.com"
+__status__   = "Prototype"
+"""
+
+from collections import deque
+import kivyng.ngstyle as ngstyle
+
+
+class WidgetPool(object):
+    """
+    Pool de widgets por (classe, estilo). Cada pool tem um tamanho máximo;
+    ao devolver um widget a um pool cheio, a política de descarte define o
+    que acontece:
+        'lru': descarta o widget devolvido há mais tempo (o menos usado)
+        'reject': descarta o próprio widget devolvido
+    Os widgets retirados são sempre os devolvidos mais recentemente
+    """
+
+    def __init__(self, maxSize=256, policy='lru'):
+        """
+        :param maxSize: Número máximo de widgets guardados em cada pool
+        :param policy: Política de descarte ('lru' ou 'reject')
+        """
+        if policy not in ('lru', 'reject'):
+            raise ValueError("WidgetPool: política inválida {!r}".format(policy))
+        self.maxSize = maxSize
+        self.policy = policy
+        self._pools = {}   # (classe, id do estilo) -> deque de widgets
+        self._styles = {}  # id do estilo -> estilo (mantém o id válido)
+        self.hits = 0
+        self.misses = 0
+        self.releases = 0
+        self.evictions = 0
+
+
+    def _key(self, cls, style):
+        if style is None:
+            return cls, None
+        self._styles[id(style)] = style
+        return cls, id(style)
+
+
+    def acquire(self, cls, style=None, **params):
+        """
+        Retira um widget do pool, ou cria um novo se o pool estiver vazio
+        :param cls: Classe do widget (ex: NumericInput)
+        :param style: Estilo, como no construtor da classe
+        :param params: Parâmetros do construtor/reset da classe (ex: value, decimals,
+        vMin, vMax no NumericInput; text no AlignedLabel). Parâmetros que alteram
+        o estilo (ex: background_color) não devem ser usados com o pool
+        :return: Widget pronto para uso, sem parent
+        """
+        key = self._key(cls, style)
+        pool = self._pools.get(key)
+        if pool:
+            self.hits += 1
+            widget = pool.pop()
+            widget._inPool = None
+            widget.reset(**params)
+        else:
+            self.misses += 1
+            widget = cls(style=style, **params)
+        widget._poolKey = key
+        return widget
+
+
+    def release(self, widget):
+        """
+        Devolve um widget ao pool. Ele é retirado do seu parent (se estiver em
+        um card, deixa de fazer parte dele, visível ou não)
+        Widgets não criados pelo pool só são guardados se seguirem o tema ativo
+        (criados sem estilo nem personalizações): vão para o pool da sua classe
+        sem estilo. Os demais são descartados, pois o estilo deles não poderia
+        ser reproduzido por acquire. Um widget que já está guardado (devolvido
+        duas vezes) não é guardado de novo, para que acquire não o entregue a
+        dois donos
+        :param widget: Widget a ser devolvido
+        :return: True se o widget foi guardado, False se foi descartado ou se
+        ele já estava guardado
+        """
+        import kivyng.ngcard as ngcard
+        if getattr(widget, '_inPool', None) is not None:
+            return False
+        self.releases += 1
+        owner = ngcard.ownerOf(widget)
+        if owner is not None:
+            owner.remove_widget(widget)
+        key = getattr(widget, '_poolKey', None)
+        if key is None:
+            if not ngstyle.followsTheme(widget):
+                self.evictions += 1
+                return False
+            key = type(widget), None
+        pool = self._pools.get(key)
+        if pool is None:
+            pool = self._pools[key] = deque()
+        if len(pool) >= self.maxSize:
+            self.evictions += 1
+            if self.policy == 'reject' or not pool:
+                return False
+            pool.popleft()._inPool = None
+        pool.append(widget)
+        widget._inPool = self
+        return True
+
+
+    def releaseAll(self, card):
+        """
+        Devolve ao pool todos os widgets de um card (visíveis ou não), e os
+        widgets dos cards contidos nele, antes do próprio card
+        :param card: BoxCard ou FormCard
+        """
+        for widget in card._detachAll():
+            if hasattr(widget, '_widgets'):
+                self.releaseAll(widget)
+            else:
+                self.release(widget)
+        self.release(card)
+
+
+    def clear(self):
+        """
+        Descarta todos os widgets guardados
+        """
+        for pool in self._pools.values():
+            for widget in pool:
+                widget._inPool = None
+        self._pools.clear()
+        self._styles.clear()
+
+
+    def stats(self):
+        """
+        :return: Dicionário com acertos, faltas, devoluções, descartes, taxa de
+        acerto e o tamanho de cada pool (por nome da classe e estilo)
+        """
+        requests = self.hits + self.misses
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'hitRate': self.hits / requests if requests else 0.,
+                'releases': self.releases,
+                'evictions': self.evictions,
+                'pools': {(cls.__name__, style): len(pool)
+                          for (cls, style), pool in self._pools.items()}}
+
+
+    def resetStats(self):
+        self.hits = self.misses = self.releases = self.evictions = 0
+
+
+
+_pool = None
+
+
+def getPool():
+    """
+    :return: O WidgetPool compartilhado (criado no primeiro uso)
+    """
+    global _pool
+    if _pool is None:
+        _pool = WidgetPool()
+    return _pool
@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Instrumentação opcional dos pontos críticos dos widgets do kivyng
+Quando habilitada, os métodos monitorados são substituídos, na classe, por
+versões que contam as chamadas e acumulam o tempo gasto. Desabilitada, os
+métodos originais são restaurados: não há nenhum custo adicional
+Os tratadores on_<propriedade> (ex: NumericInput.on_value) são ligados pelo
+Kivy a cada instância, na criação: nas instâncias já existentes, eles são
+religados ao habilitar e ao desabilitar (o que percorre os objetos vivos uma vez)
+    import kivyng.ngprof as ngprof
+    ngprof.enable()
+    ngprof.startDump(5.)       # Resumo periódico no Logger
+    ...
+    print(ngprof.summary())
+Inclui também a contabilidade de memória dos widgets vivos (memoryReport),
+para testes de longa duração. Ela considera os widgets criados enquanto o
+rastreamento estiver ligado (trackMemory), que também só tem custo enquanto ligado
+
+__author__   = "Carlos R Rocha"
+__license__  = "LGPL"
+__version__  = "20261018-0027"
+__email__    = "cticarlo@gmail.com"
+__status__   = "Prototype"
+"""
+
+import gc
+import sys
+from functools import wraps
+from weakref import WeakSet
+from importlib import import_module
+from time import perf_counter
+
+
+# (nome no relatório, módulo, classe, método instrumentado)
+TARGETS = [
+    ('BoxCard._update_rect', 'kivyng.ngcard', 'BoxCard', '_update_rect'),
+    ('FormCard._update_rect', 'kivyng.ngcard', 'FormCard', '_update_rect'),
+    ('BoxCard.do_layout', 'kivyng.ngcard', 'BoxCard', 'do_layout'),
+    ('FormCard.do_layout', 'kivyng.ngcard', 'FormCard', 'do_layout'),
+    ('BoxCard.setVisible', 'kivyng.ngcard', 'BoxCard', 'setVisible'),
+    ('FormCard.setVisible', 'kivyng.ngcard', 'FormCard', 'setVisible'),
+    ('BoxCard.setVisibleMany', 'kivyng.ngcard', 'BoxCard', 'setVisibleMany'),
+    ('FormCard.setVisibleMany', 'kivyng.ngcard', 'FormCard', 'setVisibleMany'),
+    ('AlignedLabel._updTextSize', 'kivyng.ngdisplay', 'AlignedLabel', '_updTextSize'),
+    ('NumericInput._updSize', 'kivyng.nginput', 'NumericInput', '_updSize'),
+    ('NumericInput.on_value', 'kivyng.nginput', 'NumericInput', 'on_value'),
+    ('NumericInput.insert_text', 'kivyng.nginput', 'NumericInput', 'insert_text'),
+    ('NumericInput.burst', 'kivyng.nginput', 'NumericInput', '_applyBurst'),
+]
+
+# (módulo, classe) cujas instâncias (e as das subclasses) são rastreadas por trackMemory
+MEMORY_TARGETS = [
+    ('kivyng.ngcard', 'BoxCard'),
+    ('kivyng.ngcard', 'FormCard'),
+    ('kivyng.ngcard', '_FormRow'),
+    ('kivyng.ngcard', '_TableRow'),
+    ('kivyng.ngdisplay', 'AlignedLabel'),
+    ('kivyng.ngdisplay', 'NumericDisplay'),
+    ('kivyng.ngdisplay', 'Sparkline'),
+    ('kivyng.nginput', 'NumericInput'),
+]
+
+_stats = {}      # nome -> [chamadas, tempo total, maior tempo]
+_patched = []    # (classe, método, função original ou None se herdada)
+_dump = None     # Evento do Clock do resumo periódico
+_tracked = WeakSet()  # Widgets criados com o rastreamento de memória ligado
+_tracking = []   # (classe, __init__ original ou None se herdado)
+
+
+def _probe(name, func):
+    """
+    Cria a versão instrumentada de um método
+    """
+    stat = _stats.setdefault(name, [0, 0., 0.])
+
+    @wraps(func)
+    def probe(*args, **kwargs):
+        t = perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            dt = perf_counter() - t
+            stat[0] += 1
+            stat[1] += dt
+            if dt > stat[2]:
+                stat[2] = dt
+    probe._ngprofOriginal = func
+    return probe
+
+
+def _handlerProperty(cls, method):
+    """
+    :return: O nome da propriedade, se o método for um tratador on_<propriedade>
+    (ligado pelo Kivy a cada instância), ou None
+    """
+    from kivy.properties import Property
+    if method.startswith('on_') and isinstance(getattr(cls, method[3:], None), Property):
+        return method[3:]
+    return None
+
+
+def _rebind(handlers):
+    """
+    Troca os tratadores on_<propriedade> já ligados nas instâncias existentes
+    :param handlers: Lista de (classe, método, propriedade, função antiga, função nova)
+    """
+    if not handlers:
+        return
+    for obj in gc.get_objects():
+        cls = type(obj)  # (isinstance falharia com proxies fracos já mortos)
+        for base, method, prop, old, new in handlers:
+            if issubclass(cls, base) and getattr(cls, method) is new:
+                obj.funbind(prop, old.__get__(obj, cls))
+                obj.fbind(prop, new.__get__(obj, cls))
+
+
+def enable(targets=None):
+    """
+    Habilita a instrumentação
+    :param targets: Lista de tuplas (nome, módulo, classe, método). Se None, usa TARGETS
+    """
+    if _patched:
+        return
+    handlers = []
+    for name, module, cls, method in targets or TARGETS:
+        cls = getattr(import_module(module), cls)
+        original = cls.__dict__.get(method)
+        func = getattr(cls, method)
+        probe = _probe(name, func)
+        setattr(cls, method, probe)
+        _patched.append((cls, method, original))
+        prop = _handlerProperty(cls, method)
+        if prop is not None:
+            handlers.append((cls, method, prop, func, probe))
+    _rebind(handlers)
+
+
+def disable():
+    """
+    Desabilita a instrumentação, restaurando os métodos originais
+    (as estatísticas coletadas são mantidas)
+    """
+    handlers = []
+    while _patched:
+        cls, method, original = _patched.pop()
+        probe = cls.__dict__[method]
+        if original is None:
+            delattr(cls, method)
+        else:
+            setattr(cls, method, original)
+        prop = _handlerProperty(cls, method)
+        if prop is not None:
+            handlers.append((cls, method, prop, probe, getattr(cls, method)))
+    _rebind(handlers)
+
+
+def isEnabled():
+    return bool(_patched)
+
+
+def reset():
+    """
+    Zera as estatísticas
+    """
+    for stat in _stats.values():
+        stat[:] = [0, 0., 0.]
+
+
+def stats():
+    """
+    :return: Dicionário nome -> {count, total, mean, max} (tempos em segundos)
+    """
+    return {name: {'count': s[0], 'total': s[1], 'mean': s[1] / s[0] if s[0] else 0.,
+                   'max': s[2]}
+            for name, s in _stats.items() if s[0]}
+
+
+def summary():
+    """
+    :return: Tabela (texto) com as estatísticas, ordenada pelo tempo total
+    """
+    lines = ['{:<28}{:>10}{:>12}{:>12}{:>12}'.format('ponto', 'chamadas', 'total ms',
+                                                    'média us', 'máx us')]
+    for name, s in sorted(stats().items(), key=lambda i: -i[1]['total']):
+        lines.append('{:<28}{:>10}{:>12.2f}{:>12.1f}{:>12.1f}'.format(
+            name, s['count'], s['total'] * 1e3, s['mean'] * 1e6, s['max'] * 1e6))
+    return '\n'.join(lines)
+
+
+def startDump(interval=5., writer=None, resetAfter=True):
+    """
+    Publica periodicamente o resumo das estatísticas
+    :param interval: Intervalo em segundos
+    :param writer: Função que recebe o texto do resumo. Se None, usa o Logger do Kivy
+    :param resetAfter: Se True, zera as estatísticas após cada resumo
+    """
+    global _dump
+    from kivy.clock import Clock
+    if writer is None:
+        from kivy.logger import Logger
+        writer = lambda text: Logger.info('ngprof:\n' + text)
+
+    def dump(dt):
+        writer(summary())
+        if resetAfter:
+            reset()
+
+    stopDump()
+    _dump = Clock.schedule_interval(dump, interval)
+
+
+def stopDump():
+    global _dump
+    if _dump is not None:
+        _dump.cancel()
+        _dump = None
+
+
+def _countInstructions(group):
+    """
+    Conta recursivamente as instruções de um canvas/grupo de instruções
+    """
+    total = 0
+    for instruction in group.children:
+        total += 1
+        if hasattr(instruction, 'children'):
+            total += _countInstructions(instruction)
+    return total
+
+
+def canvasCounts(card):
+    """
+    :param card: Card (ou qualquer widget)
+    :return: Dicionário com o número de instruções do canvas do próprio widget
+    (before, canvas, after; sem contar os canvas dos filhos) e de toda a subárvore
+    """
+    canvas = card.canvas
+    own = {'before': _countInstructions(canvas.before) if canvas.has_before else 0,
+           'after': _countInstructions(canvas.after) if canvas.has_after else 0}
+    skip = set(id(c.canvas) for c in card.children)  # Canvas dos filhos (contados neles)
+    if canvas.has_before:
+        skip.add(id(canvas.before))
+    if canvas.has_after:
+        skip.add(id(canvas.after))
+    own['canvas'] = sum(1 + (_countInstructions(i) if hasattr(i, 'children') else 0)
+                        for i in canvas.children if id(i) not in skip)
+    subtree = own['before'] + own['canvas'] + own['after']
+    for child in card.children:
+        subtree += canvasCounts(child)['subtree']
+    own['subtree'] = subtree
+    return own
+
+
+def cardReport(root):
+    """
+    Percorre a árvore de widgets e lista, para cada card, o número de instruções
+    :param root: Widget raiz
+    :return: Lista de tuplas (card, canvasCounts(card))
+    """
+    from kivyng.ngcard import BoxCard, FormCard
+    report = []
+    stack = [root]
+    while stack:
+        widget = stack.pop()
+        if isinstance(widget, (BoxCard, FormCard)):
+            report.append((widget, canvasCounts(widget)))
+        stack.extend(widget.children)
+    return report
+
+
+def _instructionBytes(group):
+    """
+    Soma (aproximada) da memória das instruções de um canvas/grupo de instruções
+    """
+    total = 0
+    for instruction in group.children:
+        total += sys.getsizeof(instruction)
+        if hasattr(instruction, 'children'):
+            total += _instructionBytes(instruction)
+    return total
+
+
+def _widgetBytes(widget):
+    """
+    :return: Tupla (bytes aproximados na memória do Python, bytes de texturas)
+    de um widget, sem contar os filhos
+    """
+    size = sys.getsizeof(widget) + sys.getsizeof(widget.__dict__)
+    size += sum(sys.getsizeof(v) for v in widget.__dict__.values())
+    for prop in widget.properties().values():
+        size += sys.getsizeof(prop.get(widget))
+    canvas = widget.canvas
+    if canvas is not None:
+        size += _instructionBytes(canvas)
+        if canvas.has_before:
+            size += _instructionBytes(canvas.before)
+        if canvas.has_after:
+            size += _instructionBytes(canvas.after)
+    textures = 0
+    texture = getattr(widget, 'texture', None)
+    if texture is not None:
+        textures += texture.width * texture.height * 4
+    cache = getattr(widget, '_cache', None)
+    if cache is not None:
+        textures += cache.size
+    return size, textures
+
+
+def trackMemory(enabled=True, targets=None):
+    """
+    Liga ou desliga o rastreamento de memória: enquanto ligado, os widgets
+    criados passam a ser considerados por memoryReport (por referência fraca,
+    sem mantê-los vivos). Desligado, os construtores originais são
+    restaurados, e os widgets já rastreados continuam no relatório
+    :param enabled: Se True, liga o rastreamento
+    :param targets: Lista de tuplas (módulo, classe). Se None, usa MEMORY_TARGETS
+    """
+    if not enabled:
+        while _tracking:
+            cls, original = _tracking.pop()
+            if original is None:
+                delattr(cls, '__init__')
+            else:
+                cls.__init__ = original
+        return
+    if _tracking:
+        return
+    for module, cls in targets or MEMORY_TARGETS:
+        cls = getattr(import_module(module), cls)
+        init = cls.__init__
+
+        @wraps(init)
+        def track(self, *args, _ngprofInit=init, **kwargs):
+            _ngprofInit(self, *args, **kwargs)
+            _tracked.add(self)
+        _tracking.append((cls, cls.__dict__.get('__init__')))
+        cls.__init__ = track
+
+
+def memoryReport():
+    """
+    Contabilidade dos widgets vivos criados com o rastreamento ligado
+    (trackMemory), inclusive os invisíveis e os que já não estão na árvore
+    de widgets. Útil em testes de longa duração (soak), para verificar que
+    o consumo fica estável
+    :return: Dicionário classe -> {count, bytes, textureBytes}. bytes é uma
+    estimativa da memória no Python (objeto, atributos, propriedades e
+    instruções de canvas); textureBytes, das texturas (labels e cache)
+    """
+    gc.collect()  # Ciclos já inalcançáveis deixam _tracked
+    report = {}
+    for obj in list(_tracked):
+        name = type(obj).__name__
+        entry = report.get(name)
+        if entry is None:
+            entry = report[name] = {'count': 0, 'bytes': 0, 'textureBytes': 0}
+        size, textures = _widgetBytes(obj)
+        entry['count'] += 1
+        entry['bytes'] += size
+        entry['textureBytes'] += textures
+    return report
+
+
+def memorySummary(report=None):
+    """
+    :param report: Resultado de memoryReport(). Se None, é obtido agora
+    :return: Tabela (texto) com a contabilidade de memória, ordenada pelos bytes
+    """
+    report = memoryReport() if report is None else report
+    lines = ['{:<20}{:>10}{:>12}{:>14}'.format('classe', 'vivos', 'KiB', 'texturas KiB')]
+    for name, e in sorted(report.items(), key=lambda i: -i[1]['bytes']):
+        lines.append('{:<20}{:>10}{:>12.1f}{:>14.1f}'.format(
+            name, e['count'], e['bytes'] / 1024., e['textureBytes'] / 1024.))
+    return '\n'.join(lines)
+
@@ -4,6 +4,10 @@
 Definição de um estilo básico
 Outros estilos podem ser incluídos aqui
 Os estilos são definidos por dicionários
+Os widgets não usam os dicionários diretamente: o estilo efetivo de cada
+classe é compilado uma única vez em um objeto Style imutável e compartilhado.
+Estilos idênticos são internados (uma única instância), e as personalizações
+de cada widget geram um novo Style (cópia na escrita), sem alterar os padrões
 
 __author__   = "Carlos R Rocha"
 __license__  = "LGPL"
@@ -12,6 +16,9 @@ __email__    = "cticarlo@gmail.com"
 __status__   = "Prototype"
 """
 
+from collections.abc import Mapping
+from weakref import WeakValueDictionary, WeakKeyDictionary
+
 
 style0 = {
     "FormCard": {
@@ -34,9 +41,19 @@ style0 = {
     "AlignedLabel": {
        # "background_color": None,
         "foreground_color": (.875, .847, .804, 1.),
+        "color": (1., 1., 1., 1.),
         "halign": "right",
         "valign": "center"
     },           
+    "NumericDisplay": {
+        "color": (.875, .847, .804, 1.),
+        "halign": "right",
+        "valign": "center"
+    },
+    "Sparkline": {
+        "background_color": (.118, .118, .118, 1.),
+        "foreground_color": (.35, .75, .95, 1.)
+    },
     "BoxCard": {
         "background_color": (.12, .12, .12, 1.),
         "border_color": (.9, .9, .9, 1.),
@@ -52,5 +69,246 @@ style0 = {
 
 
 
+styleLight = {
+    "FormCard": {
+        "background_color": (.96, .96, .96, 1.)
+    },
+    "NumericInput": {
+        "background_color": (1., 1., 1., 1.),
+        "foreground_color": (.11, .11, .11, 1.),
+        "focus_bg_color": (.9, .94, 1., 1.),
+        "halign": "right",
+        "write_tab": False
+    },
+    "TextInput": {
+        "background_color": (1., 1., 1., 1.),
+        "foreground_color": (.11, .11, .11, 1.),
+        "focus_bg_color": (.9, .94, 1., 1.),
+        "halign": "right",
+        "write_tab": False
+    },
+    "AlignedLabel": {
+        "foreground_color": (.11, .11, .11, 1.),
+        "color": (.11, .11, .11, 1.),
+        "halign": "right",
+        "valign": "center"
+    },
+    "NumericDisplay": {
+        "color": (.11, .11, .11, 1.),
+        "halign": "right",
+        "valign": "center"
+    },
+    "Sparkline": {
+        "background_color": (1., 1., 1., 1.),
+        "foreground_color": (.1, .4, .75, 1.)
+    },
+    "BoxCard": {
+        "background_color": (.96, .96, .96, 1.),
+        "border_color": (.6, .6, .6, 1.),
+        "border_width": 1
+    },
+    "GridCard": {
+        "background_color": (.96, .96, .96, 1.),
+        "border_color": (.6, .6, .6, 1.),
+        "border_width": 1
+    },
+    "background_color": (.96, .96, .96, 1.)
+}
+
+
+_active = style0    # Tema ativo (usado pelos widgets criados sem estilo)
+_applied = style0   # Tema já aplicado aos widgets existentes
+
+
 def getDefault():
-    return style0
+    return _active
+
+
+
+def _freeze(value):
+    """
+    Converte listas (ex: cores) em tuplas, e dicionários em tuplas de pares
+    ordenados, para que o estilo seja imutável e hashable
+    """
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    return value
+
+
+
+class Style(Mapping):
+    """
+    Estilo imutável de um widget. Comporta-se como um dicionário somente
+    leitura (in, [], get, items...). Não deve ser instanciado diretamente:
+    use resolve() ou derive(), que garantem uma única instância por conteúdo
+    """
+    __slots__ = ('_items', '_key', '__weakref__')
+
+    def __init__(self, items, key):
+        self._items = items
+        self._key = key
+
+
+    def __getitem__(self, name):
+        return self._items[name]
+
+
+    def __iter__(self):
+        return iter(self._items)
+
+
+    def __len__(self):
+        return len(self._items)
+
+
+    def __hash__(self):
+        return hash(self._key)
+
+
+    def __eq__(self, other):
+        if isinstance(other, Style):
+            return self is other or self._key == other._key
+        return Mapping.__eq__(self, other)
+
+
+    def __repr__(self):
+        return 'Style({!r})'.format(self._items)
+
+
+    def derive(self, overrides):
+        """
+        Cópia na escrita: retorna o estilo (internado) resultante da aplicação
+        das personalizações sobre este estilo
+        :param overrides: Dicionário com os valores personalizados
+        :return: Este mesmo estilo, se nada mudar, ou outro Style
+        """
+        if not overrides:
+            return self
+        items = dict(self._items)
+        for name, value in overrides.items():
+            items[name] = _freeze(value)
+        if items == self._items:
+            return self
+        return intern(items)
+
+
+
+_interned = WeakValueDictionary()  # conteúdo -> Style
+_compiled = {}                     # (id do dicionário, classe) -> (dicionário, Style)
+
+
+def intern(items):
+    """
+    Retorna o Style único correspondente a um dicionário de valores
+    :param items: Dicionário com os valores do estilo
+    :return: Style compartilhado
+    """
+    items = {name: _freeze(value) for name, value in items.items()}
+    key = tuple(sorted(items.items()))
+    style = _interned.get(key)
+    if style is None:
+        style = Style(items, key)
+        _interned[key] = style
+    return style
+
+
+def compileStyle(style, className):
+    """
+    Compila (uma única vez) o estilo efetivo de uma classe de widget
+    :param style: Dicionário de estilo completo (ex: style0). Se None, usa o padrão
+    :param className: Chave da classe no dicionário (ex: 'BoxCard')
+    :return: Style compartilhado
+    """
+    if style is None:
+        style = getDefault()
+    entry = _compiled.get((id(style), className))
+    if entry is None or entry[0] is not style:
+        entry = (style, intern(style.get(className, {})))
+        _compiled[(id(style), className)] = entry
+    return entry[1]
+
+
+_live = {}   # classe -> {widget: personalizações} dos widgets que seguem o tema ativo
+
+
+def resolve(style, className, overrides=None, widget=None):
+    """
+    Estilo de uma instância: o estilo compilado da classe com as personalizações
+    do widget aplicadas (sem alterar o estilo compartilhado)
+    :param style: Dicionário de estilo completo. Se None, usa o tema ativo
+    :param className: Chave da classe no dicionário
+    :param overrides: Dicionário com os valores personalizados do widget
+    :param widget: Se informado e style for None, o widget passa a acompanhar
+    as trocas de tema (setTheme). Ele deve implementar applyStyle(style, changed)
+    :return: Style compartilhado
+    """
+    if style is None and widget is not None:
+        widgets = _live.get(className)
+        if widgets is None:
+            widgets = _live[className] = WeakKeyDictionary()
+        widgets[widget] = overrides or None
+    return compileStyle(style, className).derive(overrides)
+
+
+def followsTheme(widget):
+    """
+    :return: True se o widget foi criado sem estilo explícito e sem personalizações,
+    ou seja, se o seu estilo é o do tema ativo
+    """
+    for widgets in _live.values():
+        if widget in widgets:
+            return widgets[widget] is None
+    return False
+
+
+def setTheme(style, now=False):
+    """
+    Troca o tema ativo. Os widgets existentes criados sem estilo explícito são
+    atualizados de uma só vez no próximo quadro: para cada classe é calculada a
+    diferença entre os estilos compilados, e cada widget recebe apenas as chaves
+    que mudaram (e que não foram personalizadas por ele)
+    :param style: Dicionário de estilo completo do novo tema (ex: styleLight)
+    :param now: Se True, aplica imediatamente, sem esperar o próximo quadro
+    """
+    global _active
+    _active = style
+    import kivyng.ngframe as ngframe
+    ngframe.mark(_applyTheme)
+    if now:
+        ngframe.flush()
+
+
+def _applyTheme():
+    """
+    Aplica aos widgets vivos a diferença entre o tema aplicado e o tema ativo
+    """
+    global _applied
+    old, new = _applied, _active
+    _applied = new
+    if old is new:
+        return
+    for className, widgets in _live.items():
+        before = compileStyle(old, className)
+        after = compileStyle(new, className)
+        if before is after:
+            continue
+        keys = {k for k in set(before).union(after) if before.get(k) != after.get(k)}
+        for widget, overrides in list(widgets.items()):
+            changed = keys.difference(overrides) if overrides else keys
+            if changed:
+                widget.applyStyle(after.derive(overrides), changed)
+
+
+def invalidate(style=None):
+    """
+    Descarta os estilos compilados, para que alterações feitas em um dicionário
+    de estilo passem a valer para os próximos widgets criados
+    :param style: Dicionário alterado. Se None, descarta todos
+    """
+    if style is None:
+        _compiled.clear()
+    else:
+        for key in [k for k, v in _compiled.items() if v[0] is style]:
+            del _compiled[key]
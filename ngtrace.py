@@ -0,0 +1,531 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Gravação e reprodução de sessões reais (traces) dos widgets do kivyng
+Durante a gravação, os métodos dos widgets são substituídos, na classe, por
+versões que registram os eventos do nível do kivyng: construção, add_widget,
+remove_widget, setVisible, mudanças de value/text, redimensionamento (dos
+widgets de topo) e foco, agrupados por quadro. O trace é salvo em um arquivo
+compacto (JSON compactado):
+    import kivyng.ngtrace as ngtrace
+    ngtrace.start()
+    ...                          # Sessão de uso da tela
+    ngtrace.save(ngtrace.stop(), 'sessao.ngt')
+A reprodução é feita sem janela (sem GPU), contra a cópia do kivyng indicada
+por --root (o diretório do pacote, qualquer que seja o nome dele; por padrão,
+o desta cópia), e relata os percentis do tempo por quadro e
+o número de chamadas dos pontos instrumentados (ngprof, se existir na versão):
+    python3 ngtrace.py sessao.ngt --root /caminho/da/outra/copia --output r.json
+    python3 ngtrace.py --compare antigo.json novo.json
+A gravação deve começar antes da construção da tela: eventos sobre widgets
+criados antes dela (ou dentro de outros widgets) não podem ser reproduzidos
+Os estilos passados aos construtores são gravados por referência: o nome do
+tema do ngstyle (ex: styleLight) ou, para os demais, uma cópia guardada uma
+única vez no trace
+
+__author__   = "Carlos R Rocha"
+__license__  = "LGPL"
+__version__  = "20261018-0030"
+__email__    = "cticarlo@gmail.com"
+__status__   = "Prototype"
+"""
+
+import gzip
+import inspect
+import json
+import os
+import sys
+import weakref
+from functools import wraps
+from importlib import import_module, util
+from time import perf_counter
+
+FORMAT_VERSION = 2  # 2: estilos gravados por referência (ver _Recorder.styleRef)
+
+# Classes gravadas: (módulo, classe). Só os métodos definidos na própria classe
+# são substituídos (os herdados já o são na classe base)
+CLASSES = [
+    ('kivyng.ngcard', 'BoxCard'),
+    ('kivyng.ngcard', 'VerticalBoxCard'),
+    ('kivyng.ngcard', 'HorizontalBoxCard'),
+    ('kivyng.ngcard', 'FormCard'),
+    ('kivyng.ngcard', 'VirtualFormCard'),
+    ('kivyng.ngcard', 'TableCard'),
+    ('kivyng.ngdisplay', 'AlignedLabel'),
+    ('kivyng.ngdisplay', 'NumericDisplay'),
+    ('kivyng.nginput', 'NumericInput'),
+]
+
+# Códigos dos eventos no trace
+NEW, ADD, REMOVE, VISIBLE, VALUE, TEXT, SIZE, FOCUS, ADD_MANY, DISPOSE, FRAME = range(11)
+_NAMES = ('new', 'add', 'remove', 'visible', 'value', 'text', 'size', 'focus', 'addMany',
+          'dispose', 'frame')
+
+# Propriedades observadas por classe (o tamanho só é gravado nos widgets de topo)
+_WATCHED = {'AlignedLabel': ('text',), 'NumericDisplay': ('value',),
+            'NumericInput': ('value', 'focus')}
+
+
+class _Recorder(object):
+    """
+    Estado de uma gravação em andamento
+    """
+
+    def __init__(self):
+        self.events = []
+        self.classes = []             # Nomes das classes (índices usados nos eventos NEW)
+        self.ids = weakref.WeakKeyDictionary()  # widget -> id no trace
+        self.count = 0                # Widgets criados (o id é sequencial)
+        self.styles = []              # Estilos próprios (não temas do ngstyle) gravados
+        self.styleIds = {}            # id do estilo -> (índice em styles, estilo)
+        self.bindings = []            # (weakref do widget, propriedade, callback)
+        self.depth = 0                # Operações gravadas em andamento (as internas são ignoradas)
+        self.pending = False          # Há eventos desde o último marcador de quadro
+        self.last = perf_counter()
+        self.frameEvent = None
+
+    def ref(self, obj):
+        """
+        :return: id do widget, ou [valor] para outros argumentos (ex: chaves de linha)
+        """
+        wid = self.ids.get(obj) if _isWidget(obj) else None
+        return [_plain(obj)] if wid is None else wid
+
+    def styleRef(self, style):
+        """
+        :return: Referência gravável a um estilo: None (tema ativo),
+        {'$theme': nome} para os temas do ngstyle (ex: styleLight), ou
+        {'$style': índice} para os demais, gravados uma única vez em styles
+        """
+        if style is None:
+            return None
+        ngstyle = import_module('kivyng.ngstyle')
+        for name, value in vars(ngstyle).items():
+            if value is style and not name.startswith('_'):
+                return {'$theme': name}
+        entry = self.styleIds.get(id(style))
+        if entry is None:  # O estilo fica guardado, para que o id não seja reutilizado
+            entry = self.styleIds[id(style)] = (len(self.styles), style)
+            self.styles.append(_plain(style))
+        return {'$style': entry[0]}
+
+    def emit(self, *event):
+        self.events.append(list(event))
+        self.pending = True
+
+    def frame(self, dt):
+        now = perf_counter()
+        if self.pending:
+            self.events.append([FRAME, round((now - self.last) * 1e3, 2)])
+            self.pending = False
+        self.last = now
+
+
+_recorder = None
+_patched = []    # (classe, método, função original)
+
+
+def _isWidget(obj):
+    from kivy.uix.widget import Widget
+    return isinstance(obj, Widget)
+
+
+def _plain(value):
+    """
+    :return: O valor, se puder ser gravado em JSON, ou None
+    """
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, (list, tuple)):
+        items = [_plain(v) for v in value]
+        return None if any(i is None and v is not None for i, v in zip(items, value)) else items
+    if isinstance(value, dict):
+        items = {str(k): _plain(v) for k, v in value.items()}
+        return None if any(items[str(k)] is None and v is not None for k, v in value.items()) else items
+    return None
+
+
+def _watch(rec, widget, wid):
+    names = next((_WATCHED[cls.__name__] for cls in type(widget).__mro__
+                  if cls.__name__ in _WATCHED), ())
+    for name in names + ('size',):
+        def changed(instance, value, name=name):
+            if rec.depth or _recorder is not rec:
+                return
+            if name == 'size':
+                if instance.parent is not None and instance.parent in rec.ids:
+                    return  # Tamanho definido pelo layout do card
+                rec.emit(SIZE, wid, value[0], value[1])
+            elif name == 'value':
+                rec.emit(VALUE, wid, value)
+            elif name == 'text':
+                rec.emit(TEXT, wid, value)
+            else:
+                rec.emit(FOCUS, wid, int(bool(value)))
+        widget.fbind(name, changed)
+        rec.bindings.append((weakref.ref(widget), name, changed))
+
+
+def _traceInit(func):
+    params = list(inspect.signature(func).parameters)
+    position = params.index('style') - 1 if 'style' in params else None  # Sem o self
+
+    @wraps(func)
+    def init(self, *args, **kwargs):
+        rec = _recorder
+        if rec is None:
+            return func(self, *args, **kwargs)
+        outer = rec.depth == 0
+        rec.depth += 1
+        try:
+            func(self, *args, **kwargs)
+        finally:
+            rec.depth -= 1
+        rec.count += 1
+        wid = rec.count
+        if outer:  # Os widgets criados dentro de outros não são reproduzidos
+            name = type(self).__name__
+            if name not in rec.classes:
+                rec.classes.append(name)
+            # O estilo, nomeado ou posicional, é gravado por referência
+            args = [rec.styleRef(a) if i == position else _plain(a) for i, a in enumerate(args)]
+            kwargs = {k: rec.styleRef(v) if k == 'style' else _plain(v)
+                      for k, v in kwargs.items()}
+            rec.emit(NEW, wid, rec.classes.index(name), args, kwargs)
+            rec.ids[self] = wid
+            _watch(rec, self, wid)
+    init._ngtraceOriginal = func
+    return init
+
+
+def _traceOp(func, code):
+    @wraps(func)
+    def op(self, *args, **kwargs):
+        rec = _recorder
+        if rec is None or rec.depth:
+            return func(self, *args, **kwargs)
+        wid = rec.ids.get(self)
+        if wid is not None:
+            if code == ADD:
+                index = args[1] if len(args) > 1 else kwargs.get('index', 0)
+                rec.emit(ADD, wid, rec.ref(args[0]), index)
+            elif code == REMOVE:
+                rec.emit(REMOVE, wid, rec.ref(args[0]))
+            elif code == VISIBLE:  # setVisible(widget, visible) ou setVisibleMany(changes)
+                if func.__name__ == 'setVisibleMany':
+                    changes = args[0] if args else kwargs['changes']
+                else:
+                    widget = args[0] if args else kwargs.get('widget', kwargs.get('key'))
+                    visible = args[1] if len(args) > 1 else kwargs.get('visible', True)
+                    changes = {widget: visible}
+                rec.emit(VISIBLE, wid, [[rec.ref(w), int(bool(v))] for w, v in changes.items()])
+            elif code == ADD_MANY:
+                rec.emit(ADD_MANY, wid, [rec.ref(w) for w in (args[0] if args else kwargs['widgets'])])
+            else:
+                rec.emit(DISPOSE, wid)
+        rec.depth += 1
+        try:
+            return func(self, *args, **kwargs)
+        finally:
+            rec.depth -= 1
+    op._ngtraceOriginal = func
+    return op
+
+
+_OPS = {'add_widget': ADD, 'remove_widget': REMOVE, 'setVisible': VISIBLE,
+        'setVisibleMany': VISIBLE, 'addWidgets': ADD_MANY, 'dispose': DISPOSE}
+
+
+def start():
+    """
+    Inicia a gravação (se já houver uma em andamento, ela é descartada)
+    """
+    global _recorder
+    from kivy.clock import Clock
+    if _recorder is not None:
+        stop()
+    _recorder = _Recorder()
+    for module, name in CLASSES:
+        try:
+            cls = getattr(import_module(module), name)
+        except (ImportError, AttributeError):
+            continue
+        if '__init__' in cls.__dict__:
+            _patched.append((cls, '__init__', cls.__dict__['__init__']))
+            cls.__init__ = _traceInit(cls.__dict__['__init__'])
+        for method, code in _OPS.items():
+            if method in cls.__dict__:
+                _patched.append((cls, method, cls.__dict__[method]))
+                setattr(cls, method, _traceOp(cls.__dict__[method], code))
+    _recorder.frameEvent = Clock.schedule_interval(_recorder.frame, 0)
+
+
+def isRecording():
+    return _recorder is not None
+
+
+def stop():
+    """
+    Encerra a gravação, restaurando os métodos originais
+    :return: Trace (dicionário), para save()
+    """
+    global _recorder
+    rec = _recorder
+    if rec is None:
+        return None
+    _recorder = None
+    while _patched:
+        cls, method, original = _patched.pop()
+        setattr(cls, method, original)
+    rec.frameEvent.cancel()
+    rec.frame(0)
+    for ref, name, callback in rec.bindings:
+        widget = ref()
+        if widget is not None:
+            widget.funbind(name, callback)
+    return {'format': 'ngtrace', 'version': FORMAT_VERSION, 'classes': rec.classes,
+            'modules': {name: module for module, name in CLASSES},
+            'styles': rec.styles, 'events': rec.events}
+
+
+def save(trace, path):
+    """
+    Grava um trace em arquivo (JSON compactado com gzip)
+    """
+    with gzip.open(path, 'wt', encoding='utf-8') as f:
+        json.dump(trace, f, separators=(',', ':'))
+
+
+def load(path):
+    """
+    :return: Trace lido de um arquivo gravado por save()
+    :raise ValueError: Se o arquivo não for um trace do ngtrace
+    """
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        trace = json.load(f)
+    if trace.get('format') != 'ngtrace' or trace.get('version', 0) > FORMAT_VERSION:
+        raise ValueError('ngtrace: arquivo de trace inválido ou de versão futura: ' + str(path))
+    return trace
+
+
+def _percentile(ordered, q):
+    """
+    Percentil (pelo posto mais próximo) de uma lista já ordenada
+    """
+    if not ordered:
+        return 0.
+    return ordered[min(len(ordered) - 1, max(0, int(round(q / 100. * len(ordered))) - 1))]
+
+
+def replay(trace, repeat=1):
+    """
+    Reproduz um trace sem janela, contra a versão do kivyng importável,
+    medindo o tempo de cada quadro: aplicação dos eventos do quadro mais um
+    ciclo do Clock (layout, ngframe, texturas)
+    :param trace: Trace (dicionário, ver load)
+    :param repeat: Número de reproduções (os tempos de todas são considerados)
+    :return: Dicionário com frames, percentis (ms), eventos por tipo, eventos
+    que falharam (ex: API ausente na versão) e chamadas dos pontos do ngprof.
+    Os totais e contagens são por reprodução
+    """
+    from kivy.clock import Clock
+    import_module('kivyng')  # Sem o pacote, nenhum evento seria reproduzido
+    styles = trace.get('styles', [])
+    try:
+        ngprof = import_module('kivyng.ngprof')
+    except ImportError:
+        ngprof = None
+    classes = []
+    for name in trace['classes']:
+        try:
+            classes.append(getattr(import_module(trace['modules'][name]), name))
+        except (ImportError, AttributeError):
+            classes.append(None)
+    if ngprof is not None:
+        ngprof.reset()
+        ngprof.enable()
+    times = []
+    counts = [0] * len(_NAMES)
+    failed = [0] * len(_NAMES)
+    try:
+        for _ in range(repeat):
+            widgets = {}
+            t = perf_counter()
+            for event in trace['events']:
+                code = event[0]
+                counts[code] += 1
+                if code == FRAME:
+                    _frame(Clock)
+                    times.append(perf_counter() - t)
+                    t = perf_counter()
+                    continue
+                try:
+                    _apply(event, widgets, classes, styles)
+                except Exception:  # API ausente ou comportamento diferente na versão
+                    failed[code] += 1
+            _frame(Clock)
+            widgets.clear()
+    finally:
+        calls = ngprof.stats() if ngprof is not None else {}
+        if ngprof is not None:
+            ngprof.disable()
+    ordered = sorted(t * 1e3 for t in times)
+    return {'repeat': repeat,
+            'frames': len(ordered) // repeat,
+            'total_ms': sum(ordered) / repeat,
+            'p50_ms': _percentile(ordered, 50),
+            'p90_ms': _percentile(ordered, 90),
+            'p99_ms': _percentile(ordered, 99),
+            'max_ms': ordered[-1] if ordered else 0.,
+            'events': {_NAMES[i]: n // repeat for i, n in enumerate(counts) if n},
+            'failed': {_NAMES[i]: n // repeat for i, n in enumerate(failed) if n},
+            'calls': {name: s['count'] // repeat for name, s in calls.items()}}
+
+
+def _frame(clock):
+    """
+    Processa um quadro do Clock (eventos agendados, gatilhos de layout, ngframe)
+    como Clock.tick, mas sem a espera que limita a taxa de quadros (maxfps)
+    """
+    clock.pre_idle()
+    now = clock.time()
+    clock.post_idle(now, now)
+    clock.tick_draw()
+
+
+def _style(value, styles):
+    """
+    :return: O estilo correspondente a uma referência gravada (ver
+    _Recorder.styleRef), ou o próprio valor, se não for uma referência
+    """
+    if isinstance(value, dict) and len(value) == 1:
+        if '$theme' in value:
+            return getattr(import_module('kivyng.ngstyle'), value['$theme'])
+        if '$style' in value:
+            return styles[value['$style']]
+    return value
+
+
+def _apply(event, widgets, classes, styles=()):
+    """
+    Aplica um evento do trace aos widgets reproduzidos
+    :param styles: Estilos próprios gravados no trace (trace['styles'])
+    """
+    def get(ref):
+        return ref[0] if isinstance(ref, list) else widgets[ref]
+
+    code = event[0]
+    if code == NEW:
+        wid, cls, args, kwargs = event[1:]
+        args = [_style(a, styles) for a in args]
+        kwargs = {k: _style(v, styles) for k, v in kwargs.items()}
+        widgets[wid] = classes[cls](*args, **kwargs)
+        return
+    widget = widgets[event[1]]
+    if code == ADD:
+        widget.add_widget(get(event[2]), event[3])
+    elif code == REMOVE:
+        widget.remove_widget(get(event[2]))
+    elif code == VISIBLE:
+        changes = {get(ref): bool(v) for ref, v in event[2]}
+        if hasattr(widget, 'setVisibleMany'):
+            widget.setVisibleMany(changes)
+        else:
+            for w, v in changes.items():
+                widget.setVisible(w, v)
+    elif code == ADD_MANY:
+        children = [get(ref) for ref in event[2]]
+        if hasattr(widget, 'addWidgets'):
+            widget.addWidgets(children)
+        else:
+            for w in children:
+                widget.add_widget(w)
+    elif code == VALUE:
+        widget.value = event[2]
+    elif code == TEXT:
+        widget.text = event[2]
+    elif code == SIZE:
+        widget.size = event[2:4]
+    elif code == FOCUS:
+        widget.focus = bool(event[2])
+    elif code == DISPOSE:
+        widget.dispose()
+        del widgets[event[1]]
+
+
+def summary(report):
+    """
+    :return: Texto com o resultado de replay()
+    """
+    lines = ['quadros {frames}  total {total_ms:.1f} ms  p50 {p50_ms:.2f}  p90 {p90_ms:.2f}  '
+             'p99 {p99_ms:.2f}  máx {max_ms:.2f} ms'.format(**report),
+             'eventos: ' + ', '.join('{} {}'.format(k, v) for k, v in report['events'].items())]
+    if report['failed']:
+        lines.append('falhas: ' + ', '.join('{} {}'.format(k, v) for k, v in report['failed'].items()))
+    for name, count in sorted(report['calls'].items(), key=lambda i: -i[1]):
+        lines.append('    {:<28}{:>10}'.format(name, count))
+    return '\n'.join(lines)
+
+
+def compare(old, new):
+    """
+    Compara dois resultados de replay(), imprimindo a razão novo/antigo
+    """
+    for key in ('total_ms', 'p50_ms', 'p90_ms', 'p99_ms', 'max_ms'):
+        ratio = new[key] / old[key] if old[key] else float('nan')
+        print('{:<10}{:>12.2f}{:>12.2f}{:>8.2f}x'.format(key, old[key], new[key], ratio))
+    for name in sorted(set(old['calls']) | set(new['calls'])):
+        print('{:<28}{:>10}{:>10}'.format(name, old['calls'].get(name, 0), new['calls'].get(name, 0)))
+
+
+def usePackage(root):
+    """
+    Carrega o pacote do diretório root como kivyng (os módulos importam uns
+    aos outros como kivyng.ngX), qualquer que seja o nome do diretório
+    :param root: Diretório do pacote (com o __init__.py)
+    :raise ImportError: Se o diretório não contiver um pacote
+    """
+    root = os.path.abspath(root)
+    init = os.path.join(root, '__init__.py')
+    if not os.path.isfile(init):
+        raise ImportError('{} não é um pacote kivyng'.format(root))
+    spec = util.spec_from_file_location('kivyng', init, submodule_search_locations=[root])
+    package = sys.modules['kivyng'] = util.module_from_spec(spec)
+    spec.loader.exec_module(package)
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description='Reprodução headless de traces do kivyng')
+    parser.add_argument('trace', nargs='?', help='arquivo gravado por ngtrace.save')
+    parser.add_argument('--root', help='diretório do pacote kivyng a medir, qualquer que '
+                                       'seja o nome dele (padrão: esta cópia)')
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--output', help='arquivo JSON de saída')
+    parser.add_argument('--compare', nargs=2, metavar=('ANTIGO', 'NOVO'),
+                        help='compara dois arquivos de resultados')
+    args = parser.parse_args()
+    if args.compare:
+        with open(args.compare[0]) as a, open(args.compare[1]) as b:
+            compare(json.load(a), json.load(b))
+        return
+    if not args.trace:
+        parser.error('informe o arquivo de trace')
+    os.environ.setdefault('KIVY_NO_ARGS', '1')
+    os.environ.setdefault('KIVY_NO_CONSOLELOG', '1')
+    os.environ.setdefault('KIVY_NO_FILELOG', '1')
+    try:
+        usePackage(args.root or os.path.dirname(os.path.abspath(__file__)))
+        report = replay(load(args.trace), args.repeat)
+    except ImportError as e:  # O Kivy redireciona sys.stderr para o log (desligado)
+        parser.print_usage(sys.__stderr__)
+        sys.__stderr__.write('ngtrace: {} (verifique --root)\n'.format(e))
+        sys.exit(2)
+    print(summary(report))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=1)
+
+
+if __name__ == '__main__':
+    main()
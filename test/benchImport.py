@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Medição do tempo de importação (partida a frio) do kivyng
+Cada cenário é executado em um interpretador novo, várias vezes, e é
+registrada a mediana do tempo de importação e o número de módulos carregados.
+Os cenários comparam o acesso sob demanda pelo pacote (from kivyng import X)
+com a importação de todos os módulos, como era feito antes:
+    python3 benchImport.py --repeat 10 --output import.json
+Com --importtime, mostra também os 15 módulos mais lentos (python -X importtime)
+de cada cenário
+
+__author__   = "Carlos R Rocha"
+__license__  = "LGPL"
+__version__  = "20261018-0040"
+__email__    = "cticarlo@gmail.com"
+__status__   = "Prototype"
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCENARIOS = {
+    'package': 'import kivyng',
+    'BoxCard': 'from kivyng import BoxCard',
+    'AlignedLabel': 'from kivyng import AlignedLabel',
+    'NumericInput': 'from kivyng import NumericInput',
+    'eager': 'import kivyng.ngcard, kivyng.ngdisplay, kivyng.nginput, kivyng.ngstyle',
+}
+
+# Executado no interpretador filho antes de qualquer medição: import kivyng
+# encontra esta cópia, qualquer que seja o nome do diretório
+SETUP = '''
+import importlib.util, os, sys
+class _Finder(object):
+    @staticmethod
+    def find_spec(name, path=None, target=None):
+        if name == 'kivyng':
+            return importlib.util.spec_from_file_location(
+                name, os.path.join({root!r}, '__init__.py'), submodule_search_locations=[{root!r}])
+sys.meta_path.insert(0, _Finder)
+'''.format(root=ROOT)
+
+# Executado no interpretador filho: mede só a importação, sem o custo de partida do Python
+PROBE = SETUP + '''
+import sys, time
+t = time.perf_counter()
+{code}
+dt = time.perf_counter() - t
+print(dt, len(sys.modules))
+'''
+
+
+def _env():
+    env = dict(os.environ)
+    env.update({'KIVY_NO_ARGS': '1', 'KIVY_NO_CONSOLELOG': '1', 'KIVY_NO_FILELOG': '1',
+                'PYTHONDONTWRITEBYTECODE': '1'})
+    return env
+
+
+def measure(code, repeat):
+    """
+    :return: (mediana do tempo em segundos, módulos carregados)
+    """
+    times = []
+    modules = 0
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, '-c', PROBE.format(code=code)], env=_env(),
+                             check=True, capture_output=True, text=True).stdout.split()
+        times.append(float(out[0]))
+        modules = int(out[1])
+    return statistics.median(times), modules
+
+
+def importtime(code, top=15):
+    """
+    :return: Os módulos mais lentos (tempo cumulativo, em us) segundo -X importtime
+    """
+    err = subprocess.run([sys.executable, '-X', 'importtime', '-c', SETUP + code], env=_env(),
+                         check=True, capture_output=True, text=True).stderr
+    rows = []
+    for line in err.splitlines():
+        if line.startswith('import time:') and '|' in line:
+            _, cumulative, name = line[len('import time:'):].split('|')
+            if cumulative.strip().isdigit():
+                rows.append((int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Tempo de importação do kivyng')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--importtime', action='store_true')
+    parser.add_argument('--output', help='arquivo JSON de saída')
+    args = parser.parse_args()
+    results = {}
+    for name, code in SCENARIOS.items():
+        seconds, modules = measure(code, args.repeat)
+        results[name] = {'code': code, 'seconds': seconds, 'modules': modules}
+        print('{:<14}{:>10.1f} ms{:>8} módulos'.format(name, seconds * 1e3, modules))
+        if args.importtime:
+            for us, module in importtime(code):
+                print('    {:>10.1f} ms  {}'.format(us / 1e3, module))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmarks dos widgets do kivyng, executados sem janela (sem GPU)
+Mede, para 10, 1k e 10k widgets (configurável):
+    construct: tempo de construção de BoxCard, FormCard, AlignedLabel e NumericInput
+    memory: memória alocada por widget (tracemalloc)
+    layout: tempo de um passo de layout de BoxCard/FormCard com n filhos
+    layoutFixed: o mesmo passo, com o cache de layout (setFixedLayout) já preenchido
+    setVisible: esconder e mostrar todos os n filhos, um a um e em lote
+    value: atualizações de NumericInput.value
+    typing: inserção de texto (insert_text) em NumericInput, por caractere
+    typingBurst: o mesmo texto digitado como rajada (typeText), por caractere
+O resultado é um JSON, para acompanhar regressões entre versões:
+    python3 benchmark.py --sizes 10 1000 --output atual.json
+    python3 benchmark.py --compare anterior.json atual.json
+Com --window, usa o provedor de janela offscreen do SDL2 (contexto GL por
+software), o que inclui a criação de texturas nas medições
+
+__author__   = "Carlos R Rocha"
+__license__  = "LGPL"
+__version__  = "20261018-0039"
+__email__    = "cticarlo@gmail.com"
+__status__   = "Prototype"
+"""
+
+import argparse
+import gc
+import importlib.util
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+os.environ.setdefault('KIVY_NO_ARGS', '1')
+os.environ.setdefault('KIVY_NO_CONSOLELOG', '1')
+os.environ.setdefault('KIVY_NO_FILELOG', '1')
+# Esta cópia do repositório é carregada como o pacote kivyng, qualquer que seja
+# o nome do diretório (os módulos importam uns aos outros como kivyng.ngX)
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_spec = importlib.util.spec_from_file_location('kivyng', os.path.join(ROOT, '__init__.py'),
+                                               submodule_search_locations=[ROOT])
+sys.modules['kivyng'] = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(sys.modules['kivyng'])
+
+CLASSES = ('BoxCard', 'FormCard', 'AlignedLabel', 'NumericInput')
+
+
+def _factories():
+    from kivyng.ngcard import BoxCard, FormCard
+    from kivyng.ngdisplay import AlignedLabel
+    from kivyng.nginput import NumericInput
+    return {'BoxCard': lambda i: BoxCard(),
+            'FormCard': lambda i: FormCard(),
+            'AlignedLabel': lambda i: AlignedLabel(text='Label {}'.format(i)),
+            'NumericInput': lambda i: NumericInput(i % 100, 2)}
+
+
+def _tick(count=3):
+    """
+    Processa os eventos agendados (gatilhos de layout, ngframe)
+    """
+    from kivy.clock import Clock
+    for _ in range(count):
+        Clock.tick()
+
+
+def _result(bench, widget, n, seconds, items=None, **extra):
+    items = items or n
+    r = {'bench': bench, 'widget': widget, 'n': n, 'seconds': seconds,
+         'per_item_us': seconds / items * 1e6}
+    r.update(extra)
+    return r
+
+
+def benchConstruct(n):
+    factories = _factories()
+    results = []
+    for name in CLASSES:
+        make = factories[name]
+        gc.collect()
+        t = time.perf_counter()
+        widgets = [make(i) for i in range(n)]
+        results.append(_result('construct', name, n, time.perf_counter() - t))
+        del widgets
+    return results
+
+
+def benchMemory(n):
+    factories = _factories()
+    results = []
+    for name in CLASSES:
+        make = factories[name]
+        make(0)  # Carrega módulos e caches antes da medição
+        gc.collect()
+        tracemalloc.start()
+        widgets = [make(i) for i in range(n)]
+        current = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        results.append(_result('memory', name, n, 0., bytes_per_widget=current / n))
+        del widgets
+    return results
+
+
+def _filledCard(name, n):
+    """
+    Card com n filhos (no FormCard, n/2 linhas label + input)
+    """
+    from kivyng.ngcard import VerticalBoxCard, FormCard
+    from kivyng.ngdisplay import AlignedLabel
+    from kivyng.nginput import NumericInput
+    from kivy.uix.widget import Widget
+    if name == 'BoxCard':
+        card = VerticalBoxCard(size=(800, 600))
+        children = [Widget() for _ in range(n)]
+        for w in children:
+            card.add_widget(w)
+    else:
+        card = FormCard(size=(800, 600))
+        children = []
+        for i in range(max(n // 2, 1)):
+            children.append(AlignedLabel(text='Campo {}'.format(i)))
+            children.append(NumericInput(i % 100, 2))
+            card.add_widget(children[-2])
+            card.add_widget(children[-1])
+    _tick()
+    return card, children
+
+
+def benchLayout(n):
+    results = []
+    for name in ('BoxCard', 'FormCard'):
+        card, children = _filledCard(name, n)
+        repeat = max(1, 1000 // n)
+        t = time.perf_counter()
+        for _ in range(repeat):
+            card.do_layout()
+        results.append(_result('layout', name, n, (time.perf_counter() - t) / repeat))
+        card.setFixedLayout()
+        card.do_layout()  # Primeiro passo: preenche o cache
+        t = time.perf_counter()
+        for _ in range(repeat):
+            card.do_layout()
+        results.append(_result('layoutFixed', name, n, (time.perf_counter() - t) / repeat))
+    return results
+
+
+def benchVisible(n):
+    results = []
+    for name in ('BoxCard', 'FormCard'):
+        card, children = _filledCard(name, n)
+        step = 2 if name == 'FormCard' else 1  # No FormCard a linha toda é afetada
+        targets = children[::step]
+        t = time.perf_counter()
+        for w in targets:
+            card.setVisible(w, False)
+        for w in targets:
+            card.setVisible(w, True)
+        _tick()
+        results.append(_result('setVisible', name, n, time.perf_counter() - t, 2 * len(targets)))
+        t = time.perf_counter()
+        card.setVisibleMany({w: False for w in targets})
+        card.setVisibleMany({w: True for w in targets})
+        _tick()
+        results.append(_result('setVisibleMany', name, n, time.perf_counter() - t,
+                               2 * len(targets)))
+    return results
+
+
+def benchValue(n):
+    from kivyng.nginput import NumericInput
+    inputs = [NumericInput(0, 2) for _ in range(n)]
+    updates = max(n, 1000)
+    t = time.perf_counter()
+    for i in range(updates):
+        inputs[i % n].value = (i % 1000) / 10.
+    _tick()
+    return [_result('value', 'NumericInput', n, time.perf_counter() - t, updates)]
+
+
+def benchTyping(n):
+    from kivyng.nginput import NumericInput
+    inputs = [NumericInput(0, 2) for _ in range(n)]
+    for w in inputs:
+        w.text = ''
+    keys = '12.34'
+    strokes = max(n, 200)
+    t = time.perf_counter()
+    for i in range(strokes // len(keys)):
+        w = inputs[i % n]
+        if len(w.text) >= len(keys):
+            w.text = ''
+        for ch in keys:
+            w.insert_text(ch)
+    _tick()
+    results = [_result('typing', 'NumericInput', n, time.perf_counter() - t,
+                       strokes // len(keys) * len(keys))]
+    for w in inputs:
+        w.text = ''
+    t = time.perf_counter()
+    for i in range(strokes // len(keys)):
+        w = inputs[i % n]
+        w.text = ''
+        w.typeText(keys)  # Rajada: uma atualização de texto e um on_text_validate
+    _tick()
+    results.append(_result('typingBurst', 'NumericInput', n, time.perf_counter() - t,
+                           strokes // len(keys) * len(keys)))
+    return results
+
+
+BENCHES = {'construct': benchConstruct, 'memory': benchMemory, 'layout': benchLayout,
+           'setVisible': benchVisible, 'value': benchValue, 'typing': benchTyping}
+
+
+def _revision():
+    """
+    :return: Revisão do git desta cópia (com '+' se houver alterações não
+    registradas), ou None fora de um repositório git
+    """
+    try:
+        rev = subprocess.run(['git', '-C', ROOT, 'rev-parse', '--short', 'HEAD'],
+                             capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', '-C', ROOT, 'status', '--porcelain', '--untracked-files=no'],
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return rev + ('+' if dirty else '')
+
+
+def run(sizes, benches, window=False):
+    """
+    Executa os benchmarks
+    :param sizes: Quantidades de widgets
+    :param benches: Nomes dos benchmarks (chaves de BENCHES)
+    :param window: Se True, cria uma janela offscreen (contexto GL por software)
+    :return: Dicionário com os metadados e a lista de resultados
+    """
+    if window:
+        os.environ.setdefault('SDL_VIDEODRIVER', 'offscreen')
+        from kivy.core.window import Window  # noqa: F401
+    import kivy
+    # Os cabeçalhos dos módulos não acompanham cada alteração: a revisão do git
+    # identifica o código medido
+    revision = _revision()
+    results = []
+    for n in sizes:
+        for name in benches:
+            results.extend(BENCHES[name](n))
+            gc.collect()
+    return {'meta': {'kivy': kivy.__version__,
+                     'kivyng': revision,
+                     'python': platform.python_version(),
+                     'platform': platform.platform(),
+                     'window': window,
+                     'time': time.strftime('%Y-%m-%dT%H:%M:%S')},
+            'results': results}
+
+
+def compare(old, new):
+    """
+    Compara dois resultados (JSON), imprimindo a razão novo/antigo de cada medição
+    """
+    def key(r):
+        return r['bench'], r['widget'], r['n']
+    metric = lambda r: r.get('bytes_per_widget', r['per_item_us'])
+    before = {key(r): r for r in old['results']}
+    for r in new['results']:
+        o = before.get(key(r))
+        if o is None or not metric(o):
+            continue
+        print('{:<16}{:<14}{:>7}{:>14.2f}{:>14.2f}{:>8.2f}x'.format(
+            r['bench'], r['widget'], r['n'], metric(o), metric(r), metric(r) / metric(o)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks headless do kivyng')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10, 1000, 10000])
+    parser.add_argument('--bench', nargs='+', choices=sorted(BENCHES), default=list(BENCHES))
+    parser.add_argument('--window', action='store_true',
+                        help='usa uma janela offscreen (SDL_VIDEODRIVER=offscreen)')
+    parser.add_argument('--output', help='arquivo JSON de saída (padrão: stdout)')
+    parser.add_argument('--compare', nargs=2, metavar=('ANTIGO', 'NOVO'),
+                        help='compara dois arquivos de resultados')
+    args = parser.parse_args()
+    if args.compare:
+        with open(args.compare[0]) as a, open(args.compare[1]) as b:
+            compare(json.load(a), json.load(b))
+        return
+    data = run(args.sizes, args.bench, args.window)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(data, f, indent=1)
+    else:
+        json.dump(data, sys.stdout, indent=1)
+        print()
+
+
+if __name__ == '__main__':
+    main()
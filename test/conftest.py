@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+"""
+Configuração dos testes automatizados (pytest), executados sem janela:
+    python3 -m pytest -q test
+O diretório do repositório é carregado como o pacote kivyng, qualquer que
+seja o nome do diretório (os módulos importam uns aos outros como kivyng.ngX)
+"""
+
+import importlib.util
+import os
+import sys
+
+os.environ.setdefault('KIVY_NO_ARGS', '1')
+os.environ.setdefault('KIVY_NO_CONSOLELOG', '1')
+os.environ.setdefault('KIVY_NO_FILELOG', '1')
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+if 'kivyng' not in sys.modules:
+    _spec = importlib.util.spec_from_file_location('kivyng', os.path.join(ROOT, '__init__.py'),
+                                                   submodule_search_locations=[ROOT])
+    sys.modules['kivyng'] = importlib.util.module_from_spec(_spec)
+    _spec.loader.exec_module(sys.modules['kivyng'])
@@ -0,0 +1,24 @@
+import sys
+sys.path.insert(0,'..')
+
+from kivy.clock import Clock
+from kivy.app import App
+from ngcard import VirtualFormCard
+
+class MainApp(App):
+    def build(self):
+        rows = [{'name': 'p{}'.format(i), 'label': 'Parâmetro {}'.format(i),
+                 'value': i % 100, 'decimals': 2} for i in range(5000)]
+        self.tela = VirtualFormCard(rows, padding=5, spacing=5)
+        Clock.schedule_once(self.escondePares, 3.)
+        return self.tela
+
+
+    def escondePares(self, dt):
+        with self.tela.visibilityBatch():
+            for i in range(0, self.tela.rowCount(), 2):
+                self.tela.setVisible('p{}'.format(i), False)
+
+
+if __name__ == '__main__':
+    MainApp().run()
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""
+Testes do desenho em lote (ngbatch)
+"""
+
+from kivy.graphics import Color, Rectangle
+from kivy.uix.boxlayout import BoxLayout
+from kivy.uix.widget import Widget
+from kivyng.ngcard import BoxCard
+
+_BG = {'background_color': (.2, .2, .3, 1), 'border_width': 0}
+
+
+def test_batch_skips_widgets_that_draw_over_children():
+    root = BoxCard(style=_BG)
+    plain, painted = BoxLayout(), Widget()
+    with painted.canvas:
+        Color(1, 1, 1, 1)
+        Rectangle()
+    inner, hidden = BoxCard(style=_BG), BoxCard(style=_BG)
+    plain.add_widget(inner)
+    painted.add_widget(hidden)
+    root.add_widget(plain)
+    root.add_widget(painted)
+    root.setBatched(True)
+    assert root.batchStats()['widgets'] == 2
+    assert inner._batch is root._batchRoot
+    assert hidden._batch is None and hidden._canvasGroup in hidden.canvas.before.children
+    root.setBatched(False)
+    assert inner._batch is None and inner._canvasGroup in inner.canvas.before.children
+
+
+def test_batch_rescans_only_changed_subtrees():
+    root = BoxCard(style=_BG)
+    left, right = BoxLayout(), BoxLayout()
+    deep = BoxLayout()
+    right.add_widget(deep)
+    root.add_widget(left)
+    root.add_widget(right)
+    root.setBatched(True)
+    batch = root._batchRoot
+    card = BoxCard(style=_BG)
+    left.add_widget(card)
+    assert batch._changed == {left}
+    batch.update()
+    assert batch._entries[card][0] == 2
+    left.remove_widget(card)   # Movido para uma profundidade maior no mesmo quadro
+    deep.add_widget(card)
+    assert batch._changed == {left, deep}
+    batch.update()
+    assert batch._entries[card][0] == 3
+    deep.remove_widget(card)
+    batch.update()
+    assert card not in batch._entries and card._batch is None
+    assert batch.stats()['widgets'] == 1
@@ -0,0 +1,324 @@
+# -*- coding: utf-8 -*-
+"""
+Testes dos cards (ngcard): índice de visibilidade, visibilidade em lote e
+cards virtualizados (ordenação, filtro e reciclagem de linhas), registro e
+restauração do estado dos inputs e cache de layout
+"""
+
+import sys
+import pytest
+from kivy.uix.widget import Widget
+from kivyng.nginput import NumericInput
+from kivyng.ngcard import _VisibilityIndex, BoxCard, FormCard, TableCard, VirtualFormCard
+
+
+class _Item(object):
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return self.name
+
+
+def _index(n, **kwargs):
+    items = [_Item('w{}'.format(i)) for i in range(n)]
+    index = _VisibilityIndex([], **kwargs)
+    index.prepend(items[::-1])
+    children = list(items)
+    return index, items, children
+
+
+def _apply(index, children, changes):
+    index.apply(changes, lambda w, i: children.insert(i, w), children.remove)
+
+
+def test_visibility_index_positions():
+    index, items, children = _index(6)
+    assert index.widgets == items
+    assert [index.slot(w) for w in items] == list(range(6))
+    _apply(index, children, {items[1]: False, items[3]: False})
+    assert children == [items[0], items[2], items[4], items[5]]
+    assert index.isVisible(items[1]) is False
+    assert index.childIndex(index.slot(items[4])) == 2
+    _apply(index, children, {items[3]: True, items[1]: True})
+    assert children == items
+
+
+def test_visibility_index_insert_remove():
+    index, items, children = _index(3)
+    extra = _Item('x')
+    index.insert(1, extra)
+    assert index.slot(extra) == 1 and index.slot(items[1]) == 2
+    assert index.remove(items[0])
+    assert not index.remove(items[0])
+    assert index.isVisible(items[0]) is None
+    assert index.members() == [extra, items[1], items[2]]
+
+
+def test_visibility_index_batch():
+    index, items, children = _index(4)
+    applied = []
+    with index.batch(applied.append):
+        index.pending[items[0]] = False
+        with index.batch(applied.append):
+            index.pending[items[2]] = False
+        assert applied == []
+    assert applied == [{items[0]: False, items[2]: False}]
+
+
+def test_box_card_set_visible_keeps_order():
+    card = BoxCard()
+    widgets = [Widget() for _ in range(5)]
+    for w in widgets:
+        card.add_widget(w)
+    with card.visibilityBatch():
+        for w in widgets[::2]:
+            card.setVisible(w, False)
+    assert card.children == [widgets[3], widgets[1]]
+    card.setVisibleMany({widgets[0]: True, widgets[4]: True})
+    assert card.children == [widgets[4], widgets[3], widgets[1], widgets[0]]
+    card.setVisible(widgets[2], True)
+    assert card.children == widgets[::-1]
+
+
+def _table(**kwargs):
+    columns = [{'name': 'id'}, {'name': 'v', 'decimals': 1}, {'name': 'n', 'editable': True}]
+    data = {'id': [0, 1, 2, 3, 4], 'v': [2., 1., 2., float('nan'), 1.], 'n': [5, 4, 3, 2, 1]}
+    table = TableCard(columns, data, size=(300, 400), **kwargs)
+    table._scroll.height = 300
+    return table
+
+
+def test_table_sort_is_stable_both_ways():
+    table = _table()
+    table.sort('v')
+    assert [int(i) for i in table.view()] == [1, 4, 0, 2, 3]
+    table.sort('v', reverse=True)
+    assert [int(i) for i in table.view()] == [0, 2, 1, 4, 3]
+    table.sort()
+    assert [int(i) for i in table.view()] == [0, 1, 2, 3, 4]
+
+
+def test_table_filter_and_refresh():
+    table = _table()
+    table.filterRange('n', 2, 4)
+    assert [int(i) for i in table.view()] == [1, 2, 3]
+    table.sort('n')
+    assert [int(i) for i in table.view()] == [3, 2, 1]
+    table._refresh()
+    rows = sorted(table._viewport.children, key=lambda r: -r.y)
+    assert [r.row for r in rows] == [3, 2, 1]
+    assert [r.cells[2].value for r in rows] == [2, 3, 4]
+    assert rows[0].cells[1].text == 'nan'
+    with pytest.raises(ValueError):
+        table.filter([True])
+    ids = TableCard([{'name': 'id'}], {'id': [1, float('nan'), float('inf')]})
+    ids._refresh()
+    assert sorted(r.cells[0].text for r in ids._viewport.children) == ['1', 'inf', 'nan']
+
+
+def test_table_editable_bounds():
+    table = TableCard([{'name': 'a', 'editable': True, 'vMax': 10}], {'a': [1, 2, 3]})
+    table._refresh()
+    assert sorted(r.cells[0].value for r in table._viewport.children) == [1, 2, 3]
+    with pytest.raises(ValueError):
+        table.setData({'a': [1, 20]})
+    with pytest.raises(ValueError):
+        table.setValue(0, 'a', 11)
+    table.setValue(0, 'a', -5)
+    assert table.getValue(0, 'a') == -5
+
+
+def test_virtual_form_recycles_rows():
+    rows = [{'label': str(i), 'value': i + 1, 'vMax': 1000} for i in range(100)]
+    card = VirtualFormCard(rows, size=(200, 300))
+    card._scroll.height = 300
+    card._refresh()
+    shown = len(card._viewport.children)
+    assert 0 < shown < 20 and card._pool[0].input.value == card._rows[card._pool[0].row]['value']
+    card.setVisible(0, False)
+    card._refresh()
+    assert len(card._pool) == shown
+    assert min(r.row for r in card._viewport.children) == 1
+
+
+def test_form_card_drops_rows_with_a_collected_half():
+    import gc
+    card = FormCard(weakHidden=True)
+    widgets = [Widget() for _ in range(6)]
+    card.addWidgets(widgets)
+    card.setVisible(widgets[2], False)
+    survivor = widgets[3]
+    widgets[2] = None
+    gc.collect()
+    card.setVisible(survivor, True)
+    assert card.isVisible(survivor) is None and survivor.parent is None
+    assert card.children == [widgets[5], widgets[4], widgets[1], widgets[0]]
+
+
+def test_form_card_dispose_and_reset_detach_everything():
+    card = FormCard()
+    widgets = [Widget() for _ in range(4)]
+    card.addWidgets(widgets)
+    card.fields['a'] = widgets[1]
+    card.setVisible(widgets[2], False)
+    card.reset()
+    assert card.children == [] and card.fields == {} and card._visIndex.members() == []
+    assert all(w.parent is None for w in widgets)
+    card.addWidgets(widgets)
+    card.dispose()
+    assert card.children == [] and card._widgets == []
+
+
+def test_weak_form_card_shows_hidden_rows_again():
+    card = FormCard(weakHidden=True)
+    widgets = [Widget() for _ in range(4)]
+    card.addWidgets(widgets)
+    card.setVisible(widgets[0], False)
+    assert card.children == [widgets[3], widgets[2]]
+    card.setVisible(widgets[0], True)
+    assert card.isVisible(widgets[0]) and card.isVisible(widgets[1])
+    assert card.children == widgets[::-1]
+    with card.visibilityBatch():
+        card.setVisible(widgets[3], False)
+    card.setVisibleMany({widgets[2]: True})
+    assert card.children == widgets[::-1]
+
+
+@pytest.mark.parametrize('cls', [BoxCard, FormCard])
+def test_add_widget_clamps_index(cls):
+    card = cls()
+    widgets = [Widget() for _ in range(3)]
+    card.add_widget(widgets[0])
+    card.add_widget(widgets[1], 10)
+    card.add_widget(widgets[2], -5)
+    assert card._widgets == [widgets[2], widgets[0], widgets[1]]
+    extra = Widget()
+    card.add_widget(extra, -1)  # Como list.insert: antes do último
+    assert card._widgets.index(extra) == 2
+    card.remove_widget(extra)
+    assert card.children == card._widgets
+    card.setVisible(widgets[0], False)
+    card.add_widget(Widget(), 99)
+    assert len(card._widgets) == 4 and len(card.children) == 2 + (cls is BoxCard)
+
+
+def test_virtual_form_rejects_out_of_range_values():
+    card = VirtualFormCard([{'value': 5}, {'value': 50, 'vMax': 1000}])
+    with pytest.raises(ValueError):
+        card.setRows([{'value': 5}, {'value': 500}])
+    assert card.rowCount() == 2 and card.getValue(1) == 50
+    with pytest.raises(ValueError):
+        card.setValue(0, 500)
+    card.setValue(1, 500)
+    card._refresh()
+    assert sorted(r.input.value for r in card._viewport.children) == [5, 500]
+
+
+def _stateCards():
+    outer, inner = BoxCard(), FormCard()
+    a, b, c = NumericInput(10), NumericInput(2.5, 1, 0, 10), NumericInput(7)
+    outer.add_widget(a)
+    outer.add_widget(inner)
+    outer.add_widget(b)
+    inner.add_widget(c)
+    return outer, inner, (b, c, a)   # Ordem dos inputs no registro
+
+
+def test_snapshot_restore_nested_cards():
+    outer, inner, inputs = _stateCards()
+    snap = outer.snapshot()
+    assert snap.widgets == inputs and snap.cards == (outer, inner, outer)
+    assert list(snap.values) == [2.5, 7, 10] and list(snap.visible) == [1, 1, 1]
+    assert outer.restore(snap) == 0
+    inputs[0].value, inputs[1].value = 9.5, 70
+    assert outer.restore(snap) == 2
+    assert [w.value for w in inputs] == [2.5, 7, 10]
+    inner.add_widget(NumericInput(1))
+    with pytest.raises(ValueError):
+        outer.restore(snap)
+
+
+def test_restore_bounds_and_visibility():
+    outer, inner, (b, c, a) = _stateCards()
+    snap = outer.snapshot()
+    c.configure(500, None, 0, 1000)
+    outer.setVisible(a, False)
+    inner.setVisible(c, False)
+    assert snap.diff(outer.snapshot()) == [1, 2]
+    assert outer.restore(snap) == 2
+    assert (c.value, c._format.vMin, c._format.vMax) == (7, 0, 100)
+    with pytest.raises(ValueError):
+        c.value = 500   # Limites do input restaurados por configure
+    assert outer.isVisible(a) and inner.isVisible(c) and a.parent is outer
+
+
+def test_restore_out_of_bounds_changes_nothing():
+    outer, inner, (b, c, a) = _stateCards()
+    snap = outer.snapshot()
+    snap.values[2] = 20
+    snap.values[0] = 11   # Acima de vMax = 10
+    snap.visible[1] = 0
+    with pytest.raises(ValueError):
+        outer.restore(snap)
+    assert (a.value, b.value) == (10, 2.5) and inner.isVisible(c)
+
+
+@pytest.mark.parametrize('withNumpy', [False, True])
+def test_snapshot_diff(monkeypatch, withNumpy):
+    if withNumpy:
+        pytest.importorskip('numpy')
+    else:
+        monkeypatch.setitem(sys.modules, 'numpy', None)   # import numpy falha
+    outer, inner, (b, c, a) = _stateCards()
+    snap = outer.snapshot()
+    assert snap.diff(outer.snapshot()) == []
+    a.value = 20
+    inner.setVisible(c, False)
+    assert snap.diff(outer.snapshot()) == [1, 2]
+    b.configure(2.5, 1, 0, 20)
+    assert snap.diff(outer.snapshot()) == [0, 1, 2]
+    with pytest.raises(ValueError):
+        snap.diff(inner.snapshot())
+
+
+@pytest.mark.parametrize('cls', [BoxCard, FormCard])
+def test_cached_layout_matches_uncached(cls):
+    def build(fixed):
+        card = cls(pos=(5, 7), size=(200, 300), **({'cols': 2} if cls is FormCard else {}))
+        kids = [Widget(size_hint_y=None, height=30 + i) if i % 2 else Widget() for i in range(6)]
+        for w in kids:
+            card.add_widget(w)
+        card.setFixedLayout(fixed)
+        return card, kids
+
+    cached, a = build(True)
+    plain, b = build(False)
+
+    def check():
+        geometry = []
+        for card, kids in ((cached, a), (plain, b)):
+            card.do_layout()
+            geometry.append([v for w in kids if w.parent for v in (*w.pos, *w.size)])
+        assert geometry[0] == pytest.approx(geometry[1])  # Posições guardadas como deslocamentos
+        assert tuple(cached.minimum_size) == tuple(plain.minimum_size)
+
+    check()
+    for card, kids in ((cached, a), (plain, b)):
+        card.setVisible(kids[2], False)
+    check()
+    for card, kids in ((cached, a), (plain, b)):
+        card.setVisible(kids[2], True)
+    check()
+    assert cached.layoutStats()['hits'] >= 1
+    for card in (cached, plain):
+        card.pos = (40, 12)
+    check()
+    for card in (cached, plain):
+        card.spacing = 9
+    assert cached.layoutStats()['entries'] == 0
+    check()
+    for card, kids in ((cached, a), (plain, b)):
+        kids[1].height = 55
+    check()
+    assert cached.layoutStats()['hits'] >= 2
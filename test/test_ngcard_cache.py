@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+Testes do modo de cache (Fbo) dos cards. Precisam de um contexto GL: são
+executados em um interpretador separado, com a janela offscreen do SDL2, e
+ignorados se ela não puder ser criada
+"""
+
+import json
+import os
+import subprocess
+import sys
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = '''
+import importlib.util, json, os, sys
+spec = importlib.util.spec_from_file_location('kivyng', os.path.join({root!r}, '__init__.py'),
+                                              submodule_search_locations=[{root!r}])
+sys.modules['kivyng'] = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(sys.modules['kivyng'])
+try:
+    from kivy.core.window import Window
+    from kivy.base import EventLoop
+    EventLoop.ensure_window()
+    assert Window is not None
+except Exception:
+    sys.exit(3)
+from kivy.graphics.opengl import glReadPixels, GL_RGBA, GL_UNSIGNED_BYTE
+from kivy.uix.widget import Widget
+from kivyng import ngform
+from kivyng.ngcard import BoxCard
+from kivyng.ngdisplay import AlignedLabel
+
+Window.size = (320, 240)
+root = Widget(size=(320, 240))
+Window.add_widget(root)
+card = ngform.buildForm([{{'name': 'f%d' % i, 'label': 'Campo %d' % i, 'decimals': 2, 'value': i + 1}}
+                         for i in range(4)], pos=(10, 10), size=(200, 160),
+                        background_color=(.2, .2, .3, .8))
+inner = BoxCard(background_color=(.5, .1, .1, .6), border_width=0)
+inner.add_widget(AlignedLabel(text='x'))
+card.add_widget(inner)
+root.add_widget(card)
+
+def shot():
+    for _ in range(4):
+        EventLoop.idle()
+    return glReadPixels(0, 0, 320, 240, GL_RGBA, GL_UNSIGNED_BYTE)
+
+def differing(a, b):
+    return sum(1 for x, y in zip(a, b) if abs(x - y) > 2)
+
+result = {{}}
+plain = shot()
+result['noise'] = differing(plain, shot())
+inner.setCached(True)
+card.setCached(True)
+result['cached'] = differing(plain, shot())
+# Borda fina exatamente sobre a divisa entre pixels: pode ser deslocada de um pixel
+inner.setCached(False)
+card.setCached(False)
+bordered = BoxCard(background_color=(.5, .1, .1, .6), border_width=1)
+card.add_widget(bordered)
+plain = shot()
+card.setCached(True)
+cached = shot()
+edges = set()
+for x in (int(bordered.x), int(bordered.right)):
+    edges.update((x - 1, x))
+result['offEdges'] = differing(*([p for i, p in enumerate(image) if (i // 4) % 320 not in edges]
+                                  for image in (plain, cached)))
+label = card.children[-1]
+card.setVisible(label, False)
+other = BoxCard()
+card.remove_widget(label)
+other.add_widget(label)  # No mesmo quadro, antes da sincronização do cache
+result['inGroup'] = card._cache.group.indexof(label.canvas) != -1
+result['inOther'] = other.canvas.indexof(label.canvas) != -1
+shot()
+result['stillInOther'] = other.canvas.indexof(label.canvas) != -1
+print(json.dumps(result))
+'''
+
+
+@pytest.fixture(scope='module')
+def probe():
+    env = dict(os.environ, SDL_VIDEODRIVER='offscreen', KIVY_NO_ARGS='1',
+               KIVY_NO_CONSOLELOG='1', KIVY_NO_FILELOG='1')
+    run = subprocess.run([sys.executable, '-c', PROBE.format(root=ROOT)], env=env,
+                         capture_output=True, text=True, timeout=120)
+    if run.returncode == 3:
+        pytest.skip('sem contexto GL (janela offscreen do SDL2)')
+    assert run.returncode == 0, run.stderr[-2000:]
+    return json.loads(run.stdout.strip().splitlines()[-1])
+
+
+def test_cached_output_matches_uncached(probe):
+    assert probe['noise'] == 0
+    assert probe['cached'] == 0
+    assert probe['offEdges'] == 0
+
+
+def test_removed_child_leaves_fbo_immediately(probe):
+    assert not probe['inGroup']
+    assert probe['inOther'] and probe['stillInOther']
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""
+Testes dos displays (ngdisplay): histórico do Sparkline, redução min/max e
+cache de texturas de texto
+"""
+
+import pytest
+import kivyng.ngdisplay as ngdisplay
+from kivyng.ngdisplay import AlignedLabel, Sparkline, decimate
+
+
+def test_sparkline_ring_buffer():
+    line = Sparkline(capacity=4, size=(40, 10))
+    for v in (1, 2, 3):
+        line.push(v)
+    assert list(line.values()) == [1, 2, 3]
+    line.extend([4, 5, 6])
+    assert list(line.values()) == [3, 4, 5, 6]
+    line.extend(range(10))
+    assert list(line.values()) == [6, 7, 8, 9]
+    line._updMesh()
+    line.clear()
+    assert list(line.values()) == []
+
+
+def test_sparkline_capacity():
+    with pytest.raises(ValueError):
+        Sparkline(capacity=0)
+    line = Sparkline(capacity=1, size=(40, 10))
+    line.push(3)
+    line.push(5)
+    assert list(line.values()) == [5]
+    line._updMesh()
+    with pytest.raises(ValueError):
+        line.reset(capacity=0)
+    line.reset(capacity=3)
+    assert line.capacity == 3 and list(line.values()) == []
+
+
+def test_decimate_keeps_peaks():
+    samples = [0, 0, 9, 0, 0, 0, -4, 0]
+    positions, values = decimate(samples, 2)
+    assert max(values) == 9 and min(values) == -4
+    assert len(positions) == len(values) == 4
+
+
+def test_labels_share_cached_textures():
+    ngdisplay.clearTextureCache()
+    ngdisplay.resetTextureStats()
+    a, b = (AlignedLabel(text='abc', text_size=(100, 30)) for _ in range(2))
+    a.texture_update()
+    b.texture_update()
+    assert a.texture is b.texture
+    stats = ngdisplay.textureStats()
+    assert (stats['hits'], stats['misses'], stats['bytes']) == (1, 1, 100 * 30 * 4)
+    ngdisplay.setTextureBudget(100 * 30 * 4 - 1)   # Não cabe: descartada do cache
+    try:
+        assert ngdisplay.textureStats()['textures'] == 0 and a.texture is b.texture
+    finally:
+        ngdisplay.setTextureBudget(8 * 1024 * 1024)
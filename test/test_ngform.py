@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+Testes do construtor de formulários (ngform)
+"""
+
+import json
+import pytest
+from kivyng import ngform
+
+SCHEMA = {'card': {'padding': 4},
+          'fields': [{'name': 'tensao', 'label': 'Tensão', 'value': 1, 'decimals': 2, 'vMax': 30,
+                      'unit': 'V'},
+                     {'name': 'ciclos', 'label': 'Ciclos', 'value': 5, 'vMax': 1000}]}
+
+
+def test_build_form():
+    card = ngform.buildForm(SCHEMA)
+    assert list(card.fields) == ['tensao', 'ciclos']
+    assert card.padding == [4, 4, 4, 4]
+    assert [w.text for w in card.children[::-1]] == ['Tensão', '1.00 V', 'Ciclos', '5']
+    assert ngform.getValues(card) == {'tensao': 1., 'ciclos': 5}
+    assert ngform.setValues(card, {'tensao': 12.5, 'ciclos': 5}) == 1
+    with pytest.raises(ValueError):
+        ngform.setValues(card, {'ciclos': 5000})
+    assert card.fields['ciclos'].value == 5
+
+
+def test_remove_widget_drops_field():
+    card = ngform.buildForm(SCHEMA)
+    edit = card.fields['tensao']
+    card.remove_widget(edit)
+    assert list(card.fields) == ['ciclos']
+
+
+def test_compile_cache():
+    ngform.clearCache()
+    compiled = ngform.compileSchema(SCHEMA)
+    assert ngform.compileSchema(SCHEMA) is compiled
+    assert ngform.compileSchema(dict(SCHEMA)) is not compiled  # Outro objeto, outra entrada
+    text = json.dumps(SCHEMA)
+    assert ngform.compileSchema(text) is ngform.compileSchema(str(text))
+    assert ngform.compileSchema({'fields': []}, key='tela') is ngform.compileSchema({}, key='tela')
+    for i in range(ngform._cacheSize + 10):
+        ngform.compileSchema([{'name': 'f{}'.format(i)}])
+    assert len(ngform._compiled) == ngform._cacheSize
+
+
+def test_invalid_schema():
+    with pytest.raises(ValueError):
+        ngform.compileSchema([{'label': 'sem nome'}])
+    with pytest.raises(ValueError):
+        ngform.compileSchema([{'name': 'a'}, {'name': 'a'}])
+    with pytest.raises(ValueError):
+        ngform.compileSchema([{'name': 'a', 'cor': 1}])
+
+
+def _computed():
+    schema = [{'name': 'a', 'value': 2, 'vMax': 100},
+              {'name': 'b', 'value': 3, 'vMax': 100},
+              {'name': 'soma', 'expr': 'a + b', 'vMax': 1000},
+              {'name': 'dobro', 'expr': 'soma * 2', 'vMax': 150}]
+    card = ngform.buildForm(schema)
+    card.computed.update()
+    return card
+
+
+def test_form_graph_order_and_propagation():
+    card = _computed()
+    graph = card.computed
+    assert graph.order() == ['soma', 'dobro']
+    assert (card.fields['soma'].value, card.fields['dobro'].value) == (5, 10)
+    count = graph.evaluations
+    card.fields['b'].value = 80
+    graph.update()
+    assert (card.fields['soma'].value, card.fields['dobro'].value) == (82, 150)  # Limitado a vMax
+    assert graph.evaluations == count + 2
+    with pytest.raises(ValueError):
+        graph.define({'soma': 'dobro + 1'})
+    assert graph.order() == ['soma', 'dobro']
+
+
+def test_form_graph_errors():
+    card = _computed()
+    graph = card.computed
+    with pytest.raises(ValueError):
+        graph.define({'dobro': 'soma *'})
+    with pytest.raises(KeyError):
+        graph.define({'dobro': 'soma * c'})
+    graph.define({'dobro': (lambda soma: float('nan'), ['soma'])})
+    graph.update()
+    assert isinstance(graph.errors['dobro'], ValueError) and card.fields['dobro'].value == 10
+    graph.define({'dobro': 'a / (b - 3)'})
+    graph.update()
+    assert isinstance(graph.errors['dobro'], ZeroDivisionError)
+    card.fields['b'].value = 4
+    graph.update()
+    assert 'dobro' not in graph.errors and card.fields['dobro'].value == 2
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""
+Testes da formatação numérica compilada (ngformat)
+"""
+
+import math
+from kivyng import ngformat
+
+
+def test_format_and_parse():
+    fmt = ngformat.getFormat(2, 0, 10, ',', 'V')
+    assert fmt.format(1.5) == '1,50 V'
+    assert fmt.format(1.5, unit=False) == '1,50'
+    assert fmt.parse(' 1,25 V ') == 1.25
+    assert fmt.parse('3') == 3.0
+    integer = ngformat.getFormat(None, 0, 10)
+    assert integer.format(7.9) == '7'
+    assert integer.format(7.9, truncate=False) == '7.9'
+    assert integer.parse('4') == 4 and isinstance(integer.parse('4'), int)
+    try:
+        integer.parse('4.5')
+    except ValueError:
+        pass
+    else:
+        raise AssertionError('parse deveria recusar 4.5 em um formato inteiro')
+
+
+def test_check_and_coerce():
+    fmt = ngformat.getFormat(None, -5, 5)
+    assert fmt.check(-5) and fmt.check(5) and not fmt.check(6)
+    assert not fmt.check(float('nan'))
+    assert fmt.coerce(3.7) == 3
+    assert ngformat.getFormat(1).coerce(3) == 3.0
+
+
+def test_formats_are_shared():
+    assert ngformat.getFormat(2, 0, 10) is ngformat.getFormat(2, 0, 10, '.', '')
+    assert ngformat.getFormat(2, 0, 10) is not ngformat.getFormat(3, 0, 10)
+
+
+def test_input_filter():
+    fmt = ngformat.getFormat(2, separator=',')
+    assert fmt.inputFilter('-1,5a.') == '-1,5'
+
+
+def test_out_of_bounds():
+    values = [1, -1, 11, float('nan'), 10]
+    assert ngformat.outOfBounds(values, [0] * 5, [10] * 5) == [1, 2, 3]
+    assert math.isnan(values[3])
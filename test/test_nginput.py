@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+"""
+Testes do NumericInput (nginput): texto mostrado a partir do valor e
+entrada em rajadas
+"""
+
+from kivyng.nginput import NumericInput
+
+
+def test_integer_text_shows_value_as_is():
+    edit = NumericInput(5)
+    assert edit.text == '5'
+    edit.value = 7.5  # Sem conversão: o texto mostra o valor atribuído, como sempre
+    assert edit.text == '7.5'
+    assert edit.formatValue(3) == '3'
+
+
+def test_decimal_text():
+    edit = NumericInput(5, 2)
+    assert edit.text == '5.00'
+    edit.value = 1.234
+    assert edit.text == '1.23'
+
+
+def test_focus_loss_commits_typed_text_with_unit():
+    edit = NumericInput(5, unit='kg')
+    assert edit.text == '5 kg'
+    edit.text = '12'  # Digitado durante a edição (sem a unidade), sem Enter
+    edit._onFocus(edit, False)
+    assert edit.value == 12
+    assert edit.text == '12 kg'
+    edit.text = '500'  # Fora dos limites: mantém o valor
+    edit._onFocus(edit, False)
+    assert edit.value == 12
+    assert edit.text == '12 kg'
+
+
+def test_type_text_skips_the_unit():
+    edit = NumericInput(5, vMax=1000, unit='kg')
+    edit.cursor = (len(edit.text), 0)
+    edit.typeText('12')
+    assert edit.value == 512
+    assert edit.text == '512 kg'
+
+
+def test_auto_burst_end_does_not_validate():
+    edit = NumericInput(5, vMax=1000)
+    edit.setBurstDetection(0.03)
+    edit.cursor = (1, 0)
+    edit.beginBurst(_auto=True)
+    edit.insert_text('0')
+    edit._endAutoBurst()  # Pausa: o texto muda, mas o número não é confirmado
+    assert edit.text == '50' and edit.value == 5
+    edit.dispatch('on_text_validate')
+    assert edit.value == 50
+
+
+def test_burst_on_integer_input_showing_a_float():
+    edit = NumericInput(5)
+    edit.value = 7.5
+    edit.cursor = (len(edit.text), 0)
+    edit.typeText('1', validate=False)
+    assert edit.text == '7.51'
+    edit.dispatch('on_text_validate')  # Não é um inteiro: volta ao valor atual
+    assert edit.value == 7.5 and edit.text == '7.5'
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+Testes do pool de widgets (ngpool)
+"""
+
+from kivyng import ngpool, ngstyle
+from kivyng.ngcard import BoxCard, FormCard, ownerOf
+from kivyng.ngdisplay import AlignedLabel
+from kivyng.nginput import NumericInput
+
+
+def test_acquire_reuses_released_widgets():
+    pool = ngpool.WidgetPool()
+    edit = pool.acquire(NumericInput, value=10, decimals=2)
+    assert pool.release(edit)
+    again = pool.acquire(NumericInput, value=3)
+    assert again is edit
+    assert again.value == 3 and again.text == '3'
+    assert (pool.hits, pool.misses) == (1, 1)
+
+
+def test_policies():
+    lru = ngpool.WidgetPool(maxSize=1)
+    first, second = AlignedLabel(text='a'), AlignedLabel(text='b')
+    assert lru.release(first) and lru.release(second)
+    assert lru.acquire(AlignedLabel, text='c') is second
+    reject = ngpool.WidgetPool(maxSize=1, policy='reject')
+    assert reject.release(first)
+    assert not reject.release(second)
+    assert reject.evictions == 1
+
+
+def test_foreign_widgets_keep_their_style():
+    pool = ngpool.WidgetPool()
+    styled = NumericInput(style=ngstyle.styleLight)
+    custom = NumericInput(background_color=(1, 0, 0, 1))
+    assert not pool.release(styled)
+    assert not pool.release(custom)
+    plain = NumericInput()
+    assert pool.release(plain)
+    assert pool.acquire(NumericInput) is plain
+
+
+def test_release_hidden_card_member():
+    pool = ngpool.WidgetPool()
+    card = BoxCard()
+    edit, label = NumericInput(), AlignedLabel(text='x')
+    card.add_widget(edit)
+    card.add_widget(label)
+    card.setVisible(edit, False)
+    assert ownerOf(edit) is card
+    pool.release(edit)
+    assert card.isVisible(edit) is None and ownerOf(edit) is None
+    other = BoxCard()
+    other.add_widget(pool.acquire(NumericInput))
+    card.setVisible(edit, True)  # Já não pertence ao card: ignorado
+    assert card.children == [label]
+    assert edit.parent is other
+
+
+def test_release_all():
+    pool = ngpool.WidgetPool()
+    card = FormCard()
+    inner = BoxCard()
+    card.addWidgets([AlignedLabel(text='a'), NumericInput(), AlignedLabel(text='b'), inner])
+    card.setVisible(inner, False)
+    pool.releaseAll(card)
+    assert card._visIndex.members() == []
+    assert pool.stats()['pools'][('AlignedLabel', None)] == 2
+
+
+def test_double_release_is_ignored():
+    pool = ngpool.WidgetPool()
+    label = pool.acquire(AlignedLabel, text='a')
+    assert pool.release(label)
+    assert not pool.release(label)
+    assert not ngpool.WidgetPool().release(label)  # Nem em outro pool
+    first = pool.acquire(AlignedLabel, text='b')
+    second = pool.acquire(AlignedLabel, text='c')
+    assert first is label and second is not label
+    assert pool.release(first)
+    pool.clear()
+    assert pool.release(first)
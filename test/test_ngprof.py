@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""
+Testes da instrumentação (ngprof): métodos trocados só enquanto habilitada
+e contabilidade de memória dos widgets rastreados
+"""
+
+from kivy.clock import Clock
+import kivyng.ngprof as ngprof
+from kivyng.ngcard import BoxCard
+from kivyng.ngdisplay import AlignedLabel
+from kivyng.nginput import NumericInput
+
+
+def test_enable_disable_restores_methods():
+    original = (NumericInput.__dict__['on_value'], BoxCard.__dict__.get('do_layout'))
+    edit = NumericInput(1)  # Criado antes: o tratador on_value é religado
+    card = BoxCard()
+    ngprof.reset()
+    ngprof.enable()
+    try:
+        edit.value = 5
+        card.add_widget(NumericInput(2))
+        Clock.tick()
+        counts = {name: s['count'] for name, s in ngprof.stats().items()}
+    finally:
+        ngprof.disable()
+    assert counts['NumericInput.on_value'] == 2
+    assert counts['BoxCard.do_layout'] >= 1
+    assert (NumericInput.__dict__['on_value'], BoxCard.__dict__.get('do_layout')) == original
+    ngprof.reset()
+    edit.value = 7
+    assert edit.text == '7'
+    assert ngprof.stats() == {}
+    assert len(edit.get_property_observers('value')) == 1
+
+
+def test_memory_report_counts_tracked_widgets():
+    before = NumericInput(1)
+    ngprof.trackMemory()
+    try:
+        card = BoxCard()
+        edits = [NumericInput(i + 1) for i in range(3)]
+        labels = [AlignedLabel(text='a'), AlignedLabel(text='b')]
+    finally:
+        ngprof.trackMemory(False)
+    assert '__wrapped__' not in vars(NumericInput.__init__)
+    report = ngprof.memoryReport()
+    assert report['NumericInput']['count'] == 3 and report['BoxCard']['count'] == 1
+    assert report['AlignedLabel']['count'] == 2 and report['NumericInput']['bytes'] > 0
+    del labels
+    assert 'AlignedLabel' not in ngprof.memoryReport()
+    assert before.value == 1 and card is not None and len(edits) == 3
@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+"""
+Testes dos estilos (ngstyle): troca de tema nos widgets já criados
+"""
+
+import kivyng.ngstyle as ngstyle
+from kivyng.ngcard import BoxCard
+from kivyng.ngdisplay import AlignedLabel
+from kivyng.nginput import NumericInput
+
+
+def _colors(card, label, entry):
+    return (tuple(card._bgColor.rgba), tuple(card._borderColor.rgba), tuple(label.color),
+            tuple(entry.background_color), tuple(entry.foreground_color))
+
+
+def test_set_theme_updates_live_widgets():
+    card, label, entry = BoxCard(), AlignedLabel(text='a'), NumericInput(5)
+    red, green = (1, 0, 0, 1), (0, 1, 0, 1)
+    custom = BoxCard(border_color=red)
+    customLabel = AlignedLabel(text='b', color=green, background_color=red)
+    customEntry = NumericInput(5, foreground_color=green)
+    dark = _colors(card, label, entry)
+    try:
+        ngstyle.setTheme(ngstyle.styleLight, now=True)
+        light = ngstyle.styleLight
+        assert _colors(card, label, entry) == (light['BoxCard']['background_color'],
+                                               light['BoxCard']['border_color'],
+                                               light['AlignedLabel']['color'],
+                                               light['NumericInput']['background_color'],
+                                               light['NumericInput']['foreground_color'])
+        assert tuple(custom._bgColor.rgba) == light['BoxCard']['background_color']
+        assert tuple(custom._borderColor.rgba) == red
+        assert tuple(customLabel.color) == green and tuple(customLabel._bgColor.rgba) == red
+        assert tuple(customEntry.foreground_color) == green
+        assert tuple(customEntry.background_color) == light['NumericInput']['background_color']
+        assert card.style is ngstyle.compileStyle(light, 'BoxCard')
+    finally:
+        ngstyle.setTheme(ngstyle.style0, now=True)
+    assert _colors(card, label, entry) == dark
+    assert tuple(custom._borderColor.rgba) == red and tuple(customEntry.foreground_color) == green
+    assert tuple(customEntry.background_color) == ngstyle.style0['NumericInput']['background_color']
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+"""
+Testes da gravação e reprodução de traces (ngtrace)
+"""
+
+from importlib import import_module
+import kivyng.ngstyle as ngstyle
+import kivyng.ngtrace as ngtrace
+from kivyng.ngcard import BoxCard, FormCard
+from kivyng.ngdisplay import AlignedLabel
+from kivyng.nginput import NumericInput
+
+_CUSTOM = {'NumericInput': {'background_color': [.1, .2, .3, 1]}}
+
+
+def _record():
+    ngtrace.start()
+    try:
+        card = BoxCard(style=ngstyle.styleLight)
+        form = FormCard(ngstyle.styleLight)
+        label = AlignedLabel(text='Tensão')
+        edit = NumericInput(5, None, 0, 100, _CUSTOM, unit='V')
+        other = NumericInput(6, style=_CUSTOM)
+        form.addWidgets([label, edit])
+        card.add_widget(form)
+        card.add_widget(other)
+        edit.value = 7
+        form.setVisible(edit, False)
+        form.setVisible(edit, True)
+        card.remove_widget(other)
+        ngtrace._recorder.frame(0)
+    finally:
+        trace = ngtrace.stop()
+    return trace
+
+
+def test_styles_recorded_by_reference():
+    trace = _record()
+    new = [e for e in trace['events'] if e[0] == ngtrace.NEW]
+    assert new[0][4] == {'style': {'$theme': 'styleLight'}}
+    assert new[1][3] == [{'$theme': 'styleLight'}]
+    assert new[3][3][4] == {'$style': 0} and new[4][4]['style'] == {'$style': 0}
+    assert trace['styles'] == [_CUSTOM]
+    widgets = {}
+    classes = [getattr(import_module(trace['modules'][n]), n) for n in trace['classes']]
+    for event in new:
+        ngtrace._apply(event, widgets, classes, trace['styles'])
+    assert widgets[1].style is ngstyle.resolve(ngstyle.styleLight, 'BoxCard')
+    assert widgets[4].style is ngstyle.resolve(_CUSTOM, 'NumericInput')
+    assert widgets[4].text == '5 V'
+
+
+def test_record_and_replay(tmp_path):
+    trace = _record()
+    path = str(tmp_path / 'sessao.ngt')
+    ngtrace.save(trace, path)
+    report = ngtrace.replay(ngtrace.load(path))
+    assert report['failed'] == {}
+    assert report['events'] == {'new': 5, 'add': 2, 'remove': 1, 'visible': 2, 'value': 1,
+                                'addMany': 1, 'frame': 1}
+    assert report['frames'] == 1